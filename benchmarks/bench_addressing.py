@@ -0,0 +1,106 @@
+"""
+Microbenchmark for addressing mode resolution
+
+Compares the old way of working out an effective address (walking an if/elif chain of string compares, then
+rebuilding a dict of cycles on every call) with the mode constants and tables, and then with what an LDA
+actually costs going through the dispatch table.
+
+Run from the top of the repo:
+
+    python -m benchmarks.bench_addressing
+"""
+
+import timeit
+
+from py6502.memory import Memory
+from py6502.processor import Processor
+from py6502 import addressing
+
+NUMBER = 200000
+
+
+def legacy_calculate_effective_address(proc: Processor, mode: str, op: int) -> int:
+    """
+    calculate_effective_address as it was, kept here so there is something to compare against
+
+    @Return: int
+    """
+
+    if mode == "absolute":
+        return op
+    elif mode == "zero_page":
+        return op & 0xFF
+    elif mode == "absolute_x":
+        return op + proc.reg_x
+    elif mode == "absolute_y":
+        return op + proc.reg_y
+    elif mode == "zero_page_x":
+        return (op + proc.reg_x) & 0xFF
+    elif mode == "zero_page_y":
+        return (op + proc.reg_y) & 0xFF
+    else:
+        raise ValueError(f"Unsupported addressing mode: {mode}")
+
+
+def legacy_get_cycles_for_mode(mode: str) -> int:
+    """
+    get_cycles_for_mode as it was
+
+    @Return: int
+    """
+
+    cycles = {
+        "absolute" : 4,
+        "zero_page" : 3,
+        "absolute_x" : 4,
+        "absolute_y" : 4,
+        "zero_page_x" : 4,
+        "zero_page_y" : 4
+    }
+
+    return cycles.get(mode, 0)
+
+
+def ns_per_call(stmt, number: int = NUMBER) -> float:
+    """
+    Best of three runs, in nanoseconds per call
+
+    @Return: float
+    """
+
+    return min(timeit.repeat(stmt, number=number, repeat=3)) / number * 1e9
+
+
+def main() -> None:
+    proc = Processor(Memory())
+    proc.reg_y = 0x10
+
+    #zero_page_y is the last entry in the old chain, so it is the worst case
+    before = ns_per_call(lambda: (
+        legacy_calculate_effective_address(proc, "zero_page_y", 0x42),
+        legacy_get_cycles_for_mode("zero_page_y"),
+    ))
+    after = ns_per_call(lambda: (
+        proc.calculate_effective_address(addressing.ZERO_PAGE_Y, 0x42),
+        proc.get_cycles_for_mode(addressing.ZERO_PAGE_Y),
+    ))
+
+    #A page full of LDA $4200,X, which is what the run loop actually sees
+    for addr in range(0x0600, 0x0600 + 3 * 1000, 3):
+        proc.memory.write(addr, 0xBD)
+        proc.memory.write(addr + 1, 0x00)
+        proc.memory.write(addr + 2, 0x42)
+
+    def run_block() -> None:
+        proc.program_counter = 0x0600
+        proc.run(1000)
+
+    per_instruction = ns_per_call(run_block, number=NUMBER // 1000) / 1000
+
+    print(f"string modes, if/elif + dict  : {before:8.1f} ns per lookup")
+    print(f"int modes, resolver + cycles  : {after:8.1f} ns per lookup")
+    print(f"dispatch table, LDA abs,X     : {per_instruction:8.1f} ns per instruction")
+
+
+if __name__ == "__main__":
+    main()
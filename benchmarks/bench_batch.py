@@ -0,0 +1,169 @@
+"""
+Throughput of the batch engine against a loop over Processors
+
+Runs the same kernel on N machines, once as a Batch and once as N Processors each run in turn for the same
+number of instructions, and reports instructions per second for both, best of a few runs. Every machine gets its own data, so
+the ones running the data dependent kernels drift apart from the rest as they go. The batch is checked against
+the Processors register for register before anything is reported.
+
+The kernels are a register and branch loop (what the lane kernels cover), the same loop with a zero page
+counter in memory, and sum, whose loop count differs from machine to machine.
+
+Run from the top of the repo:
+
+    python -m benchmarks.bench_batch
+    python -m benchmarks.bench_batch --machines 4096 --steps 500 count
+"""
+
+import argparse
+import sys
+import time
+
+from py6502.assembler import assemble
+from py6502.batch import Batch
+from py6502.memory import Memory
+from py6502.processor import Processor
+
+#Every kernel starts at start with its machine number (mod 256) in $10
+
+COUNT = """
+;Count X up through every value, bumping Y each time the low nibble wraps
+start:  LDX #0
+        LDY #0
+loop:   INX
+        TXA
+        AND #$0F
+        CMP #$0F
+        BNE skip
+        INY
+skip:   CPX #$FF
+        BNE loop
+done:   JMP start
+"""
+
+MEMORY = """
+;The same loop with the count kept in zero page
+start:  LDA #0
+        STA $20
+        LDY #0
+loop:   INC $20
+        LDA $20
+        AND #$0F
+        CMP #$0F
+        BNE skip
+        INY
+skip:   LDA $20
+        CMP #$FF
+        BNE loop
+done:   JMP start
+"""
+
+SUM = """
+;Sum 1..n where n is the machine number
+start:  LDA #0
+        LDX $10
+        BEQ done
+loop:   CLC
+        STX $11
+        ADC $11
+        DEX
+        BNE loop
+        STA $12
+done:   JMP start
+"""
+
+KERNELS = {"count": COUNT, "memory": MEMORY, "sum": SUM}
+
+
+def build(source: str, machines: int) -> tuple:
+    """
+    The same machines as a Batch and as a list of Processors
+
+    @Param source: kernel source
+    @Param machines: number of machines
+    @Return: tuple (Batch, list of Processor)
+    """
+
+    program = assemble(source, 0x0600)
+    procs = []
+    for i in range(machines):
+        proc = Processor(Memory())
+        proc.reset()
+        program.load(proc.memory)
+        proc.memory.write(0x10, i & 0xFF)
+        proc.program_counter = program.symbols["start"]
+        procs.append(proc)
+
+    batch = Batch(machines)
+    for i, proc in enumerate(procs):
+        batch.load_processor(i, proc)
+    return batch, procs
+
+
+def bench(name: str, machines: int, steps: int, repeat: int) -> dict:
+    """
+    Time one kernel both ways
+
+    @Param name: kernel name
+    @Param machines: number of machines
+    @Param steps: instructions per machine
+    @Param repeat: timed runs each way, the best is kept
+    @Return: dict of results
+    """
+
+    #A few machines first, so one-off setup like the ADC tables isn't timed on either side
+    batch, procs = build(KERNELS[name], 16)
+    batch.run(steps)
+    for proc in procs:
+        proc.run(steps)
+
+    batched = looped = None
+    for _ in range(repeat):
+        batch, procs = build(KERNELS[name], machines)
+
+        start = time.perf_counter()
+        batch.run(steps)
+        elapsed = time.perf_counter() - start
+        batched = elapsed if batched is None else min(batched, elapsed)
+
+        start = time.perf_counter()
+        for proc in procs:
+            proc.run(steps)
+        elapsed = time.perf_counter() - start
+        looped = elapsed if looped is None else min(looped, elapsed)
+
+        for i, proc in enumerate(procs):
+            copy = batch.to_processor(i)
+            if (copy.reg_a, copy.reg_x, copy.reg_y, copy.program_counter, copy.cycles) != (
+                proc.reg_a, proc.reg_x, proc.reg_y, proc.program_counter, proc.cycles
+            ):
+                raise RuntimeError(f"Kernel {name} machine {i} doesn't match its Processor")
+
+    instructions = machines * steps
+    return {
+        "batch": instructions / batched,
+        "processors": instructions / looped,
+        "speedup": looped / batched,
+    }
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Batch against a loop over Processors")
+    parser.add_argument("kernels", nargs="*", help=f"kernels to run ({', '.join(KERNELS)}), all by default")
+    parser.add_argument("--machines", type=int, default=1024, help="machines in the batch")
+    parser.add_argument("--steps", type=int, default=300, help="instructions per machine")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs each way, the best is kept")
+    args = parser.parse_args(argv)
+    for name in args.kernels:
+        if name not in KERNELS:
+            parser.error(f"unknown kernel {name}")
+
+    print(f"{'kernel':<10}{'batch instr/s':>16}{'loop instr/s':>16}{'speedup':>10}")
+    for name in args.kernels or list(KERNELS):
+        result = bench(name, args.machines, args.steps, args.repeat)
+        print(f"{name:<10}{result['batch']:>16,.0f}{result['processors']:>16,.0f}{result['speedup']:>9.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
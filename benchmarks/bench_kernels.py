@@ -0,0 +1,377 @@
+"""
+Throughput benchmarks for the interpreter on real 6502 code
+
+Runs a handful of small kernels that between them lean on everything the run loop does: indirect indexed
+loads and stores (memcpy), shifts and branches (CRC-8), indexed stores in a tight loop (sieve), decimal mode
+ADC (BCD) and JSR / RTS with the stack (recursive Fibonacci). Each kernel is checked once for the right answer
+before it is timed, so a change that makes things faster by making them wrong doesn't go unnoticed.
+
+For each kernel it reports instructions per second, the emulated clock speed in MHz (cycles per second) and how
+much memory one processor with the kernel loaded takes. Results can be written out as JSON and compared with a
+baseline from an earlier run, which fails (exit status 1) if anything got slower or bigger by more than the
+threshold. --baseline on its own compares with BASELINE, the checked in results for the current tree, which
+should be regenerated with --json whenever a change moves the numbers on purpose. Speeds depend on the machine,
+so it is mostly useful for memory and for big swings in speed.
+
+Run from the top of the repo:
+
+    python -m benchmarks.bench_kernels --json after.json --baseline before.json --threshold 0.10
+    python -m benchmarks.bench_kernels --baseline
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+from py6502.assembler import assemble
+from py6502.memory import Memory
+from py6502.processor import Processor
+
+RESULTS_VERSION = 1
+
+#Checked in results that --baseline compares with when it isn't given a path
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+#Every kernel starts at start and jumps back there from done, so it can be run for any number of instructions
+
+MEMCPY = """
+;Copy four pages from $1000 to $2000
+start:  LDA #$00
+        STA $10
+        STA $12
+        LDA #$10
+        STA $11
+        LDA #$20
+        STA $13
+        LDX #4
+        LDY #0
+copy:   LDA ($10),Y
+        STA ($12),Y
+        INY
+        BNE copy
+        INC $11
+        INC $13
+        DEX
+        BNE copy
+done:   JMP start
+"""
+
+CRC8 = """
+;CRC-8 (polynomial $07) of the page at $1000, into $20
+start:  LDA #0
+        STA $20
+        LDY #0
+byte:   LDA $20
+        EOR $1000,Y
+        LDX #8
+bit:    ASL A
+        BCC next
+        EOR #$07
+next:   DEX
+        BNE bit
+        STA $20
+        INY
+        BNE byte
+done:   JMP start
+"""
+
+SIEVE = """
+;Sieve of Eratosthenes, $3000 + n ends up 1 for every prime n below 256
+start:  LDX #0
+        LDA #1
+clear:  STA $3000,X
+        INX
+        BNE clear
+        LDA #0
+        STA $3000
+        STA $3001
+        LDX #2
+outer:  LDA $3000,X
+        BEQ next
+        STX $20
+        TXA
+        CLC
+        ADC $20
+        BCS next
+mark:   TAY
+        LDA #0
+        STA $3000,Y
+        TYA
+        CLC
+        ADC $20
+        BCC mark
+next:   INX
+        CPX #16
+        BNE outer
+done:   JMP start
+"""
+
+BCD = """
+;Add 1234 to a four byte BCD number 200 times, into $20 - $23 (low byte first)
+start:  SED
+        LDA #0
+        STA $20
+        STA $21
+        STA $22
+        STA $23
+        LDY #200
+add:    CLC
+        LDA $20
+        ADC #$34
+        STA $20
+        LDA $21
+        ADC #$12
+        STA $21
+        LDA $22
+        ADC #0
+        STA $22
+        LDA $23
+        ADC #0
+        STA $23
+        DEY
+        BNE add
+        CLD
+done:   JMP start
+"""
+
+FIBONACCI = """
+;Fibonacci of 12 the slow way, by adding up the leaves of the recursion into $20 / $21
+start:  LDA #0
+        STA $20
+        STA $21
+        LDX #12
+        JSR fib
+done:   JMP start
+
+fib:    CPX #2
+        BCC leaf
+        DEX
+        TXA
+        PHA
+        JSR fib
+        PLA
+        TAX
+        DEX
+        JSR fib
+        RTS
+leaf:   TXA
+        CLC
+        ADC $20
+        STA $20
+        BCC leave
+        INC $21
+leave:  RTS
+"""
+
+#Source data for memcpy and CRC-8
+PATTERN = bytes((i * 7 + 3) & 0xFF for i in range(0x400))
+
+
+def crc8(data: bytes) -> int:
+    """
+    CRC-8 with polynomial $07, what the CRC8 kernel should come up with
+
+    @Param data: bytes to checksum
+    @Return: int
+    """
+
+    crc = 0
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x07) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+    return crc
+
+
+#Checks on the answer each kernel leaves behind when it gets to done
+
+def check_memcpy(proc: Processor) -> bool:
+    return proc.memory.dump(0x2000, 0x2400) == PATTERN
+
+
+def check_crc8(proc: Processor) -> bool:
+    return proc.memory.read_byte(0x20) == crc8(PATTERN[:0x100])
+
+
+def check_sieve(proc: Processor) -> bool:
+    primes = [n for n in range(256) if n > 1 and all(n % d for d in range(2, n))]
+    return [n for n in range(256) if proc.memory.read_byte(0x3000 + n)] == primes
+
+
+def check_bcd(proc: Processor) -> bool:
+    return proc.memory.dump(0x20, 0x24) == bytes([0x00, 0x68, 0x24, 0x00])
+
+
+def check_fibonacci(proc: Processor) -> bool:
+    return proc.memory.read_word(0x20) == 144
+
+
+#name -> (source, check)
+KERNELS = {
+    "memcpy": (MEMCPY, check_memcpy),
+    "crc8": (CRC8, check_crc8),
+    "sieve": (SIEVE, check_sieve),
+    "bcd": (BCD, check_bcd),
+    "fibonacci": (FIBONACCI, check_fibonacci),
+}
+
+
+def build(source: str) -> tuple:
+    """
+    Processor with a kernel loaded at $0600 and ready to run
+
+    @Param source: kernel source
+    @Return: tuple (Processor, symbols)
+    """
+
+    program = assemble(source, 0x0600)
+    proc = Processor(Memory())
+    proc.reset()
+    proc.memory.load(0x1000, PATTERN)
+    program.load(proc.memory)
+    proc.program_counter = program.symbols["start"]
+    return proc, program.symbols
+
+
+def memory_per_instance(source: str) -> int:
+    """
+    Bytes allocated by building one processor with the kernel loaded
+
+    @Param source: kernel source
+    @Return: int
+    """
+
+    assemble(source, 0x0600)
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        #Held on to so the processor is still allocated when memory is measured
+        proc = build(source)
+        return tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+
+def bench(name: str, instructions: int, repeat: int) -> dict:
+    """
+    Check and time one kernel
+
+    @Param name: kernel name
+    @Param instructions: instructions to run per timed run
+    @Param repeat: timed runs, the best is kept
+    @Return: dict of results
+    """
+
+    source, check = KERNELS[name]
+    proc, symbols = build(source)
+    proc.run(instructions=10000000, until_pc=symbols["done"])
+    if proc.program_counter != symbols["done"] or not check(proc):
+        raise RuntimeError(f"Kernel {name} got the wrong answer")
+
+    best = None
+    for _ in range(repeat):
+        proc.program_counter = symbols["start"]
+        start = time.perf_counter()
+        cycles = proc.run(instructions)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best[0]:
+            best = (elapsed, cycles)
+
+    elapsed, cycles = best
+    return {
+        "instructions_per_sec": instructions / elapsed,
+        "mhz": cycles / elapsed / 1e6,
+        "memory_bytes": memory_per_instance(source),
+    }
+
+
+def run(names: list, instructions: int, repeat: int) -> dict:
+    """
+    Run the benchmarks
+
+    @Param names: kernels to run
+    @Param instructions: instructions per timed run
+    @Param repeat: timed runs per kernel
+    @Return: dict of results, ready to be written out as JSON
+    """
+
+    return {
+        "version": RESULTS_VERSION,
+        "python": platform.python_version(),
+        "instructions": instructions,
+        "kernels": {name: bench(name, instructions, repeat) for name in names},
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Find everything that got worse than the baseline by more than the threshold
+
+    Speed regresses when instructions per second drops, memory when bytes per instance goes up. Kernels missing
+    from either side are skipped
+
+    @Param results: results of this run
+    @Param baseline: results of an earlier run
+    @Param threshold: allowed change as a fraction, eg. 0.1 for 10%
+    @Return: list of (kernel, metric, baseline value, this value, change as a fraction)
+    """
+
+    regressions = []
+    for name, current in results["kernels"].items():
+        before = baseline["kernels"].get(name)
+        if before is None:
+            continue
+        for metric, worse in (("instructions_per_sec", -1), ("memory_bytes", 1)):
+            if not before[metric]:
+                continue
+            change = (current[metric] - before[metric]) / before[metric]
+            if change * worse > threshold:
+                regressions.append((name, metric, before[metric], current[metric], change))
+    return regressions
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="6502 kernel throughput benchmarks")
+    parser.add_argument("kernels", nargs="*", help=f"kernels to run ({', '.join(KERNELS)}), all by default")
+    parser.add_argument("--instructions", type=int, default=200000, help="instructions per timed run")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per kernel, the best is kept")
+    parser.add_argument("--json", metavar="PATH", help="write the results to PATH")
+    parser.add_argument("--baseline", metavar="PATH", nargs="?", const=BASELINE,
+                        help="compare with results from an earlier run, the checked in baseline.json by default")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed regression as a fraction")
+    args = parser.parse_args(argv)
+    for name in args.kernels:
+        if name not in KERNELS:
+            parser.error(f"unknown kernel {name}")
+
+    results = run(args.kernels or list(KERNELS), args.instructions, args.repeat)
+
+    print(f"{'kernel':<12}{'instr/s':>14}{'MHz':>10}{'bytes':>12}")
+    for name, result in results["kernels"].items():
+        print(
+            f"{name:<12}{result['instructions_per_sec']:>14,.0f}{result['mhz']:>10.3f}"
+            f"{result['memory_bytes']:>12,}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for name, metric, before, after, change in regressions:
+            print(f"REGRESSION {name} {metric}: {before:,.0f} -> {after:,.0f} ({change:+.1%})")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
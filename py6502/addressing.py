@@ -0,0 +1,55 @@
+"""
+Addressing modes for the 6502
+
+Every instruction works on its operand in one of these modes. They are plain int constants rather than
+strings so they can be used to index straight into tables, which is all the processor ever does with them.
+
+-Implied (No operand, the instruction says everything, eg. CLC)
+-Accumulator (Operates on the accumulator itself, eg. ASL A)
+-Immediate (Operand is the value itself, eg. LDA #$42)
+-Zero page (8-bit address in the first 256 bytes of memory, eg. LDA $42)
+-Zero page X and Y (8-bit address plus X or Y, wrapping around inside the zero page, eg. LDA $42,X)
+-Absolute (Full 16-bit address, eg. LDA $4200)
+-Absolute X and Y (16-bit address plus X or Y, eg. LDA $4200,X)
+-Indirect (16-bit address of a 16-bit address, JMP only, eg. JMP ($4200))
+-Indexed indirect (Zero page address plus X holds the address, eg. LDA ($42,X))
+-Indirect indexed (Zero page address holds a base address, Y is added to it, eg. LDA ($42),Y)
+-Relative (Signed 8-bit offset from the next instruction, branches only, eg. BNE $FE)
+"""
+
+IMPLIED = 0
+ACCUMULATOR = 1
+IMMEDIATE = 2
+ZERO_PAGE = 3
+ZERO_PAGE_X = 4
+ZERO_PAGE_Y = 5
+ABSOLUTE = 6
+ABSOLUTE_X = 7
+ABSOLUTE_Y = 8
+INDIRECT = 9
+INDIRECT_X = 10
+INDIRECT_Y = 11
+RELATIVE = 12
+
+#Names for each mode, indexed by the constants above
+MODE_NAMES = (
+    "implied",
+    "accumulator",
+    "immediate",
+    "zero_page",
+    "zero_page_x",
+    "zero_page_y",
+    "absolute",
+    "absolute_x",
+    "absolute_y",
+    "indirect",
+    "indirect_x",
+    "indirect_y",
+    "relative",
+)
+
+#Number of operand bytes that follow the opcode for each mode
+OPERAND_BYTES = (0, 0, 1, 1, 1, 1, 2, 2, 2, 2, 1, 1, 1)
+
+#Cycles a read instruction (eg. LDA) takes in each mode, not counting page crossing
+MODE_CYCLES = (2, 2, 2, 3, 4, 4, 4, 4, 4, 5, 6, 5, 2)
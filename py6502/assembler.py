@@ -0,0 +1,512 @@
+import hashlib
+import json
+import os
+import re
+
+from py6502.opcodes import OPCODES
+from py6502.addressing import (
+    IMPLIED, ACCUMULATOR, IMMEDIATE, ZERO_PAGE, ZERO_PAGE_X, ZERO_PAGE_Y, ABSOLUTE, ABSOLUTE_X, ABSOLUTE_Y,
+    INDIRECT, INDIRECT_X, INDIRECT_Y, RELATIVE,
+)
+
+"""
+6502 assembler
+
+Turns source into bytes in a single pass over the lines. Labels go into the symbol table as they are reached,
+and any operand that uses a label we haven't seen yet gets placeholder bytes and a fixup, which is patched once
+the whole source has been read. Nothing is ever assembled twice.
+
+Syntax is the usual one:
+
+    ;comment
+    start:  LDX #$00        ;labels end with a colon
+    loop:   LDA table,X
+            STA ($10),Y
+            BNE loop
+    SCREEN = $0400          ;constants
+            .org $0700      ;start a new block of output at an address (*= $0700 works too)
+    table:  .byte 1, 2, $03, "text"
+            .word start, SCREEN + 40
+
+Numbers are decimal, $hex, %binary or 'c' for a character. An expression is numbers, symbols and * (the
+address of the current line) added and subtracted, optionally with < or > in front for the low or high byte.
+Operands are written the standard way for every addressing mode the processor knows (see py6502.addressing):
+#imm, zp, zp,X, zp,Y, abs, abs,X, abs,Y, (ind), (zp,X), (zp),Y and A (or nothing) for the accumulator.
+Zero page is used whenever the operand is already known to fit, unless it is a hex number written with more
+than two digits ($0010 stays absolute, the way the disassembler writes it). Forward references always get the
+absolute form since their size has to be fixed before their value is known.
+
+assemble() caches what it returns by a hash of the source, in memory and (with cache_dir) on disk, so a test
+suite that assembles the same few thousand snippets on every run only ever assembles each one once. Every call
+hands back its own copy, so changing one result never changes what the next caller gets.
+"""
+
+#Bump this whenever the output for the same source could change, so old cache entries stop matching
+ASSEMBLER_VERSION = 3
+
+#Most assembled programs kept in memory by assemble()
+MEMO_SIZE = 4096
+
+_OPCODE_FOR = {(mnemonic, mode): opcode for opcode, (mnemonic, mode, cycles) in OPCODES.items()}
+_MNEMONICS = {mnemonic for mnemonic, mode, cycles in OPCODES.values()}
+
+_LINE = re.compile(r"^\s*(?:([A-Za-z_][\w.]*)\s*:)?\s*(?:([A-Za-z_.*][\w.]*=?)\s*(.*?))?\s*$")
+_CONSTANT = re.compile(r"^\s*([A-Za-z_][\w.]*)\s*=\s*(.+?)\s*$")
+_SYMBOL = re.compile(r"^[A-Za-z_][\w.]*$")
+#Hex numbers written out to a full word, which keep the absolute form even when they would fit in zero page
+_WIDE = re.compile(r"^\$[0-9A-Fa-f]{3,}$")
+_ARGUMENTS = re.compile(r"\"[^\"]*\"|'[^']*'|[^,]+")
+#Everything up to a ; that isn't inside a string or character literal
+_CODE = re.compile(r"(?:\"[^\"]*\"?|'[^']*'?|[^\"';])*")
+
+_memo = {}
+
+
+class AssemblyError(ValueError):
+    def __init__(self, message: str, line: int) -> None:
+        """
+        Error in the source, with the line it is on
+
+        @Param message: what is wrong
+        @Param line: line number, counting from 1
+        @Return: None
+        """
+
+        super().__init__(f"line {line}: {message}")
+        self.line = line
+
+
+class Assembly:
+    def __init__(self, segments: list, symbols: dict) -> None:
+        """
+        Output of the assembler
+
+        @Param segments: list of (start address, bytes), one per .org
+        @Param symbols: dict of symbol -> value
+        @Return: None
+        """
+
+        self.segments = segments
+        self.symbols = symbols
+
+    @property
+    def start(self) -> int:
+        """
+        Lowest address anything was assembled at
+
+        @Return: int
+        """
+
+        return min((start for start, data in self.segments if data), default=0)
+
+    @property
+    def end(self) -> int:
+        """
+        One past the highest address anything was assembled at
+
+        @Return: int
+        """
+
+        return max((start + len(data) for start, data in self.segments if data), default=0)
+
+    def image(self) -> bytes:
+        """
+        Everything from start to end as one block, with zeros in any gaps between segments
+
+        @Return: bytes
+        """
+
+        start = self.start
+        image = bytearray(self.end - start)
+        for addr, data in self.segments:
+            image[addr - start:addr - start + len(data)] = data
+        return bytes(image)
+
+    def load(self, target) -> None:
+        """
+        Copy every segment in at its address
+
+        @Param target: Memory (or anything else with a load(addr, data) method), or a bytearray covering the
+                       address space
+        @Return: None
+        """
+
+        for addr, data in self.segments:
+            if hasattr(target, "load"):
+                target.load(addr, data)
+            else:
+                target[addr:addr + len(data)] = data
+
+    def copy(self) -> "Assembly":
+        """
+        Copy with its own segment list and symbol table (the segment bytes themselves can't change)
+
+        @Return: Assembly
+        """
+
+        return Assembly(list(self.segments), dict(self.symbols))
+
+
+def assemble(source: str, origin: int = 0x0000, cache_dir: str = None) -> Assembly:
+    """
+    Assemble source, or hand back a copy of the cached result if this exact source has been assembled before
+
+    @Param source: assembly source
+    @Param origin: address to assemble at until the first .org
+    @Param cache_dir: directory for the on-disk cache, or None for the in-memory one only
+    @Return: Assembly
+    """
+
+    key = hashlib.sha256(f"{ASSEMBLER_VERSION}:{origin}:{source}".encode()).hexdigest()
+    path = None if cache_dir is None else os.path.join(cache_dir, key + ".json")
+    result = _memo.get(key)
+    if result is not None:
+        if path is not None and not os.path.exists(path):
+            _write_cache(path, result)
+        return result.copy()
+
+    if path is not None:
+        result = _read_cache(path)
+
+    if result is None:
+        result = _Assembler(origin).assemble(source)
+        if path is not None:
+            _write_cache(path, result)
+
+    if len(_memo) >= MEMO_SIZE:
+        del _memo[next(iter(_memo))]
+    _memo[key] = result
+    return result.copy()
+
+
+def _read_cache(path: str) -> Assembly:
+    """
+    Load a cached assembly, anything unreadable counts as a miss
+
+    @Param path: cache file
+    @Return: Assembly, or None
+    """
+
+    try:
+        with open(path, "r") as f:
+            cached = json.load(f)
+        segments = [(start, bytes.fromhex(data)) for start, data in cached["segments"]]
+        return Assembly(segments, cached["symbols"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _write_cache(path: str, result: Assembly) -> None:
+    """
+    Save an assembly to the cache, through a temporary file so a reader never sees half of one
+
+    @Param path: cache file
+    @Param result: assembly to save
+    @Return: None
+    """
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp = f"{path}.{os.getpid()}.tmp"
+    with open(temp, "w") as f:
+        json.dump({"segments": [(start, data.hex()) for start, data in result.segments], "symbols": result.symbols}, f)
+    os.replace(temp, path)
+
+
+class _Assembler:
+    def __init__(self, origin: int) -> None:
+        """
+        State for assembling one source
+
+        @Param origin: address to assemble at until the first .org
+        @Return: None
+        """
+
+        self.pc = origin
+        self.symbols = {}
+        #list of [start address, bytearray]
+        self.segments = [[origin, bytearray()]]
+        #(segment bytes, offset, kind, expression, address of the line, line number) still to patch
+        self.fixups = []
+        #Line being assembled
+        self.number = 0
+
+    def assemble(self, source: str) -> Assembly:
+        """
+        One pass over the source, then patch the fixups
+
+        @Param source: assembly source
+        @Return: Assembly
+        """
+
+        for number, line in enumerate(source.splitlines(), 1):
+            self.number = number
+            self.line(_CODE.match(line).group(0), number)
+
+        for output, offset, kind, expr, pc, number in self.fixups:
+            value = self.evaluate(expr, pc, number)
+            if value is None:
+                raise AssemblyError(f"Undefined symbol in '{expr}'", number)
+            self.patch(output, offset, kind, value, pc, number)
+
+        segments = [(start, bytes(data)) for start, data in self.segments if data]
+        return Assembly(segments, dict(self.symbols))
+
+    def line(self, text: str, number: int) -> None:
+        """
+        Assemble one line, with the comment already taken off
+
+        @Param text: line of source
+        @Param number: line number
+        @Return: None
+        """
+
+        constant = _CONSTANT.match(text)
+        if constant and constant.group(1).upper() not in _MNEMONICS:
+            name, expr = constant.groups()
+            value = self.evaluate(expr, self.pc, number)
+            if value is None:
+                raise AssemblyError(f"Constant '{name}' uses a symbol that isn't defined yet", number)
+            self.define(name, value, number)
+            return
+
+        match = _LINE.match(text)
+        if match is None:
+            raise AssemblyError(f"Can't parse '{text.strip()}'", number)
+        label, word, operand = match.groups()
+        pc = self.pc
+        if label:
+            self.define(label, pc, number)
+        if not word:
+            return
+
+        word = word.upper()
+        if word in (".ORG", "*="):
+            addr = self.evaluate(operand, pc, number)
+            if addr is None or not 0x0000 <= addr <= 0xFFFF:
+                raise AssemblyError(".org needs an address that is already known", number)
+            self.pc = addr
+            self.segments.append([addr, bytearray()])
+        elif word == ".BYTE":
+            for arg in _ARGUMENTS.findall(operand):
+                arg = arg.strip()
+                if arg[:1] == "\"":
+                    self.emit(arg[1:-1].encode("ascii"))
+                else:
+                    self.value("byte", arg, pc, number)
+        elif word == ".WORD":
+            for arg in _ARGUMENTS.findall(operand):
+                self.value("word", arg.strip(), pc, number)
+        elif word in _MNEMONICS:
+            self.instruction(word, operand, number)
+        else:
+            raise AssemblyError(f"Unknown instruction '{word}'", number)
+
+    def define(self, name: str, value: int, number: int) -> None:
+        """
+        Add a symbol to the table
+
+        @Param name: symbol name
+        @Param value: symbol value
+        @Param number: line number
+        @Return: None
+        """
+
+        if name in self.symbols:
+            raise AssemblyError(f"'{name}' is already defined", number)
+        self.symbols[name] = value
+
+    def instruction(self, mnemonic: str, operand: str, number: int) -> None:
+        """
+        Work out the addressing mode from the operand and assemble the instruction
+
+        @Param mnemonic: instruction mnemonic, upper case
+        @Param operand: operand text
+        @Param number: line number
+        @Return: None
+        """
+
+        pc = self.pc
+        upper = operand.upper().replace(" ", "")
+        index = None
+
+        if not operand or upper == "A":
+            mode = IMPLIED if (mnemonic, IMPLIED) in _OPCODE_FOR else ACCUMULATOR
+            expr = None
+        elif operand.startswith("#"):
+            mode = IMMEDIATE
+            expr = operand[1:]
+        elif upper.startswith("(") and upper.endswith(",X)"):
+            mode = INDIRECT_X
+            expr = operand[1:operand.rindex(",")]
+        elif upper.startswith("(") and upper.endswith("),Y"):
+            mode = INDIRECT_Y
+            expr = operand[1:operand.rindex(")")]
+        elif upper.startswith("(") and upper.endswith(")"):
+            mode = INDIRECT
+            expr = operand[1:-1]
+        else:
+            expr = operand
+            if upper.endswith(",X") or upper.endswith(",Y"):
+                index = upper[-1]
+                expr = operand[:operand.rindex(",")]
+            mode = None
+
+        value = None if expr is None else self.evaluate(expr, pc, number)
+
+        #Plain and indexed operands could be zero page, absolute or a branch target
+        if mode is None:
+            if (mnemonic, RELATIVE) in _OPCODE_FOR and index is None:
+                mode = RELATIVE
+            else:
+                zero_page, absolute = {
+                    None: (ZERO_PAGE, ABSOLUTE), "X": (ZERO_PAGE_X, ABSOLUTE_X), "Y": (ZERO_PAGE_Y, ABSOLUTE_Y),
+                }[index]
+                fits = value is not None and 0x00 <= value <= 0xFF and not _WIDE.match(expr.strip())
+                if (mnemonic, zero_page) in _OPCODE_FOR and (fits or (mnemonic, absolute) not in _OPCODE_FOR):
+                    mode = zero_page
+                else:
+                    mode = absolute
+
+        opcode = _OPCODE_FOR.get((mnemonic, mode))
+        if opcode is None:
+            raise AssemblyError(f"{mnemonic} doesn't have that addressing mode", number)
+
+        self.emit(bytes([opcode]))
+        if mode in (IMPLIED, ACCUMULATOR):
+            return
+        if mode == RELATIVE:
+            kind = "relative"
+        elif mode in (ABSOLUTE, ABSOLUTE_X, ABSOLUTE_Y, INDIRECT):
+            kind = "word"
+        else:
+            kind = "byte"
+        self.value(kind, expr, pc, number)
+
+    def value(self, kind: str, expr: str, pc: int, number: int) -> None:
+        """
+        Emit an operand, or placeholder bytes and a fixup if it can't be worked out yet
+
+        @Param kind: "byte", "word" or "relative"
+        @Param expr: expression
+        @Param pc: address of the line, for * and for branch offsets
+        @Param number: line number
+        @Return: None
+        """
+
+        output = self.segments[-1][1]
+        offset = len(output)
+        self.emit(bytes(2 if kind == "word" else 1))
+        value = self.evaluate(expr, pc, number)
+        if value is None:
+            self.fixups.append((output, offset, kind, expr, pc, number))
+        else:
+            self.patch(output, offset, kind, value, pc, number)
+
+    def patch(self, output: bytearray, offset: int, kind: str, value: int, pc: int, number: int) -> None:
+        """
+        Write an operand into the output
+
+        @Param output: segment bytes
+        @Param offset: where the operand goes in the segment
+        @Param kind: "byte", "word" or "relative"
+        @Param value: value of the operand
+        @Param pc: address of the line
+        @Param number: line number
+        @Return: None
+        """
+
+        if kind == "relative":
+            #Branch offsets count from the end of the two byte instruction
+            value -= (pc + 2) & 0xFFFF
+            if not -0x80 <= value <= 0x7F:
+                raise AssemblyError(f"Branch is {value} bytes away, out of range", number)
+            output[offset] = value & 0xFF
+        elif kind == "byte":
+            if not -0x80 <= value <= 0xFF:
+                raise AssemblyError(f"{value} doesn't fit in a byte", number)
+            output[offset] = value & 0xFF
+        else:
+            if not -0x8000 <= value <= 0xFFFF:
+                raise AssemblyError(f"{value} doesn't fit in a word", number)
+            output[offset] = value & 0xFF
+            output[offset + 1] = (value >> 8) & 0xFF
+
+    def emit(self, data: bytes) -> None:
+        """
+        Append bytes to the current segment
+
+        @Param data: bytes to append
+        @Return: None
+        """
+
+        self.segments[-1][1] += data
+        self.pc += len(data)
+        if self.pc > 0x10000:
+            raise AssemblyError("Output runs past $FFFF", self.number)
+
+    def evaluate(self, expr: str, pc: int, number: int) -> int:
+        """
+        Work out the value of an expression
+
+        @Param expr: expression
+        @Param pc: value of *
+        @Param number: line number
+        @Return: int, or None if it uses a symbol that isn't defined yet
+        """
+
+        expr = expr.strip()
+        part = None
+        if expr[:1] in ("<", ">"):
+            part = expr[0]
+            expr = expr[1:].strip()
+        if not expr:
+            raise AssemblyError("Missing operand", number)
+
+        total = 0
+        sign = 1
+        for token in re.split(r"\s*([+-])\s*", expr):
+            if token == "+":
+                continue
+            if token == "-":
+                sign = -sign
+                continue
+            if token == "":
+                continue
+            term = self.term(token, pc, number)
+            if term is None:
+                return None
+            total += sign * term
+            sign = 1
+
+        if part == "<":
+            return total & 0xFF
+        if part == ">":
+            return (total >> 8) & 0xFF
+        return total
+
+    def term(self, token: str, pc: int, number: int) -> int:
+        """
+        Value of a single number or symbol
+
+        @Param token: number or symbol
+        @Param pc: value of *
+        @Param number: line number
+        @Return: int, or None if it is a symbol that isn't defined yet
+        """
+
+        try:
+            if token[0] == "$":
+                return int(token[1:], 16)
+            if token[0] == "%":
+                return int(token[1:], 2)
+            if token[0].isdigit():
+                return int(token, 10)
+        except ValueError:
+            raise AssemblyError(f"Bad number '{token}'", number)
+        if len(token) == 3 and token[0] == token[2] == "'":
+            return ord(token[1])
+        if token == "*":
+            return pc
+        if _SYMBOL.match(token):
+            return self.symbols.get(token)
+        raise AssemblyError(f"Can't make sense of '{token}'", number)
@@ -0,0 +1,807 @@
+import sys
+from array import array
+from itertools import compress
+from operator import add, itemgetter
+
+from py6502.memory import Memory
+from py6502.processor import (
+    Processor, NZ, ALU_TABLES, FLAG_C, FLAG_Z, FLAG_I, FLAG_D, FLAG_B, FLAG_U, FLAG_V, FLAG_N,
+)
+from py6502.opcodes import OPCODES, PAGE_PENALTY
+from py6502.addressing import (
+    IMPLIED, ACCUMULATOR, IMMEDIATE, ZERO_PAGE, ZERO_PAGE_X, ZERO_PAGE_Y, ABSOLUTE, ABSOLUTE_X, ABSOLUTE_Y,
+    INDIRECT, INDIRECT_X, INDIRECT_Y, RELATIVE,
+)
+
+"""
+Batched 6502 execution
+
+Runs a whole batch of independent machines in lockstep instead of one Processor at a time.
+
+Registers for every machine live in columns, one array.array per register indexed by machine number, and their
+memories sit back to back in one contiguous bytearray, 64K per machine. Each step fetches the opcode every
+machine is about to execute in one go and groups the machines that are on the same one, then runs each group
+through the kernel for that opcode.
+
+There are two kinds of kernel. Lane kernels work on whole columns at once: a column of 8-bit registers is
+treated as a string of bytes, so anything that maps one byte to another (INX, TAX, setting N and Z, clearing a
+flag) is a single bytes.translate, and the rest (masking the result into just the machines in the group, adding
+to the program counters) is done with big integer arithmetic, one lane per machine. The cost of a lane kernel
+depends on the size of the batch rather than the group, so they are only used for groups of at least 1 in
+LANE_SHARE machines. They cover the instructions that don't touch memory past their operands: register
+transfers and increments, flag changes, shifts of the accumulator, immediate loads, logic and compares,
+branches and JMP.
+
+Everything else, and the smaller groups, go through loop kernels, which loop over the group with the addressing
+mode, the instruction and the cycle count for one opcode written out inline. Both kinds are generated from
+tables and compiled once per process. NumPy would vectorize the memory instructions as well, but it isn't a
+dependency of this package.
+
+Batching pays for itself when most of the batch is running the same code, in step or close to it. Machines that
+have gone their own way all end up in small groups and run about as fast as a loop over Processors.
+
+Machines only get plain RAM (no Bus devices). A machine that hits an opcode the 6502 doesn't have is
+halted and skipped from then on, the rest of the batch keeps going.
+"""
+
+#Loop kernel source templates
+#
+#Inside a kernel, i is the machine, base is where its 64K starts in the shared buffer and p is its program
+#counter sitting on the opcode. Register arrays are a, x, y, sp, pc, st (status) and cyc (cycles)
+#
+#Addressing modes leave the effective address in addr and the address of the next instruction in npc, which
+#jumps, branches and returns then change. Once the instruction is done the kernel stores npc
+
+_MODES = {
+    IMPLIED: "npc = (p + 1) & 0xFFFF",
+    ACCUMULATOR: "npc = (p + 1) & 0xFFFF",
+    IMMEDIATE: "addr = (p + 1) & 0xFFFF\nnpc = (p + 2) & 0xFFFF",
+    ZERO_PAGE: "addr = mem[base | ((p + 1) & 0xFFFF)]\nnpc = (p + 2) & 0xFFFF",
+    ZERO_PAGE_X: "addr = (mem[base | ((p + 1) & 0xFFFF)] + x[i]) & 0xFF\nnpc = (p + 2) & 0xFFFF",
+    ZERO_PAGE_Y: "addr = (mem[base | ((p + 1) & 0xFFFF)] + y[i]) & 0xFF\nnpc = (p + 2) & 0xFFFF",
+    ABSOLUTE: (
+        "addr = mem[base | ((p + 1) & 0xFFFF)] | (mem[base | ((p + 2) & 0xFFFF)] << 8)\n"
+        "npc = (p + 3) & 0xFFFF"
+    ),
+    ABSOLUTE_X: (
+        "ptr = mem[base | ((p + 1) & 0xFFFF)] | (mem[base | ((p + 2) & 0xFFFF)] << 8)\n"
+        "addr = (ptr + x[i]) & 0xFFFF\n"
+        "npc = (p + 3) & 0xFFFF"
+    ),
+    ABSOLUTE_Y: (
+        "ptr = mem[base | ((p + 1) & 0xFFFF)] | (mem[base | ((p + 2) & 0xFFFF)] << 8)\n"
+        "addr = (ptr + y[i]) & 0xFFFF\n"
+        "npc = (p + 3) & 0xFFFF"
+    ),
+    #Same page wrap bug as the real thing, see Processor._ea_indirect
+    INDIRECT: (
+        "ptr = mem[base | ((p + 1) & 0xFFFF)] | (mem[base | ((p + 2) & 0xFFFF)] << 8)\n"
+        "addr = mem[base | ptr] | (mem[base | (ptr & 0xFF00) | ((ptr + 1) & 0xFF)] << 8)\n"
+        "npc = (p + 3) & 0xFFFF"
+    ),
+    INDIRECT_X: (
+        "ptr = (mem[base | ((p + 1) & 0xFFFF)] + x[i]) & 0xFF\n"
+        "addr = mem[base | ptr] | (mem[base | ((ptr + 1) & 0xFF)] << 8)\n"
+        "npc = (p + 2) & 0xFFFF"
+    ),
+    INDIRECT_Y: (
+        "ptr = mem[base | ((p + 1) & 0xFFFF)]\n"
+        "ptr = mem[base | ptr] | (mem[base | ((ptr + 1) & 0xFF)] << 8)\n"
+        "addr = (ptr + y[i]) & 0xFFFF\n"
+        "npc = (p + 2) & 0xFFFF"
+    ),
+    RELATIVE: (
+        "offset = mem[base | ((p + 1) & 0xFFFF)]\n"
+        "npc = (p + 2) & 0xFFFF\n"
+        "addr = (npc + offset - ((offset & 0x80) << 1)) & 0xFFFF"
+    ),
+}
+
+#Instructions, using addr from the addressing mode. Read-modify-write ones use {load} and {store} so the same
+#template works on memory and (in accumulator mode) on the accumulator
+
+_SET_NZ = "st[i] = (st[i] & 0x7D) | NZ[value]"
+_PUSH = "s = sp[i]\nmem[base | 0x0100 | s] = {value}\nsp[i] = (s - 1) & 0xFF"
+_PULL = "s = (sp[i] + 1) & 0xFF\nsp[i] = s\n{target} = mem[base | 0x0100 | s]"
+
+
+def _load(reg: str) -> str:
+    return f"value = mem[base | addr]\n{reg}[i] = value\n" + _SET_NZ
+
+
+def _transfer(source: str, dest: str) -> str:
+    return f"value = {source}[i]\n{dest}[i] = value\n" + _SET_NZ
+
+
+def _step(reg: str, delta: int) -> str:
+    return f"value = ({reg}[i] + {delta}) & 0xFF\n{reg}[i] = value\n" + _SET_NZ
+
+
+def _logic(op: str) -> str:
+    return f"value = a[i] {op} mem[base | addr]\na[i] = value\n" + _SET_NZ
+
+
+def _compare(reg: str) -> str:
+    return f"diff = {reg}[i] - mem[base | addr]\nst[i] = (st[i] & 0x7C) | NZ[diff & 0xFF] | (diff >= 0)"
+
+
+def _arithmetic(table: int) -> str:
+    #ADC / SBC through the lookup tables, see ALU_TABLES
+    return (
+        f"s = st[i]\nentry = ALU[{table} | ((s & 0x08) >> 3)][((s & 0x01) << 16) | (a[i] << 8) | mem[base | addr]]\n"
+        "a[i] = entry & 0xFF\nst[i] = (s & 0x3C) | ((entry >> 8) & 0xC3)"
+    )
+
+
+def _branch(flag: int, on: bool) -> str:
+    cond = f"st[i] & {flag}" if on else f"not st[i] & {flag}"
+    return f"if {cond}:\n    cyc[i] += 2 if (addr ^ npc) & 0xFF00 else 1\n    npc = addr"
+
+
+_SHIFTS = {
+    "ASL": "carry = value >> 7\nvalue = (value << 1) & 0xFF",
+    "LSR": "carry = value & 0x01\nvalue >>= 1",
+    "ROL": "carry = value >> 7\nvalue = ((value << 1) | (st[i] & 0x01)) & 0xFF",
+    "ROR": "carry = value & 0x01\nvalue = (value >> 1) | ((st[i] & 0x01) << 7)",
+}
+
+_OPERATIONS = {
+    "NOP": "pass",
+    "CLC": f"st[i] &= {~FLAG_C & 0xFF}",
+    "CLD": f"st[i] &= {~FLAG_D & 0xFF}",
+    "CLI": f"st[i] &= {~FLAG_I & 0xFF}",
+    "CLV": f"st[i] &= {~FLAG_V & 0xFF}",
+    "SEC": f"st[i] |= {FLAG_C}",
+    "SED": f"st[i] |= {FLAG_D}",
+    "SEI": f"st[i] |= {FLAG_I}",
+    "LDA": _load("a"),
+    "LDX": _load("x"),
+    "LDY": _load("y"),
+    "STA": "mem[base | addr] = a[i]",
+    "STX": "mem[base | addr] = x[i]",
+    "STY": "mem[base | addr] = y[i]",
+    "TAX": _transfer("a", "x"),
+    "TXA": _transfer("x", "a"),
+    "TAY": _transfer("a", "y"),
+    "TYA": _transfer("y", "a"),
+    "TSX": _transfer("sp", "x"),
+    "TXS": "sp[i] = x[i]",
+    "INX": _step("x", 1),
+    "INY": _step("y", 1),
+    "DEX": _step("x", -1),
+    "DEY": _step("y", -1),
+    "INC": "value = (mem[base | addr] + 1) & 0xFF\nmem[base | addr] = value\n" + _SET_NZ,
+    "DEC": "value = (mem[base | addr] - 1) & 0xFF\nmem[base | addr] = value\n" + _SET_NZ,
+    "AND": _logic("&"),
+    "EOR": _logic("^"),
+    "ORA": _logic("|"),
+    "BIT": (
+        "value = mem[base | addr]\n"
+        "st[i] = (st[i] & 0x3D) | (value & 0xC0) | (0 if a[i] & value else 0x02)"
+    ),
+    "ADC": _arithmetic(0),
+    "SBC": _arithmetic(2),
+    "CMP": _compare("a"),
+    "CPX": _compare("x"),
+    "CPY": _compare("y"),
+    "BCC": _branch(FLAG_C, False),
+    "BCS": _branch(FLAG_C, True),
+    "BEQ": _branch(FLAG_Z, True),
+    "BNE": _branch(FLAG_Z, False),
+    "BMI": _branch(FLAG_N, True),
+    "BPL": _branch(FLAG_N, False),
+    "BVC": _branch(FLAG_V, False),
+    "BVS": _branch(FLAG_V, True),
+    "JMP": "npc = addr",
+    "JSR": (
+        "ret = (p + 2) & 0xFFFF\n"
+        + _PUSH.format(value="ret >> 8") + "\n"
+        + _PUSH.format(value="ret & 0xFF") + "\n"
+        + "npc = addr"
+    ),
+    "RTS": (
+        _PULL.format(target="low_byte") + "\n"
+        + _PULL.format(target="high_byte") + "\n"
+        + "npc = (((high_byte << 8) | low_byte) + 1) & 0xFFFF"
+    ),
+    "PHA": _PUSH.format(value="a[i]"),
+    "PHP": _PUSH.format(value=f"st[i] | {FLAG_B | FLAG_U}"),
+    "PLA": _PULL.format(target="value") + "\na[i] = value\n" + _SET_NZ,
+    #Break and bit 5 aren't real flags, so they keep whatever they were
+    "PLP": _PULL.format(target="value") + "\nst[i] = (value & 0xCF) | (st[i] & 0x30)",
+    "BRK": (
+        "ret = (p + 2) & 0xFFFF\n"
+        + _PUSH.format(value="ret >> 8") + "\n"
+        + _PUSH.format(value="ret & 0xFF") + "\n"
+        + _PUSH.format(value=f"st[i] | {FLAG_B | FLAG_U}") + "\n"
+        + f"st[i] |= {FLAG_I}\n"
+        + "npc = mem[base | 0xFFFE] | (mem[base | 0xFFFF] << 8)"
+    ),
+    "RTI": (
+        _PULL.format(target="value") + "\n"
+        + "st[i] = (value & 0xCF) | (st[i] & 0x30)\n"
+        + _PULL.format(target="low_byte") + "\n"
+        + _PULL.format(target="high_byte") + "\n"
+        + "npc = (high_byte << 8) | low_byte"
+    ),
+}
+
+_KERNEL = """
+def make(mem, a, x, y, sp, pc, st, cyc, halted, NZ, ALU):
+    def kernel(group):
+        for i in group:
+            base = i << 16
+            p = pc[i]
+{body}
+    return kernel
+"""
+
+#Halted machines are fetched as _HALTED from then on, so they drop out of the batch
+_ILLEGAL = "halted[i] = 1"
+
+_NEXT = "pc[i] = npc"
+
+#Kernel factories, one per opcode, compiled the first time they are needed
+_factories = None
+
+
+def _indent(source: str, spaces: int) -> str:
+    return "\n".join(" " * spaces + line for line in source.split("\n"))
+
+
+def _kernel_source(opcode: int) -> str:
+    """
+    Source for the kernel factory of one opcode
+
+    @Param opcode: opcode
+    @Return: str
+    """
+
+    if opcode not in OPCODES:
+        return _KERNEL.format(body=_indent(_ILLEGAL, 12))
+
+    mnemonic, mode, cycles = OPCODES[opcode]
+    if mnemonic in _SHIFTS:
+        if mode == ACCUMULATOR:
+            load, store = "value = a[i]", "a[i] = value"
+        else:
+            load, store = "value = mem[base | addr]", "mem[base | addr] = value"
+        operation = f"{load}\n{_SHIFTS[mnemonic]}\n{store}\nst[i] = (st[i] & 0x7C) | NZ[value] | carry"
+    else:
+        operation = _OPERATIONS[mnemonic]
+
+    #Indexed modes leave the address before indexing in ptr, see PAGE_PENALTY
+    penalty = "if (addr ^ ptr) & 0xFF00:\n    cyc[i] += 1\n" if PAGE_PENALTY[opcode] else ""
+    body = f"{_MODES[mode]}\n{penalty}{operation}\ncyc[i] += {cycles}\n{_NEXT}"
+    return _KERNEL.format(body=_indent(body, 12))
+
+
+def _kernel_factories() -> list:
+    """
+    Compile the kernel factory for every opcode, only the first time it is called
+
+    @Return: list
+    """
+
+    global _factories
+    if _factories is None:
+        factories = []
+        for opcode in range(256):
+            namespace = {}
+            exec(compile(_kernel_source(opcode), f"<batch kernel ${opcode:02X}>", "exec"), namespace)
+            factories.append(namespace["make"])
+        _factories = factories
+    return _factories
+
+
+#Lane kernels
+#
+#A column is read into one int with int.from_bytes in the machine's own byte order, so whatever the width of
+#the column, lane i of the int is machine i. Masks have every bit set in the lanes of the machines in the group
+#and none elsewhere, and results are only ever written back through a mask. Additions that could carry out of
+#a lane are done 15 bits at a time with the top bit put back on its own, see Batch._add16
+
+#A group goes through its lane kernel when it holds at least 1 in LANE_SHARE of the batch, below that looping
+#over the machines is cheaper
+LANE_SHARE = 32
+
+_ORDER = sys.byteorder
+
+#Opcode halted machines are fetched as, one the 6502 doesn't have
+_HALTED = 0x02
+
+#Cycles lane kernels add up in 16-bit lanes, which are folded into the cycles column at the end of a run or
+#after this many steps, well before a lane can overflow
+_FLUSH = 8192
+
+
+def _table(function) -> bytes:
+    return bytes(function(value) & 0xFF for value in range(256))
+
+
+#Translate tables. _SELECT picks out the machines on one opcode, the rest map a register or the status byte
+_SELECT = [_table(lambda value: 0xFF if value == opcode else 0) for opcode in range(256)]
+_NONZERO = _table(lambda value: 0xFF if value else 0)
+_CARRY = _table(lambda value: 0xFF if value & FLAG_C else 0)
+_KEEP_NZ = _table(lambda value: value & ~(FLAG_N | FLAG_Z))
+_KEEP_NZC = _table(lambda value: value & ~(FLAG_N | FLAG_Z | FLAG_C))
+_SAME = _table(lambda value: value)
+
+#Implied instructions that only move or change registers, as (source, destination, table, sets N and Z)
+_REGISTERS = {
+    "NOP": (None, None, None, False),
+    "CLC": ("status", "status", _table(lambda value: value & ~FLAG_C), False),
+    "CLD": ("status", "status", _table(lambda value: value & ~FLAG_D), False),
+    "CLI": ("status", "status", _table(lambda value: value & ~FLAG_I), False),
+    "CLV": ("status", "status", _table(lambda value: value & ~FLAG_V), False),
+    "SEC": ("status", "status", _table(lambda value: value | FLAG_C), False),
+    "SED": ("status", "status", _table(lambda value: value | FLAG_D), False),
+    "SEI": ("status", "status", _table(lambda value: value | FLAG_I), False),
+    "TAX": ("reg_a", "reg_x", _SAME, True),
+    "TXA": ("reg_x", "reg_a", _SAME, True),
+    "TAY": ("reg_a", "reg_y", _SAME, True),
+    "TYA": ("reg_y", "reg_a", _SAME, True),
+    "TSX": ("stack_pointer", "reg_x", _SAME, True),
+    "TXS": ("reg_x", "stack_pointer", _SAME, False),
+    "INX": ("reg_x", "reg_x", _table(lambda value: value + 1), True),
+    "INY": ("reg_y", "reg_y", _table(lambda value: value + 1), True),
+    "DEX": ("reg_x", "reg_x", _table(lambda value: value - 1), True),
+    "DEY": ("reg_y", "reg_y", _table(lambda value: value - 1), True),
+}
+
+#Shifts of the accumulator, as (result with carry clear, result with carry set, carry out)
+_SHIFT_LANES = {
+    "ASL": (_table(lambda value: value << 1), _table(lambda value: value << 1), _table(lambda value: value >> 7)),
+    "LSR": (_table(lambda value: value >> 1), _table(lambda value: value >> 1), _table(lambda value: value & 0x01)),
+    "ROL": (
+        _table(lambda value: value << 1), _table(lambda value: (value << 1) | 0x01), _table(lambda value: value >> 7)
+    ),
+    "ROR": (
+        _table(lambda value: value >> 1), _table(lambda value: (value >> 1) | 0x80), _table(lambda value: value & 0x01)
+    ),
+}
+
+#Immediate instructions, by register loaded, operator applied to the accumulator or register compared
+_LOADS = {"LDA": "reg_a", "LDX": "reg_x", "LDY": "reg_y"}
+_LOGIC = {"AND": int.__and__, "ORA": int.__or__, "EOR": int.__xor__}
+_COMPARES = {"CMP": "reg_a", "CPX": "reg_x", "CPY": "reg_y"}
+
+#Branches, by the machines that take them
+_BRANCHES = {
+    "BCC": _table(lambda value: 0 if value & FLAG_C else 0xFF),
+    "BCS": _table(lambda value: 0xFF if value & FLAG_C else 0),
+    "BEQ": _table(lambda value: 0xFF if value & FLAG_Z else 0),
+    "BNE": _table(lambda value: 0 if value & FLAG_Z else 0xFF),
+    "BMI": _table(lambda value: 0xFF if value & FLAG_N else 0),
+    "BPL": _table(lambda value: 0 if value & FLAG_N else 0xFF),
+    "BVC": _table(lambda value: 0 if value & FLAG_V else 0xFF),
+    "BVS": _table(lambda value: 0xFF if value & FLAG_V else 0),
+}
+
+#Low and high byte of how far a taken branch moves the program counter from the opcode, 2 + signed offset
+_BRANCH_LOW = _table(lambda value: value + 2)
+_BRANCH_HIGH = _table(lambda value: (2 + value - ((value & 0x80) << 1)) >> 8)
+
+
+def _lanes(column) -> int:
+    return int.from_bytes(column, _ORDER)
+
+
+def _store(column, value: int) -> None:
+    view = memoryview(column).cast("B")
+    view[:] = value.to_bytes(len(view), _ORDER)
+
+
+def _blend(column, value: int, mask: int) -> None:
+    old = _lanes(column)
+    _store(column, old ^ ((old ^ value) & mask))
+
+
+def _widen(lanes: bytes, width: int) -> int:
+    """
+    8-bit lanes zero extended to lanes of width bytes
+
+    @Param lanes: one byte per lane
+    @Param width: bytes per lane to widen to
+    @Return: int
+    """
+
+    wide = bytearray(len(lanes) * width)
+    wide[0 if _ORDER == "little" else width - 1::width] = lanes
+    return int.from_bytes(wide, _ORDER)
+
+
+def _narrow(value: int, count: int, width: int, byte: int) -> bytes:
+    """
+    One byte out of every lane
+
+    @Param value: lanes
+    @Param count: number of lanes
+    @Param width: bytes per lane
+    @Param byte: which byte of each lane, 0 for the lowest
+    @Return: bytes
+    """
+
+    raw = value.to_bytes(count * width, _ORDER)
+    return raw[byte if _ORDER == "little" else width - 1 - byte::width]
+
+
+def _gather(mem: bytearray, addresses: list) -> bytes:
+    #itemgetter hands back a bare value rather than a tuple when it only has one item
+    if len(addresses) < 2:
+        return bytes(mem[addr] for addr in addresses)
+    return bytes(itemgetter(*addresses)(mem))
+
+
+class Batch:
+    def __init__(self, count: int) -> None:
+        """
+        A batch of independent 6502 machines stepped together
+
+        Registers are arrays indexed by machine number, and memory is a single buffer where machine i owns
+        bytes i * 64K -> (i + 1) * 64K. Every machine starts out zeroed with the stack pointer at $FD and the
+        interrupt disable flag set, same as a Processor after reset() apart from the program counter
+
+        @Param count: number of machines
+        @Return: None
+        """
+
+        self.count = count
+
+        self.reg_a = array("B", bytes(count))
+        self.reg_x = array("B", bytes(count))
+        self.reg_y = array("B", bytes(count))
+        self.stack_pointer = array("B", bytes([0xFD]) * count)
+        self.program_counter = array("H", [0]) * count
+        self.status = array("B", bytes([FLAG_U | FLAG_B | FLAG_I]) * count)
+        self.cycles = array("Q", [0]) * count
+
+        #Machines that have stopped, see module docstring
+        self.halted = bytearray(count)
+
+        self.memory = bytearray(count << 16)
+
+        self._machines = range(count)
+        self._bases = [i << 16 for i in range(count)]
+
+        #The same value in every lane, for the lane kernels
+        self._ones8 = int.from_bytes(bytes([1]) * count, _ORDER)
+        self._ones16 = _lanes(array("H", [0x0001]) * count)
+        self._top16 = _lanes(array("H", [0x8000]) * count)
+        self._rest16 = _lanes(array("H", [0x7FFF]) * count)
+
+        #Cycles the lane kernels have added since the last flush, see _FLUSH
+        self._pending = 0
+
+        #Operands fetched for the current step, by offset from the opcode
+        self._fetched = {}
+
+        #256-slot kernel tables, the batch equivalent of the processor's dispatch table
+        self._kernels = [
+            make(
+                self.memory, self.reg_a, self.reg_x, self.reg_y, self.stack_pointer, self.program_counter,
+                self.status, self.cycles, self.halted, NZ, ALU_TABLES,
+            )
+            for make in _kernel_factories()
+        ]
+        self._lane_kernels = [self._lane_kernel(opcode) for opcode in range(256)]
+
+    def load(self, machine: int, addr: int, data: bytes) -> None:
+        """
+        Copy a block of bytes into one machine's memory
+
+        @Param machine: machine number
+        @Param addr: address to start loading at
+        @Param data: bytes to load
+        @Return: None
+        """
+
+        if not 0x0000 <= addr <= addr + len(data) <= 0x10000:
+            raise ValueError("Memory range is not valid")
+        base = machine << 16
+        self.memory[base + addr:base + addr + len(data)] = data
+
+    def view(self, machine: int) -> memoryview:
+        """
+        Zero-copy view of one machine's 64K of memory
+
+        @Param machine: machine number
+        @Return: memoryview
+        """
+
+        base = machine << 16
+        return memoryview(self.memory)[base:base + 0x10000]
+
+    def load_processor(self, machine: int, proc: Processor) -> None:
+        """
+        Copy the registers, flags and memory of a Processor into one machine
+
+        @Param machine: machine number
+        @Param proc: processor to copy from, its memory has to be a full 64K map
+        @Return: None
+        """
+
+        self.reg_a[machine] = proc.reg_a & 0xFF
+        self.reg_x[machine] = proc.reg_x & 0xFF
+        self.reg_y[machine] = proc.reg_y & 0xFF
+        self.stack_pointer[machine] = proc.stack_pointer & 0xFF
+        self.program_counter[machine] = proc.program_counter & 0xFFFF
+        self.status[machine] = proc.pack_status()
+        self.cycles[machine] = proc.cycles
+        self.halted[machine] = 0
+        self.load(machine, 0x0000, proc.memory.view())
+
+    def store_processor(self, machine: int, proc: Processor) -> None:
+        """
+        Copy one machine's registers, flags and memory back out into a Processor
+
+        @Param machine: machine number
+        @Param proc: processor to copy into, its memory has to be a full 64K map
+        @Return: None
+        """
+
+        proc.reg_a = self.reg_a[machine]
+        proc.reg_x = self.reg_x[machine]
+        proc.reg_y = self.reg_y[machine]
+        proc.stack_pointer = self.stack_pointer[machine]
+        proc.program_counter = self.program_counter[machine]
+        proc.unpack_status(self.status[machine])
+        proc.cycles = self.cycles[machine]
+        proc.memory.load(0x0000, self.view(machine))
+
+    def to_processor(self, machine: int) -> Processor:
+        """
+        A new Processor (with its own Memory) holding a copy of one machine
+
+        @Param machine: machine number
+        @Return: Processor
+        """
+
+        proc = Processor(Memory())
+        self.store_processor(machine, proc)
+        return proc
+
+    def _lane_kernel(self, opcode: int):
+        """
+        Lane kernel for one opcode, if it has one
+
+        @Param opcode: opcode
+        @Return: callable taking the group's mask, or None
+        """
+
+        if opcode not in OPCODES:
+            return None
+
+        mnemonic, mode, cycles = OPCODES[opcode]
+        if mode == IMPLIED and mnemonic in _REGISTERS:
+            source, dest, table, nz = _REGISTERS[mnemonic]
+            if source is None:
+                return lambda mask: self._advance(_widen(mask, 2), 1, cycles)
+            source, dest = getattr(self, source), getattr(self, dest)
+            return lambda mask: self._lane_register(source, dest, table, nz, cycles, mask)
+        if mode == ACCUMULATOR:
+            clear, carried, carry = _SHIFT_LANES[mnemonic]
+            return lambda mask: self._lane_shift(clear, carried, carry, cycles, mask)
+        if mode == IMMEDIATE and mnemonic in _LOADS:
+            dest = getattr(self, _LOADS[mnemonic])
+            return lambda mask: self._lane_load(dest, cycles, mask)
+        if mode == IMMEDIATE and mnemonic in _LOGIC:
+            operator = _LOGIC[mnemonic]
+            return lambda mask: self._lane_logic(operator, cycles, mask)
+        if mode == IMMEDIATE and mnemonic in _COMPARES:
+            register = getattr(self, _COMPARES[mnemonic])
+            return lambda mask: self._lane_compare(register, cycles, mask)
+        if mode == RELATIVE:
+            taking = _BRANCHES[mnemonic]
+            return lambda mask: self._lane_branch(taking, cycles, mask)
+        if mode == ABSOLUTE and mnemonic == "JMP":
+            return lambda mask: self._lane_jump(cycles, mask)
+        return None
+
+    def _add16(self, first: int, second: int) -> int:
+        #Lane by lane addition of 16-bit lanes, wrapping within each lane
+        rest = self._rest16
+        return ((first & rest) + (second & rest)) ^ ((first ^ second) & self._top16)
+
+    def _advance(self, wide: int, length: int, cycles: int) -> None:
+        """
+        Move the machines in a group on to their next instruction and count their cycles
+
+        @Param wide: the group's mask in 16-bit lanes, low byte only
+        @Param length: instruction length, 0 if the program counters have already been set
+        @Param cycles: cycles taken
+        @Return: None
+        """
+
+        if length:
+            pc = self.program_counter
+            _store(pc, self._add16(_lanes(pc), wide & (length * self._ones16)))
+        self._pending += wide & (cycles * self._ones16)
+
+    def _set_status(self, mask: int, keep: bytes, *flags: bytes) -> None:
+        """
+        Replace some of the status flags of the machines in a group
+
+        @Param mask: the group's mask
+        @Param keep: translate table clearing the flags being replaced
+        @Param flags: new flags, one byte per machine
+        @Return: None
+        """
+
+        status = _lanes(bytes(self.status).translate(keep))
+        for lanes in flags:
+            status |= _lanes(lanes)
+        _blend(self.status, status, mask)
+
+    def _operands(self, offset: int) -> bytes:
+        """
+        The byte at program counter + offset for every machine, fetched at most once per step
+
+        Later groups in the same step can reuse it, since a group only ever changes its own machines
+
+        @Param offset: bytes past the opcode
+        @Return: bytes
+        """
+
+        fetched = self._fetched.get(offset)
+        if fetched is None:
+            pc = array("H")
+            pc.frombytes(
+                self._add16(_lanes(self.program_counter), offset * self._ones16).to_bytes(2 * self.count, _ORDER)
+            )
+            fetched = self._fetched[offset] = _gather(self.memory, list(map(add, self._bases, pc)))
+        return fetched
+
+    def _lane_register(self, source: array, dest: array, table: bytes, nz: bool, cycles: int, mask: bytes) -> None:
+        value = bytes(source).translate(table)
+        lanes = _lanes(mask)
+        _blend(dest, _lanes(value), lanes)
+        if nz:
+            self._set_status(lanes, _KEEP_NZ, value.translate(NZ))
+        self._advance(_widen(mask, 2), 1, cycles)
+
+    def _lane_shift(self, clear: bytes, carried: bytes, carry: bytes, cycles: int, mask: bytes) -> None:
+        lanes = _lanes(mask)
+        reg_a = bytes(self.reg_a)
+        value = reg_a.translate(clear)
+        if carried != clear:
+            low, high = _lanes(value), _lanes(reg_a.translate(carried))
+            value = (low ^ ((low ^ high) & _lanes(bytes(self.status).translate(_CARRY)))).to_bytes(self.count, _ORDER)
+        _blend(self.reg_a, _lanes(value), lanes)
+        self._set_status(lanes, _KEEP_NZC, value.translate(NZ), reg_a.translate(carry))
+        self._advance(_widen(mask, 2), 1, cycles)
+
+    def _lane_load(self, dest: array, cycles: int, mask: bytes) -> None:
+        value = self._operands(1)
+        lanes = _lanes(mask)
+        _blend(dest, _lanes(value), lanes)
+        self._set_status(lanes, _KEEP_NZ, value.translate(NZ))
+        self._advance(_widen(mask, 2), 2, cycles)
+
+    def _lane_logic(self, operator, cycles: int, mask: bytes) -> None:
+        value = operator(_lanes(self.reg_a), _lanes(self._operands(1)))
+        lanes = _lanes(mask)
+        _blend(self.reg_a, value, lanes)
+        self._set_status(lanes, _KEEP_NZ, value.to_bytes(self.count, _ORDER).translate(NZ))
+        self._advance(_widen(mask, 2), 2, cycles)
+
+    def _lane_compare(self, register: array, cycles: int, mask: bytes) -> None:
+        #With $100 added on the register the subtraction can't borrow from the next lane, and bit 8 is left set
+        #exactly when there was no borrow, which is the carry
+        diff = (_widen(bytes(register), 2) | (self._ones16 << 8)) - _widen(self._operands(1), 2)
+        self._set_status(
+            _lanes(mask), _KEEP_NZC, _narrow(diff, self.count, 2, 0).translate(NZ), _narrow(diff, self.count, 2, 1)
+        )
+        self._advance(_widen(mask, 2), 2, cycles)
+
+    def _lane_branch(self, taking: bytes, cycles: int, mask: bytes) -> None:
+        count = self.count
+        lanes = _lanes(mask)
+        taken = _lanes(bytes(self.status).translate(taking)) & lanes
+        offset = self._operands(1)
+
+        #How far each program counter moves, 2 for the machines that don't take the branch
+        low = ((2 * self._ones8) & ~taken | _lanes(offset.translate(_BRANCH_LOW)) & taken) & lanes
+        high = _lanes(offset.translate(_BRANCH_HIGH)) & taken
+        pc = _lanes(self.program_counter)
+        wide = _widen(mask, 2)
+        delta = _widen(low.to_bytes(count, _ORDER), 2) | (_widen(high.to_bytes(count, _ORDER), 2) << 8)
+        target = self._add16(pc, delta)
+        _store(self.program_counter, target)
+
+        #One more cycle for taking the branch and another if it lands on a different page from the next
+        #instruction, whose high byte is brought down to the low byte of the lane and turned into 0 or 1
+        crossed = ((self._add16(pc, wide & (2 * self._ones16)) ^ target) >> 8) & wide
+        crossed = ((crossed + wide) >> 8) & self._ones16
+        self._advance(wide, 0, cycles)
+        self._pending += (_widen(taken.to_bytes(count, _ORDER), 2) & self._ones16) + crossed
+
+    def _lane_jump(self, cycles: int, mask: bytes) -> None:
+        wide = _widen(mask, 2)
+        target = _widen(self._operands(1), 2) | (_widen(self._operands(2), 2) << 8)
+        _blend(self.program_counter, target, wide | (wide << 8))
+        self._advance(wide, 0, cycles)
+
+    def _fetch(self) -> bytes:
+        """
+        The opcode every machine is about to execute, with halted machines on _HALTED
+
+        @Return: bytes (one per machine)
+        """
+
+        opcodes = _gather(self.memory, list(map(add, self._bases, self.program_counter)))
+        halted = self.halted
+        if halted.count(0) != self.count:
+            stopped = _lanes(halted.translate(_NONZERO))
+            opcodes = ((_lanes(opcodes) & ~stopped) | (stopped & _HALTED * self._ones8)).to_bytes(self.count, _ORDER)
+        return opcodes
+
+    def _flush(self) -> None:
+        """
+        Fold the cycles the lane kernels have counted into the cycles column
+
+        @Return: None
+        """
+
+        if self._pending:
+            pending = self._pending
+            low = _widen(_narrow(pending, self.count, 2, 0), 8)
+            high = _widen(_narrow(pending, self.count, 2, 1), 8)
+            _store(self.cycles, _lanes(self.cycles) + low + (high << 8))
+            self._pending = 0
+
+    def step(self) -> int:
+        """
+        Step every running machine by one instruction
+
+        @Return: int (number of machines stepped)
+        """
+
+        return self.run(1)
+
+    def run(self, steps: int) -> int:
+        """
+        Step every running machine a number of times
+
+        Each step fetches every machine's opcode and runs each opcode's group through its lane kernel if the
+        group is big enough, or its loop kernel if not. Machines that halt during a step aren't counted. Stops
+        early if every machine has halted
+
+        Registers and memory can be changed freely between calls, but not from inside a run
+
+        @Param steps: number of steps
+        @Return: int (total instructions executed across the batch)
+        """
+
+        kernels = self._kernels
+        lane_kernels = self._lane_kernels
+        machines = self._machines
+        count = self.count
+
+        total = 0
+        for step in range(steps):
+            opcodes = self._fetch()
+            self._fetched = {}
+
+            stepped = 0
+            for opcode in set(opcodes):
+                selected = opcodes.translate(_SELECT[opcode])
+                if opcode not in OPCODES:
+                    kernels[opcode](compress(machines, selected))
+                    continue
+
+                group = opcodes.count(opcode)
+                if lane_kernels[opcode] is not None and group * LANE_SHARE >= count:
+                    lane_kernels[opcode](selected)
+                else:
+                    kernels[opcode](compress(machines, selected))
+                stepped += group
+
+            if not stepped:
+                break
+            total += stepped
+            if step % _FLUSH == _FLUSH - 1:
+                self._flush()
+
+        self._flush()
+        return total
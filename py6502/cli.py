@@ -0,0 +1,345 @@
+import argparse
+import mmap
+import os
+import sys
+import time
+
+from py6502.memory import Memory
+from py6502.processor import Processor, RESET_VECTOR, IRQ_VECTOR, NMI_VECTOR
+
+"""
+py6502 command line runner
+
+Loads a binary image into a fresh 64K machine, runs it on a cycle or instruction budget and prints where it
+ended up, how many instructions it got through a second and the emulated clock speed, so emulator jobs can be
+run from shell scripts and batch schedulers without any Python glue:
+
+    py6502 game.prg --cycles 5000000
+    py6502 rom.bin --load '$E000' --cycles 1e6 --json result.json
+    py6502 monitor.hex --instructions 200000 --json - | jq .pc
+
+Images can be:
+
+    -raw, loaded at --load ($0000 by default). A full 64K image at $0000 is mapped in copy-on-write (see
+     Memory.from_file) and anything else is mapped and copied in one go (see Memory.load_file), so big images
+     are never read into a bytes object first
+    -PRG, a raw image with its load address in the first two bytes, the usual Commodore format
+    -Intel HEX, data records anywhere in the 64K address space, read a line at a time
+
+The format is worked out from the file extension (.hex / .ihx, .prg, anything else is raw) unless --format says
+otherwise. --reset, --irq and --nmi write the vectors before the processor is reset. Execution starts at --entry
+if given, otherwise at the reset vector if the image or --reset set it, otherwise at the start of the image (or
+the start address record of a HEX file).
+
+Only the processor and memory are imported up front. The tracer, profiler and idle loop fast-forwarding (and
+json) are imported when they are asked for, so starting up stays cheap for lots of short jobs.
+
+Exit status is 0 when the budget runs out (or --until is reached), 1 when the program stops on an error like an
+illegal opcode, and 2 for bad arguments or an image that can't be loaded.
+"""
+
+#Cycle budget when neither --cycles nor --instructions is given, --until included so a run always ends
+DEFAULT_CYCLES = 1000000
+
+_EXTENSIONS = {".hex": "hex", ".ihx": "hex", ".prg": "prg"}
+
+#Data bytes each Intel HEX record type other than data has to have
+_HEX_LENGTHS = {0x01: 0, 0x02: 2, 0x03: 4, 0x04: 2, 0x05: 4}
+
+
+def parse_address(text: str) -> int:
+    """
+    Address from the command line, as $hex, 0xhex or decimal
+
+    @Param text: argument
+    @Return: int
+    """
+
+    try:
+        if text.startswith("$"):
+            value = int(text[1:], 16)
+        else:
+            value = int(text, 0)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid address: {text!r}")
+    if not 0x0000 <= value <= 0xFFFF:
+        raise argparse.ArgumentTypeError(f"address out of range: {text!r}")
+    return value
+
+
+def parse_count(text: str) -> int:
+    """
+    Cycle or instruction count from the command line, plain or in exponent form (eg. 5e6)
+
+    @Param text: argument
+    @Return: int
+    """
+
+    try:
+        value = int(text, 0)
+    except ValueError:
+        try:
+            value = int(float(text))
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid count: {text!r}")
+    if value <= 0:
+        raise argparse.ArgumentTypeError(f"count must be positive: {text!r}")
+    return value
+
+
+def load_raw(path: str, addr: int) -> tuple:
+    """
+    Load a raw binary image
+
+    @Param path: image file
+    @Param addr: address to load it at
+    @Return: tuple (Memory, start, end, entry)
+    """
+
+    size = os.path.getsize(path)
+    if size == 0:
+        raise ValueError(f"{path}: image is empty")
+    if addr + size > 0x10000:
+        raise ValueError(f"{path}: {size} bytes at ${addr:04X} runs past the end of memory")
+    if addr == 0x0000 and size == 0x10000:
+        return Memory.from_file(path), 0x0000, 0x10000, None
+
+    mem = Memory()
+    mem.load_file(path, addr)
+    return mem, addr, addr + size, None
+
+
+def load_prg(path: str) -> tuple:
+    """
+    Load a PRG image, which starts with the little-endian address to load the rest at
+
+    @Param path: image file
+    @Return: tuple (Memory, start, end, entry)
+    """
+
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < 3:
+            raise ValueError(f"{path}: too short to be a PRG file")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            addr = mapped[0] | (mapped[1] << 8)
+            end = addr + len(mapped) - 2
+            if end > 0x10000:
+                raise ValueError(f"{path}: {end - addr} bytes at ${addr:04X} runs past the end of memory")
+            mem = Memory()
+            with memoryview(mapped)[2:] as data:
+                mem.load(addr, data)
+    return mem, addr, end, None
+
+
+def load_hex(path: str) -> tuple:
+    """
+    Load an Intel HEX image
+
+    Data (00), end of file (01) and start address (03, 05) records are understood. Extended address records
+    (02, 04) are fine as long as they keep everything inside the 64K address space
+
+    @Param path: image file
+    @Return: tuple (Memory, start, end, entry), start and end being the lowest and highest addresses written
+    """
+
+    mem = Memory()
+    start = 0x10000
+    end = 0x0000
+    entry = None
+    base = 0
+    with open(path, "r") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                if not line.startswith(":"):
+                    raise ValueError("record doesn't start with ':'")
+                record = bytes.fromhex(line[1:])
+            except ValueError as e:
+                raise ValueError(f"{path}:{number}: {e}")
+            if len(record) < 5 or len(record) != record[0] + 5:
+                raise ValueError(f"{path}:{number}: record length doesn't match its byte count")
+            if sum(record) & 0xFF:
+                raise ValueError(f"{path}:{number}: bad checksum")
+
+            kind = record[3]
+            data = record[4:-1]
+            if kind not in _HEX_LENGTHS and kind != 0x00:
+                raise ValueError(f"{path}:{number}: unknown record type {kind:02X}")
+            if _HEX_LENGTHS.get(kind, len(data)) != len(data):
+                raise ValueError(f"{path}:{number}: wrong length for a type {kind:02X} record")
+            if kind == 0x00:
+                addr = base + ((record[1] << 8) | record[2])
+                if addr + len(data) > 0x10000:
+                    raise ValueError(f"{path}:{number}: data record outside the 64K address space")
+                mem.load(addr, data)
+                start = min(start, addr)
+                end = max(end, addr + len(data))
+            elif kind == 0x01:
+                break
+            elif kind in (0x02, 0x04):
+                base = ((data[0] << 8) | data[1]) << (4 if kind == 0x02 else 16)
+            elif kind == 0x03:
+                #CS:IP
+                entry = (int.from_bytes(data[:2], "big") << 4) + int.from_bytes(data[2:], "big")
+            else:
+                entry = int.from_bytes(data, "big")
+            if entry is not None and entry > 0xFFFF:
+                raise ValueError(f"{path}:{number}: start address outside the 64K address space")
+
+    if start > end:
+        raise ValueError(f"{path}: no data records")
+    return mem, start, end, entry
+
+
+def load_image(path: str, image_format: str = None, addr: int = 0x0000) -> tuple:
+    """
+    Load an image in any of the formats, see the module docstring
+
+    @Param path: image file
+    @Param image_format: "raw", "prg" or "hex", or None to go by the file extension
+    @Param addr: load address for raw images
+    @Return: tuple (Memory, start, end, entry), entry None if the image doesn't say where to start
+    """
+
+    if image_format is None:
+        image_format = _EXTENSIONS.get(os.path.splitext(path)[1].lower(), "raw")
+    if image_format == "prg":
+        return load_prg(path)
+    if image_format == "hex":
+        return load_hex(path)
+    return load_raw(path, addr)
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(prog="py6502", description="Run a 6502 binary image headless")
+    parser.add_argument("image", help="image file to load")
+    parser.add_argument("--format", choices=("raw", "prg", "hex"), help="image format, by extension by default")
+    parser.add_argument("--load", type=parse_address, default=0x0000, metavar="ADDR",
+                        help="load address for raw images ($0000 by default)")
+    parser.add_argument("--entry", type=parse_address, metavar="ADDR", help="address to start running at")
+    parser.add_argument("--reset", type=parse_address, metavar="ADDR", help="set the reset vector")
+    parser.add_argument("--irq", type=parse_address, metavar="ADDR", help="set the IRQ / BRK vector")
+    parser.add_argument("--nmi", type=parse_address, metavar="ADDR", help="set the NMI vector")
+    parser.add_argument("--cycles", type=parse_count, metavar="N",
+                        help=f"cycle budget ({DEFAULT_CYCLES} unless --instructions is given)")
+    parser.add_argument("--instructions", type=parse_count, metavar="N", help="instruction budget")
+    parser.add_argument("--until", type=parse_address, metavar="ADDR", help="stop when the PC gets to ADDR")
+    parser.add_argument("--idle", action="store_true",
+                        help="fast-forward idle and delay loops (instructions are not counted)")
+    parser.add_argument("--trace", metavar="PATH", help="write an instruction trace to PATH")
+    parser.add_argument("--profile", action="store_true", help="print an execution profile to stderr")
+    parser.add_argument("--json", metavar="PATH", help="write the result as JSON to PATH, - for stdout")
+    args = parser.parse_args(argv)
+
+    #--until on its own would never stop for a program that doesn't get there
+    if args.cycles is None and args.instructions is None:
+        args.cycles = DEFAULT_CYCLES
+
+    try:
+        mem, start, end, entry = load_image(args.image, args.format, args.load)
+    except (OSError, ValueError) as e:
+        print(f"py6502: error: {e}", file=sys.stderr)
+        return 2
+
+    for vector, addr in ((RESET_VECTOR, args.reset), (IRQ_VECTOR, args.irq), (NMI_VECTOR, args.nmi)):
+        if addr is not None:
+            mem.load(vector, bytes((addr & 0xFF, addr >> 8)))
+
+    proc = Processor(mem)
+    proc.reset()
+    if args.entry is not None:
+        proc.program_counter = args.entry
+    elif args.reset is None and not start <= RESET_VECTOR < end - 1:
+        proc.program_counter = start if entry is None else entry
+
+    #Each of these hooks the dispatch table, see Processor.add_hook
+    idle = profiler = tracer = None
+    if args.idle:
+        from py6502.idle import IdleLoops
+        idle = IdleLoops(proc)
+        idle.start()
+    if args.profile:
+        from py6502.profiler import Profiler
+        profiler = Profiler(proc)
+        profiler.enable()
+    if args.trace:
+        from py6502.tracer import Tracer
+        tracer = Tracer(proc, path=args.trace)
+        tracer.start()
+
+    #Every instruction takes at least two cycles, so a cycle budget is also a safe instruction budget, and
+    #passing it keeps run() counting instructions. --idle needs a run on the cycle budget alone
+    instructions = args.instructions
+    if instructions is None and args.until is None and not args.idle:
+        instructions = args.cycles
+
+    error = None
+    began = time.perf_counter()
+    try:
+        proc.run(instructions, args.cycles, args.until)
+    except ValueError as e:
+        error = str(e)
+    finally:
+        elapsed = time.perf_counter() - began
+        if tracer is not None:
+            tracer.close()
+        if profiler is not None:
+            profiler.disable()
+        if idle is not None:
+            idle.stop()
+
+    result = {
+        "image": args.image,
+        "start": start,
+        "end": end,
+        "a": proc.reg_a,
+        "x": proc.reg_x,
+        "y": proc.reg_y,
+        "sp": proc.stack_pointer,
+        "pc": proc.program_counter,
+        "p": proc.pack_status(),
+        "cycles": proc.cycles,
+        "instructions": proc.executed,
+        "seconds": elapsed,
+        "instructions_per_sec": proc.executed / elapsed if proc.executed is not None and elapsed else None,
+        "mhz": proc.cycles / elapsed / 1e6 if elapsed else None,
+        "error": error,
+    }
+    if idle is not None:
+        result["idle_skipped_cycles"] = idle.skipped_cycles
+
+    out = sys.stderr if args.json == "-" else sys.stdout
+    print(
+        f"A=${proc.reg_a:02X} X=${proc.reg_x:02X} Y=${proc.reg_y:02X} SP=${proc.stack_pointer:02X} "
+        f"PC=${proc.program_counter:04X} P=${result['p']:02X}",
+        file=out,
+    )
+    if result["instructions"] is None:
+        print(f"{proc.cycles:,} cycles in {elapsed:.3f}s", file=out)
+    else:
+        print(f"{proc.cycles:,} cycles, {proc.executed:,} instructions in {elapsed:.3f}s", file=out)
+    if result["mhz"] is not None:
+        rate = "" if result["instructions_per_sec"] is None else f"{result['instructions_per_sec']:,.0f} instr/s, "
+        print(f"{rate}{result['mhz']:.3f} MHz", file=out)
+    if error is not None:
+        print(f"py6502: stopped: {error}", file=sys.stderr)
+    if profiler is not None:
+        print(profiler.report(), file=sys.stderr)
+
+    if args.json is not None:
+        import json
+
+        if args.json == "-":
+            json.dump(result, sys.stdout, indent=2)
+            sys.stdout.write("\n")
+        else:
+            with open(args.json, "w") as f:
+                json.dump(result, f, indent=2)
+
+    return 0 if error is None else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
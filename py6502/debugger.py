@@ -0,0 +1,287 @@
+from py6502.memory import Bus
+from py6502.processor import Processor
+
+"""
+Breakpoints and watchpoints
+
+Neither costs anything until it is used, and then only where it is used:
+
+    -Breakpoints are a 64K bytearray indexed by address. While at least one is set, a copy of the processor's
+     dispatch table that looks the program counter up in it before each instruction is hooked in (the same
+     trick the profiler and tracer use, see Processor.add_hook), so checking is one index no matter how many
+     breakpoints there are. Clearing the last breakpoint takes the hook off again, leaving any other hooks
+     that went on since in place.
+    -Watchpoints hang a watch off the Bus page tables with watch_reads() / watch_writes(), only on pages that
+     have a watchpoint on them. Every other page keeps its plain read and write path. A second 64K bitmap per
+     direction picks out the watched addresses inside those pages.
+
+Hitting either one raises DebugBreak out of Processor.run() or step(). A breakpoint stops before the
+instruction at its address runs, with the program counter pointing at it. A watchpoint lets the instruction
+that made the access finish and stops at the next instruction boundary (it is scheduled as an event for the
+current cycle), so nothing is ever left half done.
+
+Debugger.run() runs the processor and hands back the DebugBreak instead of raising it, and steps over a
+breakpoint it is sitting on so that calling it again carries on from where it stopped.
+
+Watchpoints need the processor's memory to be a Bus. Like the profiler, only Processor.step() and run() see
+breakpoints, code running under a Translator doesn't.
+"""
+
+READ = 1
+WRITE = 2
+
+
+class DebugBreak(Exception):
+    def __init__(self, reason: str, addr: int, value: int = None) -> None:
+        """
+        Raised out of the run loop when a breakpoint or watchpoint is hit
+
+        @Param reason: "breakpoint", "read" or "write"
+        @Param addr: address of the breakpoint, or the address that was read or written
+        @Param value: byte read or written, None for breakpoints
+        @Return: None
+        """
+
+        if value is None:
+            super().__init__(f"{reason} at ${addr:04X}")
+        else:
+            super().__init__(f"{reason} of ${value:02X} at ${addr:04X}")
+        self.reason = reason
+        self.addr = addr
+        self.value = value
+
+
+class Debugger:
+    def __init__(self, proc: Processor) -> None:
+        """
+        Breakpoints and watchpoints for one processor, none set to begin with
+
+        @Param proc: processor to debug
+        @Return: None
+        """
+
+        self.proc = proc
+        self.breakpoints = bytearray(0x10000)
+        self._breakpoint_count = 0
+        #Bitmap of READ / WRITE flags per address, and how many watched addresses each page has per direction
+        self.watchpoints = bytearray(0x10000)
+        self._read_pages = [0] * 256
+        self._write_pages = [0] * 256
+        #Breakpoint to let through once, where run() was called from
+        self._resume = None
+        #Watchpoint hit waiting for the instruction to finish
+        self._pending = None
+
+    def add_breakpoint(self, addr: int) -> None:
+        """
+        Stop before the instruction at addr runs
+
+        @Param addr: address
+        @Return: None
+        """
+
+        if not self.breakpoints[addr]:
+            self.breakpoints[addr] = 1
+            self._breakpoint_count += 1
+            if self._breakpoint_count == 1:
+                self.proc.add_hook(self._instrument)
+
+    def remove_breakpoint(self, addr: int) -> None:
+        """
+        Take a breakpoint off, addresses without one are left alone
+
+        @Param addr: address
+        @Return: None
+        """
+
+        if self.breakpoints[addr]:
+            self.breakpoints[addr] = 0
+            self._breakpoint_count -= 1
+            if not self._breakpoint_count:
+                self.proc.remove_hook(self._instrument)
+
+    def add_watchpoint(self, addr: int, read: bool = False, write: bool = True) -> None:
+        """
+        Stop after the instruction that reads and / or writes addr
+
+        @Param addr: address
+        @Param read: watch reads
+        @Param write: watch writes
+        @Return: None
+        """
+
+        memory = self.proc.memory
+        if not isinstance(memory, Bus):
+            raise ValueError("Watchpoints need the processor's memory to be a Bus")
+
+        page = addr >> 8
+        start = page << 8
+        flags = self.watchpoints[addr]
+        if read and not flags & READ:
+            self._read_pages[page] += 1
+            if self._read_pages[page] == 1:
+                memory.watch_reads(start, start + 0x100, self._on_read)
+            flags |= READ
+        if write and not flags & WRITE:
+            self._write_pages[page] += 1
+            if self._write_pages[page] == 1:
+                memory.watch_writes(start, start + 0x100, self._on_write)
+            flags |= WRITE
+        self.watchpoints[addr] = flags
+
+    def remove_watchpoint(self, addr: int, read: bool = True, write: bool = True) -> None:
+        """
+        Take a watchpoint off, the page handlers go once the last watchpoint on a page is gone
+
+        @Param addr: address
+        @Param read: stop watching reads
+        @Param write: stop watching writes
+        @Return: None
+        """
+
+        memory = self.proc.memory
+        page = addr >> 8
+        start = page << 8
+        flags = self.watchpoints[addr]
+        if read and flags & READ:
+            self._read_pages[page] -= 1
+            if not self._read_pages[page]:
+                memory.unwatch_reads(start, start + 0x100, self._on_read)
+            flags &= ~READ
+        if write and flags & WRITE:
+            self._write_pages[page] -= 1
+            if not self._write_pages[page]:
+                memory.unwatch_writes(start, start + 0x100, self._on_write)
+            flags &= ~WRITE
+        self.watchpoints[addr] = flags
+
+    def clear(self) -> None:
+        """
+        Take every breakpoint and watchpoint off
+
+        @Return: None
+        """
+
+        for addr in range(0x10000):
+            if self.breakpoints[addr]:
+                self.remove_breakpoint(addr)
+            if self.watchpoints[addr]:
+                self.remove_watchpoint(addr)
+
+    def run(self, instructions: int = None, max_cycles: int = None, until_pc: int = None) -> DebugBreak:
+        """
+        Processor.run() that hands back what stopped it rather than raising it
+
+        If the program counter is sitting on a breakpoint (eg. the one that stopped the last run), that
+        instruction runs rather than stopping straight away again
+
+        A watchpoint hit on the last instruction of the run is handed back as well, even though the run stopped
+        at its limit before the hit could be raised
+
+        @Param instructions: number of instructions to execute
+        @Param max_cycles: cycle budget
+        @Param until_pc: address to stop at
+        @Return: DebugBreak, or None if the run stopped at one of its limits
+        """
+
+        if self.breakpoints[self.proc.program_counter]:
+            self._resume = self.proc.program_counter
+        try:
+            self.proc.run(instructions, max_cycles, until_pc)
+        except DebugBreak as hit:
+            return hit
+        finally:
+            self._resume = None
+            #Nothing is left waiting for a later run, the stop event for it does nothing once it goes off
+            pending, self._pending = self._pending, None
+        return pending
+
+    def _instrument(self, table: list) -> list:
+        """
+        Build the breakpoint checking copy of a dispatch table
+
+        @Param table: dispatch table to wrap
+        @Return: list
+        """
+
+        return [self._wrap(*entry) for entry in table]
+
+    def _wrap(self, handler, mode, cycles: int) -> tuple:
+        """
+        Breakpoint checking wrapper for one dispatch table slot
+
+        @Param handler: instruction handler
+        @Param mode: operand fetcher, or None
+        @Param cycles: base cycles
+        @Return: tuple (wrapper, None, cycles)
+        """
+
+        proc = self.proc
+        breakpoints = self.breakpoints
+
+        def check() -> None:
+            pc = (proc.program_counter - 1) & 0xFFFF
+            if breakpoints[pc]:
+                if pc == self._resume:
+                    self._resume = None
+                else:
+                    proc.program_counter = pc
+                    raise DebugBreak("breakpoint", pc)
+
+            if mode is None:
+                handler()
+            else:
+                handler(mode())
+
+        return (check, None, cycles)
+
+    def _on_read(self, addr: int, value: int) -> None:
+        """
+        Read watch on a watched page
+
+        @Param addr: address read
+        @Param value: byte read
+        @Return: None
+        """
+
+        if self.watchpoints[addr] & READ:
+            self._hit("read", addr, value)
+
+    def _on_write(self, addr: int, value: int) -> None:
+        """
+        Write watch on a watched page
+
+        @Param addr: address written
+        @Param value: byte written
+        @Return: None
+        """
+
+        if self.watchpoints[addr] & WRITE:
+            self._hit("write", addr, value)
+
+    def _hit(self, reason: str, addr: int, value: int) -> None:
+        """
+        Watchpoint hit, stop once the instruction is done. Only the first hit in an instruction is kept
+
+        @Param reason: "read" or "write"
+        @Param addr: address
+        @Param value: byte
+        @Return: None
+        """
+
+        if self._pending is None:
+            self._pending = DebugBreak(reason, addr, value)
+            self.proc.schedule(self.proc.cycles, self._stop)
+
+    def _stop(self) -> None:
+        """
+        Event that raises the watchpoint hit out of the run loop, unless run() has already handed it back
+
+        @Return: None
+        """
+
+        hit = self._pending
+        if hit is None:
+            return
+        self._pending = None
+        raise hit
@@ -0,0 +1,172 @@
+import mmap
+from collections import namedtuple
+
+from py6502.memory import Memory
+from py6502.opcodes import OPCODES
+from py6502.addressing import (
+    IMPLIED, ACCUMULATOR, IMMEDIATE, ZERO_PAGE, ZERO_PAGE_X, ZERO_PAGE_Y, ABSOLUTE, ABSOLUTE_X, ABSOLUTE_Y,
+    INDIRECT, INDIRECT_X, INDIRECT_Y, RELATIVE, OPERAND_BYTES,
+)
+
+"""
+Streaming 6502 disassembler
+
+Walks a block of bytes and yields one Instruction at a time. Nothing is built up front: the bytes are read
+through a memoryview (of a Memory, a bytes-like object or an mmap of a file), so a multi-megabyte ROM set is
+disassembled without ever being copied into Python objects, and stopping part way through costs nothing.
+
+Decoding goes through the same OPCODES table the processor builds its dispatch table from, so the two always
+agree on what a byte means. A byte that isn't a legal opcode, or an instruction cut off by the end of the
+data, comes out as a one byte instruction with mnemonic None (shown as .byte).
+"""
+
+Instruction = namedtuple("Instruction", ["addr", "opcode", "mnemonic", "mode", "operand", "size"])
+Instruction.__doc__ = """
+One decoded instruction
+
+addr is where it starts, operand is the byte or word after the opcode (the target address for branches) or
+None if there isn't one, and size is how many bytes it takes up, opcode included
+"""
+
+#mnemonic, mode and size for each opcode byte, None for illegal opcodes
+_DECODE = [None] * 256
+for _opcode, (_mnemonic, _mode, _cycles) in OPCODES.items():
+    _DECODE[_opcode] = (_mnemonic, _mode, 1 + OPERAND_BYTES[_mode])
+
+#How the operand is written in each mode
+_FORMATS = {
+    IMPLIED: "",
+    ACCUMULATOR: "A",
+    IMMEDIATE: "#${:02X}",
+    ZERO_PAGE: "${:02X}",
+    ZERO_PAGE_X: "${:02X},X",
+    ZERO_PAGE_Y: "${:02X},Y",
+    ABSOLUTE: "${:04X}",
+    ABSOLUTE_X: "${:04X},X",
+    ABSOLUTE_Y: "${:04X},Y",
+    INDIRECT: "(${:04X})",
+    INDIRECT_X: "(${:02X},X)",
+    INDIRECT_Y: "(${:02X}),Y",
+    RELATIVE: "${:04X}",
+}
+
+
+def disassemble(data, base: int = 0x0000, start: int = 0, end: int = None):
+    """
+    Disassemble a block of bytes
+
+    @Param data: any unsigned byte buffer (bytes, bytearray, memoryview, mmap)
+    @Param base: address of data[0]
+    @Param start: offset into data to start at
+    @Param end: offset into data to stop at (not included), defaults to the end of data. An instruction that
+                starts before end may still read its operand from past it
+    @Return: generator of Instruction
+    """
+
+    with memoryview(data) as view:
+        yield from _decode(view, base, start, len(view) if end is None else end)
+
+
+def disassemble_memory(memory: Memory, start: int = 0x0000, end: int = None):
+    """
+    Disassemble a range of a Memory (or ForkedMemory or Bus)
+
+    Reads straight out of the backing memory like Memory.view() does, so a Bus's device handlers never see the
+    reads
+
+    @Param memory: memory to read
+    @Param start: first address
+    @Param end: one past the last address, defaults to the end of memory
+    @Return: generator of Instruction
+    """
+
+    if end is None:
+        end = memory.size
+    #Take in the two bytes after end as well, so the last instruction gets its operand
+    view = memory.view(start, min(end + 2, memory.size))
+    yield from disassemble(view, base=start, end=end - start)
+
+
+def disassemble_file(path: str, base: int = 0x0000, offset: int = 0, length: int = None):
+    """
+    Disassemble a binary file (or part of one) through mmap, without reading it into memory
+
+    @Param path: file to disassemble
+    @Param base: address the byte at offset is loaded at
+    @Param offset: where in the file to start
+    @Param length: bytes to disassemble, defaults to the rest of the file
+    @Return: generator of Instruction
+    """
+
+    with open(path, "rb") as f:
+        if f.seek(0, 2) == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            end = len(mapped) if length is None else min(offset + length, len(mapped))
+            yield from disassemble(mapped, base - offset, offset, end)
+
+
+def _decode(view: memoryview, base: int, position: int, end: int):
+    """
+    Decoding loop behind disassemble()
+
+    @Param view: unsigned byte view of the data
+    @Param base: address of view[0]
+    @Param position: offset to start at
+    @Param end: offset to stop at
+    @Return: generator of Instruction
+    """
+
+    decode = _DECODE
+    available = len(view)
+    while position < end:
+        opcode = view[position]
+        entry = decode[opcode]
+        addr = base + position
+        if entry is None or position + entry[2] > available:
+            yield Instruction(addr, opcode, None, None, None, 1)
+            position += 1
+            continue
+
+        mnemonic, mode, size = entry
+        if size == 1:
+            operand = None
+        elif size == 3:
+            operand = view[position + 1] | (view[position + 2] << 8)
+        elif mode == RELATIVE:
+            offset = view[position + 1]
+            operand = (addr + 2 + (offset - 0x100 if offset & 0x80 else offset)) & 0xFFFF
+        else:
+            operand = view[position + 1]
+        yield Instruction(addr, opcode, mnemonic, mode, operand, size)
+        position += size
+
+
+def format_instruction(instruction: Instruction) -> str:
+    """
+    Assembler syntax for an instruction, eg. "LDA ($10),Y", the same syntax py6502.assembler reads
+
+    @Param instruction: decoded instruction
+    @Return: str
+    """
+
+    if instruction.mnemonic is None:
+        return f".byte ${instruction.opcode:02X}"
+    text = _FORMATS[instruction.mode]
+    if instruction.operand is not None:
+        text = text.format(instruction.operand)
+    return f"{instruction.mnemonic} {text}" if text else instruction.mnemonic
+
+
+def listing(instructions) -> str:
+    """
+    Listing of instructions, one per line with the address and the opcode byte
+
+    @Param instructions: iterable of Instruction
+    @Return: str
+    """
+
+    return "\n".join(
+        f"${instruction.addr:04X}  {instruction.opcode:02X}  {format_instruction(instruction)}"
+        for instruction in instructions
+    )
@@ -0,0 +1,310 @@
+from py6502.processor import Processor
+from py6502.memory import Bus
+from py6502.opcodes import OPCODES, CYCLES
+from py6502.disassembler import disassemble_memory
+from py6502.addressing import IMPLIED, ACCUMULATOR, IMMEDIATE, ZERO_PAGE, ABSOLUTE, RELATIVE
+
+"""
+Idle loop fast-forwarding
+
+Firmware spends a lot of its time going round tight loops waiting for something: a delay loop counting a
+register down (DEX / BNE), a poll of a memory location that an interrupt or a device will change
+(LDA flag / BEQ wait), or just JMP * until an interrupt comes. Running those an instruction at a time only
+moves the cycle count on, so an IdleLoops works out where each one ends up and jumps straight there.
+
+Two kinds of loop are recognised, each a single backward branch (or a JMP to itself) over a body of at most
+MAX_BODY bytes with nothing else that branches:
+
+    -Countdowns, a body of NOPs and one INX, INY, DEX or DEY, closed by BNE, BPL or BMI on that register.
+     How many more times round it goes is known from the register, so the whole loop is done in one go
+    -Waits, a body of instructions that only read (from fixed addresses in plain memory) and set registers
+     and flags. Once a trip round the loop leaves the registers and flags exactly as they were, nothing can
+     change until the next event fires, so the loop is jumped on to the deadline
+
+Either way the loop is only ever run on as far as the deadline (the next scheduled event or the end of the
+cycle budget), stopping on the same instruction boundary the run loop would have, so events fire at the same
+cycle and everything observable comes out the same as running it the long way.
+
+Like the profiler and the tracer this works by hooking in a copy of the dispatch table (see
+Processor.add_hook), with only the branch and JMP slots wrapped, so it costs nothing while it is off. It only
+does anything while Processor.run() is going on a cycle budget alone. Counting instructions or stopping at an
+address needs every instruction run, so those runs, and step(), are left alone. While any other hook (a
+Tracer, Profiler or Debugger) is on as well, whichever went on first, it holds off so they see every
+instruction. Reads through a Bus device (or a watched page) are never skipped.
+"""
+
+#Longest loop body looked at, in bytes including the closing branch
+MAX_BODY = 16
+
+#Instructions that only change registers and flags, and are fine to skip as long as what they leave behind
+#is the same every time round
+_PURE = {
+    "LDA", "LDX", "LDY", "AND", "ORA", "EOR", "BIT", "CMP", "CPX", "CPY", "ADC", "SBC",
+    "TAX", "TAY", "TXA", "TYA", "INX", "INY", "DEX", "DEY", "ASL", "LSR", "ROL", "ROR",
+    "CLC", "SEC", "CLV", "CLD", "SED", "NOP",
+}
+
+#Modes that read from the same address every time round (ASL and friends are only pure on the accumulator)
+_FIXED_MODES = {IMPLIED, ACCUMULATOR, IMMEDIATE, ZERO_PAGE, ABSOLUTE}
+
+#Counter register and step for each countdown instruction
+_COUNTERS = {"INX": ("reg_x", 1), "INY": ("reg_y", 1), "DEX": ("reg_x", -1), "DEY": ("reg_y", -1)}
+
+#First value a countdown stops at, for each closing branch and direction
+_EXITS = {
+    ("BNE", 1): 0x00, ("BNE", -1): 0x00,
+    ("BPL", 1): 0x80, ("BPL", -1): 0xFF,
+    ("BMI", 1): 0x00, ("BMI", -1): 0x7F,
+}
+
+#Branch and JMP opcodes, the slots that get wrapped
+_BRANCHES = [opcode for opcode, (mnemonic, mode, cycles) in OPCODES.items() if mode == RELATIVE]
+_JMP = 0x4C
+
+
+class _Loop:
+    def __init__(self, top: int, end: int, code: bytes, cycles: int, tail: int, counter: tuple, pages: set) -> None:
+        """
+        A loop that has been recognised
+
+        @Param top: address of the first instruction
+        @Param end: address just past the closing branch
+        @Param code: bytes from top to end, to notice if it gets written over
+        @Param cycles: cycles for one trip round, taken branch included
+        @Param tail: cycles for the closing branch (or JMP) when it is taken
+        @Param counter: (register, step, exit value) for a countdown, None for a wait
+        @Param pages: pages read from, which need to stay plain memory
+        @Return: None
+        """
+
+        self.top = top
+        self.end = end
+        self.code = code
+        self.cycles = cycles
+        self.tail = tail
+        self.counter = counter
+        self.pages = pages
+        #(registers and flags, cycles, deadline) last time round, for spotting a wait that has settled
+        self.last = None
+
+
+class IdleLoops:
+    def __init__(self, proc: Processor) -> None:
+        """
+        Idle loop fast-forwarding for one processor, off until start() is called
+
+        @Param proc: processor to fast-forward
+        @Return: None
+        """
+
+        self.proc = proc
+        #Loops by the address of their closing instruction, None for ones that didn't qualify
+        self._loops = {}
+        self._started = False
+        #Cycles jumped over, and how many times
+        self.skipped_cycles = 0
+        self.skips = 0
+
+    def start(self) -> None:
+        """
+        Hook the dispatch table with the branches wrapped in
+
+        @Return: None
+        """
+
+        if not self._started:
+            self.proc.add_hook(self._instrument)
+            self._started = True
+
+    def stop(self) -> None:
+        """
+        Take the wrapped branches off, whatever else has been hooked in since
+
+        @Return: None
+        """
+
+        if self._started:
+            self.proc.remove_hook(self._instrument)
+            self._started = False
+
+    def __enter__(self) -> "IdleLoops":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _instrument(self, table: list) -> list:
+        """
+        Build the copy of a dispatch table with the branch and JMP slots wrapped
+
+        Slots another hook has wrapped already (no mode of their own) are left as they are. While that hook is
+        on, loops are held off anyway, and once it comes off the table is built again without it
+
+        @Param table: dispatch table to wrap
+        @Return: list
+        """
+
+        table = list(table)
+        for opcode in _BRANCHES:
+            if table[opcode][1] is not None:
+                table[opcode] = self._wrap_branch(*table[opcode])
+        if table[_JMP][1] is not None:
+            table[_JMP] = self._wrap_jmp(*table[_JMP])
+        return table
+
+    def _wrap_branch(self, handler, mode, cycles: int) -> tuple:
+        """
+        Wrapper for a branch slot that looks for a loop whenever the branch is taken backwards
+
+        @Param handler: instruction handler
+        @Param mode: operand fetcher
+        @Param cycles: base cycles
+        @Return: tuple (wrapper, None, cycles)
+        """
+
+        proc = self.proc
+
+        def branch() -> None:
+            addr = mode()
+            after = proc.program_counter
+            handler(addr)
+            if addr < after and proc.program_counter == addr and proc._free_running:
+                self._idle((after - 2) & 0xFFFF, addr, after, cycles)
+
+        return (branch, None, cycles)
+
+    def _wrap_jmp(self, handler, mode, cycles: int) -> tuple:
+        """
+        Wrapper for JMP absolute that looks for a JMP to itself
+
+        @Param handler: instruction handler
+        @Param mode: operand fetcher
+        @Param cycles: base cycles
+        @Return: tuple (wrapper, None, cycles)
+        """
+
+        proc = self.proc
+
+        def jmp() -> None:
+            addr = mode()
+            after = proc.program_counter
+            handler(addr)
+            if addr == (after - 3) & 0xFFFF and proc._free_running:
+                self._idle(addr, addr, (addr + 3) & 0xFFFF, cycles)
+
+        return (jmp, None, cycles)
+
+    def _idle(self, at: int, top: int, end: int, cycles: int) -> None:
+        """
+        Closing instruction of a loop has just sent the program counter back to the top, fast-forward if
+        it is a loop we know how to
+
+        @Param at: address of the closing instruction
+        @Param top: address of the first instruction
+        @Param end: address just past the closing instruction
+        @Param cycles: base cycles of the closing instruction, which the run loop hasn't added on yet
+        @Return: None
+        """
+
+        proc = self.proc
+        if len(proc._hooks) > 1:
+            return
+
+        try:
+            loop = self._loops[at]
+        except KeyError:
+            loop = self._loops[at] = self._analyse(at, top, end)
+        if loop is None:
+            return
+        memory = proc.memory
+        if loop.top != top or bytes(memory.view(top, end)) != loop.code:
+            loop = self._loops[at] = self._analyse(at, top, end)
+            if loop is None:
+                return
+        if loop.pages and isinstance(memory, Bus):
+            readers = memory._readers
+            if any(readers[page] is not None for page in loop.pages):
+                return
+
+        #now is the cycle count at the top of the loop, and no instruction may start at or past the deadline
+        now = proc.cycles + cycles
+        deadline = proc._deadline
+        trips = (deadline - now + loop.tail - 1) // loop.cycles
+        if loop.counter is None:
+            state = (proc.reg_a, proc.reg_x, proc.reg_y, proc.P, proc._nz)
+            settled = loop.last == (state, now - loop.cycles, deadline)
+            if settled and trips > 0:
+                self._skip(trips * loop.cycles)
+                now += trips * loop.cycles
+            loop.last = (state, now, deadline)
+            return
+
+        register, step, exit = loop.counter
+        value = getattr(proc, register)
+        remaining = ((exit - value) * step) & 0xFF
+        if trips >= remaining:
+            #The whole thing fits, finish it off and fall out of the bottom
+            value = exit
+            self._skip(remaining * loop.cycles - (loop.tail - cycles))
+            proc.program_counter = end
+        elif trips > 0:
+            value = (value + trips * step) & 0xFF
+            self._skip(trips * loop.cycles)
+        else:
+            return
+        setattr(proc, register, value)
+        proc._nz = value
+
+    def _skip(self, cycles: int) -> None:
+        """
+        Move the cycle count on past the part of the loop that isn't being run
+
+        @Param cycles: cycles to add
+        @Return: None
+        """
+
+        self.proc.cycles += cycles
+        self.skipped_cycles += cycles
+        self.skips += 1
+
+    def _analyse(self, at: int, top: int, end: int) -> _Loop:
+        """
+        Work out whether top -> end is a loop IdleLoops can fast-forward
+
+        @Param at: address of the closing instruction
+        @Param top: address of the first instruction
+        @Param end: address just past the closing instruction
+        @Return: _Loop, or None if it isn't one
+        """
+
+        if not 0 < end - top <= MAX_BODY:
+            return None
+
+        memory = self.proc.memory
+        instructions = list(disassemble_memory(memory, top, end))
+        closing = instructions.pop()
+        if closing.addr != at or closing.addr + closing.size != end:
+            return None
+
+        #A taken branch costs one more cycle, or two onto another page
+        if closing.mnemonic == "JMP":
+            tail = CYCLES[closing.opcode]
+        else:
+            tail = CYCLES[closing.opcode] + (2 if (top ^ end) & 0xFF00 else 1)
+        cycles = tail
+        pages = set()
+        for instruction in instructions:
+            if instruction.mnemonic not in _PURE or instruction.mode not in _FIXED_MODES:
+                return None
+            if instruction.mode in (ZERO_PAGE, ABSOLUTE):
+                pages.add(instruction.operand >> 8)
+            cycles += CYCLES[instruction.opcode]
+
+        #Anything other than NOPs and a single counter with a branch on it is a wait
+        counter = None
+        others = [instruction.mnemonic for instruction in instructions if instruction.mnemonic != "NOP"]
+        if len(others) == 1 and others[0] in _COUNTERS and (closing.mnemonic, _COUNTERS[others[0]][1]) in _EXITS:
+            register, step = _COUNTERS[others[0]]
+            counter = (register, step, _EXITS[(closing.mnemonic, step)])
+        return _Loop(top, end, bytes(memory.view(top, end)), cycles, tail, counter, pages)
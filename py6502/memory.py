@@ -1,15 +1,61 @@
+import mmap
+import os
+import struct
+
+#Little-endian unsigned 16-bit word, read straight out of the buffer in one go
+_unpack_word = struct.Struct("<H").unpack_from
+
+
 class Memory:
-    def __init__(self, size: int = 65535) -> None:
+    __slots__ = ("size", "_mem", "_dirty", "_stamps", "_generation", "_cleared")
+
+    def __init__(self, size: int = 0x10000) -> None:
         """
-        Memory class for the 6502 processor. Initializes a 'protected' empty list where each index is of uint8 data type
-        Sets a list of 'memory' that extends to max value
+        Memory class for the 6502 processor. Initializes a 'protected' bytearray where each index is a uint8
+        Sets a block of 'memory' that covers the whole address space
+
+        A bytearray stores one byte per address with no per-slot boxing, so a full 64K map is 64K of RAM and
+        can be copied, sliced or handed to a memoryview in one go
+
+        Every write (write(), write_fast() and load(), but not writes through a view()) also sets the page's
+        byte in a dirty bitmap, one byte per 256-byte page, which is the only bookkeeping a write pays for.
+        advance_generation() folds the bitmap into a generation number per page: if anything was written since
+        it was last called the counter goes up by one, every page written gets stamped with it and the bitmap
+        is cleared again. dirty_pages() gives the pages written since clear_dirty() was last called, or since
+        any generation you held on to, so a decoded instruction cache, an incremental snapshot and a per-frame
+        diff can each keep their own place without getting in each other's way. Only advance_generation() and
+        clear_dirty() change anything, generation and dirty_pages() just look. diff_pages() compares contents
+        with an earlier dump() page by page
 
-        @Param size: size of memory, 2^16 - 1 or 65535
+        @Param size: size of memory, 2^16 or 65536 (addresses 0x0000 -> 0xFFFF)
         @Return: None
 
         """
         self.size = size
-        self._mem = [0] * self.size
+        self._mem = bytearray(self.size)
+        self._start_tracking()
+
+    @classmethod
+    def from_file(cls, path: str) -> "Memory":
+        """
+        Map a snapshot file straight in as the memory itself, no copying up front
+
+        The file is mapped copy-on-write (ACCESS_COPY) so writes only ever land in this instance, the file on
+        disk is never changed, and any number of instances made from the same file share its pages until they
+        write to them. The size of the memory is the size of the file
+
+        @Param path: path to the snapshot file
+        @Return: Memory
+        """
+
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+        mem = cls.__new__(cls)
+        mem.size = len(mapped)
+        mem._mem = mapped
+        mem._start_tracking()
+        return mem
 
     def read_byte(self, addr: int) -> int:
         """
@@ -24,12 +70,12 @@ class Memory:
             raise ValueError("Memory address is not valid")
         else:
             return self._mem[addr]
-        
+
     def read_word(self, addr: int) -> int:
         """
         Reads a word (2 byte) address from the memory array
 
-        Accounting for little-endian, the first byte read will be the low_byte, high_byte will be second byte 
+        Accounting for little-endian, the first byte read will be the low_byte, high_byte will be second byte
         to be read, concatenate them both by shifting the high byte left by 8 and using bitwise OR to finish
 
         @Param addr: address index to read
@@ -39,7 +85,7 @@ class Memory:
         low_byte = self.read_byte(addr)
         high_byte = self.read_byte(addr + 1)
         return (high_byte << 8) | low_byte
-        
+
     def write(self, addr: int, value: int) -> None:
         """
         Writes to a specific memory address
@@ -57,4 +103,845 @@ class Memory:
             raise ValueError("Value too large. Must be of size uint8.")
         else:
             #Write to address
-            self._mem[addr] = value
\ No newline at end of file
+            self._mem[addr] = value
+            self._dirty[addr >> 8] = 1
+
+    #Fast path for the processor
+    #
+    #The checked methods above are for everyone else. The processor hammers memory on every instruction and
+    #always hands us sensible values, so these skip the Python range checks: addresses are masked into the
+    #64K address space with & 0xFFFF (so they wrap around like the real address bus) instead of raising, and
+    #the bytearray itself refuses any value that isn't a byte. Only use these on a full 64K map
+
+    def read_byte_fast(self, addr: int) -> int:
+        """
+        Unchecked byte read, address wraps around at 0xFFFF
+
+        @Param addr: address to read
+        @Return: int
+        """
+
+        return self._mem[addr & 0xFFFF]
+
+    def read_word_fast(self, addr: int) -> int:
+        """
+        Unchecked little-endian word read, in one go rather than two byte reads
+
+        The only word that doesn't sit in two neighbouring bytes is the one at 0xFFFF, whose high byte
+        wraps around to 0x0000
+
+        @Param addr: address of the low byte
+        @Return: int
+        """
+
+        addr &= 0xFFFF
+        if addr == 0xFFFF:
+            return (self._mem[0x0000] << 8) | self._mem[0xFFFF]
+        return _unpack_word(self._mem, addr)[0]
+
+    def read_word_zero_page(self, addr: int) -> int:
+        """
+        Unchecked word read that wraps around inside the zero page
+
+        Pointers for (zp,X) and (zp),Y live in the zero page, and a pointer at 0xFF takes its high byte
+        from 0x00 rather than 0x100
+
+        @Param addr: zero page address of the low byte
+        @Return: int
+        """
+
+        mem = self._mem
+        return (mem[(addr + 1) & 0xFF] << 8) | mem[addr & 0xFF]
+
+    def write_fast(self, addr: int, value: int) -> None:
+        """
+        Unchecked byte write, address wraps around at 0xFFFF
+
+        @Param addr: address to write
+        @Param value: byte to write
+        @Return: None
+        """
+
+        addr &= 0xFFFF
+        self._mem[addr] = value
+        self._dirty[addr >> 8] = 1
+
+    def _check_range(self, start: int, end: int) -> None:
+        """
+        Make sure start -> end (end not included) is inside memory
+
+        @Param start: first address
+        @Param end: one past the last address
+        @Return: None
+        """
+
+        if not 0x0000 <= start <= end <= self.size:
+            raise ValueError("Memory range is not valid")
+
+    def load(self, addr: int, data: bytes) -> None:
+        """
+        Copy a block of bytes into memory starting at addr
+
+        Takes anything that looks like bytes (bytes, bytearray, memoryview, mmap...) and copies it in with a
+        single slice assignment, so loading a ROM is one copy instead of one write() per byte
+
+        @Param addr: address to start loading at
+        @Param data: bytes to load
+        @Return: None
+        """
+
+        end = addr + len(data)
+        self._check_range(addr, end)
+        self._mem[addr:end] = data
+        self._mark(addr, end)
+
+    def load_file(self, path: str, addr: int = 0x0000) -> int:
+        """
+        Load a ROM or binary image from a file into memory starting at addr
+
+        The file is mapped rather than read so it goes from the page cache into memory in one copy,
+        without a temporary bytes object the size of the file in between
+
+        @Param path: path to the image
+        @Param addr: address to start loading at
+        @Return: int (number of bytes loaded)
+        """
+
+        with open(path, "rb") as f:
+            #Empty files can't be mapped, and there is nothing to load anyway
+            if os.fstat(f.fileno()).st_size == 0:
+                return 0
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                self.load(addr, mapped)
+                return len(mapped)
+
+    def dump(self, start: int = 0x0000, end: int = None) -> bytes:
+        """
+        Copy a block of memory out as bytes, start -> end with end not included
+
+        The result is a snapshot and won't change if memory is written to afterwards, see view() for a live one
+
+        @Param start: first address
+        @Param end: one past the last address, defaults to the end of memory
+        @Return: bytes
+        """
+
+        if end is None:
+            end = self.size
+        self._check_range(start, end)
+        return bytes(memoryview(self._mem)[start:end])
+
+    def view(self, start: int = 0x0000, end: int = None) -> memoryview:
+        """
+        Zero-copy view of a block of memory, start -> end with end not included
+
+        Reads through the view always see the current contents of memory and writes through it go straight in,
+        with none of the checks read_byte() and write() do
+
+        @Param start: first address
+        @Param end: one past the last address, defaults to the end of memory
+        @Return: memoryview
+        """
+
+        if end is None:
+            end = self.size
+        self._check_range(start, end)
+        return memoryview(self._mem)[start:end]
+
+    def _start_tracking(self) -> None:
+        """
+        Set up dirty page tracking with every page clean, at generation 0
+
+        @Return: None
+        """
+
+        pages = (self.size + 0xFF) >> 8
+        #The bitmap is only ever changed in place, since Bus page handlers hang on to it
+        self._dirty = bytearray(pages)
+        #Generation each page was last written in
+        self._stamps = [0] * pages
+        self._generation = 0
+        #Generation at the last clear_dirty()
+        self._cleared = 0
+
+    def _mark(self, start: int, end: int) -> None:
+        """
+        Mark the pages covering start -> end (end not included) as written
+
+        @Param start: first address
+        @Param end: one past the last address
+        @Return: None
+        """
+
+        if start < end:
+            first = start >> 8
+            last = (end + 0xFF) >> 8
+            self._dirty[first:last] = b"\x01" * (last - first)
+
+    @property
+    def generation(self) -> int:
+        """
+        Generation advance_generation() last handed out, writes since then are still pending in the bitmap
+
+        @Return: int
+        """
+
+        return self._generation
+
+    def advance_generation(self) -> int:
+        """
+        Stamp the pages written since the last call with a new generation, see __init__
+
+        Nothing changes if nothing has been written, so calling it twice in a row gives the same generation
+
+        @Return: int (the current generation)
+        """
+
+        dirty = self._dirty
+        page = dirty.find(1)
+        if page >= 0:
+            self._generation = generation = self._generation + 1
+            stamps = self._stamps
+            while page >= 0:
+                stamps[page] = generation
+                page = dirty.find(1, page + 1)
+            dirty[:] = bytes(len(dirty))
+        return self._generation
+
+    def dirty_pages(self, since: int = None) -> list:
+        """
+        Pages written since clear_dirty() was last called, or since a generation
+
+        @Param since: generation to look from, defaults to the one clear_dirty() last returned
+        @Return: list of page numbers, in order
+        """
+
+        if since is None:
+            since = self._cleared
+        #Pages still pending in the bitmap are newer than any generation handed out so far
+        dirty = self._dirty
+        if since >= self._generation:
+            pages = []
+            page = dirty.find(1)
+            while page >= 0:
+                pages.append(page)
+                page = dirty.find(1, page + 1)
+            return pages
+        return [page for page, stamp in enumerate(self._stamps) if stamp > since or dirty[page]]
+
+    def clear_dirty(self) -> int:
+        """
+        Start dirty_pages() afresh from here
+
+        @Return: int (the generation it now counts from, to hand to dirty_pages() later on)
+        """
+
+        self._cleared = self.advance_generation()
+        return self._cleared
+
+    def diff_pages(self, other, pages: list = None) -> list:
+        """
+        Pages whose contents differ from another memory of the same size, or an earlier dump() of this one
+
+        Pages are compared through view(), so nothing is copied on plain memory and only the pages asked for
+        are looked at. Pass dirty_pages() as pages to only look at what could have changed. When pages isn't
+        given the whole thing is compared in one go first, so two identical memories cost one comparison
+
+        @Param other: Memory, or bytes-like of the same size
+        @Param pages: page numbers to compare, all of them by default
+        @Return: list of page numbers, in order
+        """
+
+        if isinstance(other, Memory):
+            size = other.size
+            theirs = other.view
+        else:
+            buffer = memoryview(other).cast("B")
+            size = len(buffer)
+
+            def theirs(start: int, end: int) -> memoryview:
+                return buffer[start:end]
+
+        if size != self.size:
+            raise ValueError("Can only diff memory of the same size")
+        if pages is None:
+            if self.view() == theirs(0, size):
+                return []
+            pages = range((size + 0xFF) >> 8)
+        changed = []
+        for page in pages:
+            start = page << 8
+            end = min(start + 0x100, size)
+            if self.view(start, end) != theirs(start, end):
+                changed.append(page)
+        return changed
+
+    def fork(self) -> "ForkedMemory":
+        """
+        Copy-on-write fork of this memory, see ForkedMemory
+
+        @Return: ForkedMemory
+        """
+
+        return ForkedMemory(self)
+
+
+class ForkedMemory(Memory):
+    __slots__ = ("_pages", "_private")
+
+    def __init__(self, parent: Memory) -> None:
+        """
+        Copy-on-write fork of another memory
+
+        Memory is held as a list of 256-byte pages instead of one bytearray. A page is an immutable bytes object
+        for as long as it is shared, and the first write to it swaps in a private bytearray copy, so a fork
+        only ever costs the pages it writes to (plus a list of 256 references) rather than a full 64K copy
+
+        Forking a ForkedMemory is O(pages written since it was last forked): those pages get frozen back into
+        bytes and shared by both sides, and whichever side writes to one next copies it again. Forking a flat
+        Memory has to cut it into pages first, which is one 64K copy, so the usual pattern is to fork a boot
+        image once and fork that as many times as needed. A fork of a Bus only gets the memory behind it, not
+        its page mappings
+
+        The pages aren't one contiguous buffer, so view() returns a view of a copy rather than a live one
+
+        @Param parent: memory to fork, has to be a whole number of pages
+        @Return: None
+        """
+
+        if parent.size & 0xFF:
+            raise ValueError("Only memory made of whole pages can be forked")
+        self.size = parent.size
+        self._start_tracking()
+
+        #Page numbers this fork has its own copy of
+        self._private = []
+
+        if isinstance(parent, ForkedMemory):
+            pages = parent._pages
+            for page in parent._private:
+                pages[page] = bytes(pages[page])
+            parent._private = []
+            self._pages = list(pages)
+        else:
+            data = parent.view()
+            self._pages = [bytes(data[start:start + 0x100]) for start in range(0, self.size, 0x100)]
+
+    def private_pages(self) -> int:
+        """
+        Number of pages this fork has its own copy of
+
+        @Return: int
+        """
+
+        return len(self._private)
+
+    def _own(self, page: int) -> bytearray:
+        """
+        Swap a shared page for a private copy, the copy half of copy-on-write
+
+        @Param page: page number
+        @Return: bytearray (the private page)
+        """
+
+        data = self._pages[page]
+        if type(data) is not bytearray:
+            data = self._pages[page] = bytearray(data)
+            self._private.append(page)
+        return data
+
+    def read_byte(self, addr: int) -> int:
+        """
+        Checked byte read, see Memory.read_byte
+
+        @Param addr: address to read
+        @Return: int
+        """
+
+        if not 0x0000 <= addr < self.size:
+            raise ValueError("Memory address is not valid")
+        return self._pages[addr >> 8][addr & 0xFF]
+
+    def write(self, addr: int, value: int) -> None:
+        """
+        Checked byte write, see Memory.write
+
+        @Param addr: address to write
+        @Param value: byte to write
+        @Return: None
+        """
+
+        if not 0x0000 <= addr < self.size:
+            raise ValueError("Memory address is not valid")
+        if not 0x0000 <= value <= 0xFF:
+            raise ValueError("Value too large. Must be of size uint8.")
+        self.write_fast(addr, value)
+
+    def read_byte_fast(self, addr: int) -> int:
+        """
+        Unchecked byte read, address wraps around at 0xFFFF
+
+        @Param addr: address to read
+        @Return: int
+        """
+
+        addr &= 0xFFFF
+        return self._pages[addr >> 8][addr & 0xFF]
+
+    def read_word_fast(self, addr: int) -> int:
+        """
+        Unchecked little-endian word read, one byte at a time since the two bytes can be on different pages
+
+        @Param addr: address of the low byte
+        @Return: int
+        """
+
+        #Low byte first, same order as the 6502, for devices whose reads have side effects
+        low_byte = self.read_byte_fast(addr)
+        return (self.read_byte_fast(addr + 1) << 8) | low_byte
+
+    def read_word_zero_page(self, addr: int) -> int:
+        """
+        Unchecked word read that wraps around inside the zero page
+
+        @Param addr: zero page address of the low byte
+        @Return: int
+        """
+
+        page = self._pages[0]
+        return (page[(addr + 1) & 0xFF] << 8) | page[addr & 0xFF]
+
+    def write_fast(self, addr: int, value: int) -> None:
+        """
+        Unchecked byte write, address wraps around at 0xFFFF
+
+        Writing into a shared page is a TypeError (bytes can't be written to), which is the cue to copy it.
+        Pages that are already private never get past the first line
+
+        @Param addr: address to write
+        @Param value: byte to write
+        @Return: None
+        """
+
+        addr &= 0xFFFF
+        try:
+            self._pages[addr >> 8][addr & 0xFF] = value
+        except TypeError:
+            self._own(addr >> 8)[addr & 0xFF] = value
+        self._dirty[addr >> 8] = 1
+
+    def load(self, addr: int, data: bytes) -> None:
+        """
+        Copy a block of bytes into memory starting at addr, one slice per page it covers
+
+        @Param addr: address to start loading at
+        @Param data: bytes to load
+        @Return: None
+        """
+
+        end = addr + len(data)
+        self._check_range(addr, end)
+        self._mark(addr, end)
+        data = memoryview(data).cast("B")
+        while addr < end:
+            offset = addr & 0xFF
+            count = min(0x100 - offset, end - addr)
+            self._own(addr >> 8)[offset:offset + count] = data[:count]
+            data = data[count:]
+            addr += count
+
+    def dump(self, start: int = 0x0000, end: int = None) -> bytes:
+        """
+        Copy a block of memory out as bytes, start -> end with end not included
+
+        @Param start: first address
+        @Param end: one past the last address, defaults to the end of memory
+        @Return: bytes
+        """
+
+        if end is None:
+            end = self.size
+        self._check_range(start, end)
+        first = start & ~0xFF
+        return b"".join(self._pages[first >> 8:(end + 0xFF) >> 8])[start - first:end - first]
+
+    def view(self, start: int = 0x0000, end: int = None) -> memoryview:
+        """
+        Read-only view of a copy of a block of memory, see the class docstring for why it isn't live
+
+        @Param start: first address
+        @Param end: one past the last address, defaults to the end of memory
+        @Return: memoryview
+        """
+
+        return memoryview(self.dump(start, end))
+
+
+def _ignore_write(addr: int, value: int) -> None:
+    """
+    Page write handler for ROM, writes just disappear like they would on the real thing
+
+    @Return: None
+    """
+
+
+class Bus(Memory):
+    __slots__ = ("_readers", "_writers", "_mapped_readers", "_mapped_writers", "_read_watches", "_write_watches")
+
+    def __init__(self) -> None:
+        """
+        Memory-mapped address bus for the 6502
+
+        Looks like a Memory (and the processor uses it exactly like one), but each 256-byte page of the
+        address space can be handed to something other than plain RAM: read-only ROM, a mirror of another
+        range, or an I/O device like a UART, timer or display that wants to see every read and write
+
+        Which is which is kept in two 256-entry page tables, one for reads and one for writes, indexed by the
+        high byte of the address. Finding the handler for an access is a single index, no matter how many
+        regions are mapped. An entry of None means plain memory, which is read and written straight out of the
+        backing bytearray without calling anything, so RAM pages stay as close to the flat array as possible.
+        ROM pages only need a write handler (to throw writes away), so reading ROM is as fast as reading RAM
+
+        Regions are given as start -> end with end not included (same as dump() and view()) and have to line
+        up with page boundaries, eg. map_device(0xD000, 0xE000, ...) for I/O at $D000-$DFFF
+
+        watch_writes() and watch_reads() hang extra callbacks off a page without replacing what is mapped
+        there, for things that need to know about accesses rather than handle them (eg. the translator watching
+        its code pages, or a debugger's watchpoints)
+
+        load(), dump() and view() always work on the backing memory and skip the page tables, which is how
+        images get loaded into ROM in the first place
+
+        @Return: None
+        """
+
+        super().__init__(0x10000)
+        self._reset_pages()
+
+    @classmethod
+    def from_file(cls, path: str) -> "Bus":
+        """
+        Map a 64K snapshot file in as the backing memory, see Memory.from_file
+
+        Every page starts out as plain RAM
+
+        @Param path: path to the snapshot file
+        @Return: Bus
+        """
+
+        bus = super().from_file(path)
+        if bus.size != 0x10000:
+            raise ValueError("Bus snapshots must cover the full 64K address space")
+        bus._reset_pages()
+        return bus
+
+    def _reset_pages(self) -> None:
+        """
+        Make every page plain RAM again
+
+        @Return: None
+        """
+
+        self._readers = [None] * 256
+        self._writers = [None] * 256
+        self._mapped_readers = [None] * 256
+        self._mapped_writers = [None] * 256
+        self._read_watches = [()] * 256
+        self._write_watches = [()] * 256
+
+    def _pages(self, start: int, end: int) -> range:
+        """
+        Pages covered by start -> end, which have to sit on page boundaries
+
+        @Param start: first address
+        @Param end: one past the last address
+        @Return: range
+        """
+
+        self._check_range(start, end)
+        if (start & 0xFF) or (end & 0xFF):
+            raise ValueError("Bus regions must start and end on a page boundary")
+        return range(start >> 8, end >> 8)
+
+    def map_ram(self, start: int, end: int) -> None:
+        """
+        Turn a region back into plain RAM, undoing any other mapping on it
+
+        @Param start: first address
+        @Param end: one past the last address
+        @Return: None
+        """
+
+        for page in self._pages(start, end):
+            self._map_reader(page, None)
+            self._map_writer(page, None)
+
+    def map_rom(self, start: int, end: int, data: bytes = None) -> None:
+        """
+        Make a region read-only, optionally loading an image into it first
+
+        @Param start: first address
+        @Param end: one past the last address
+        @Param data: image to load at start, if any
+        @Return: None
+        """
+
+        pages = self._pages(start, end)
+        if data is not None:
+            if len(data) > end - start:
+                raise ValueError("ROM image is larger than the region")
+            self.load(start, data)
+
+        for page in pages:
+            self._map_reader(page, None)
+            self._map_writer(page, _ignore_write)
+
+    def map_mirror(self, start: int, end: int, source: int) -> None:
+        """
+        Make a region a mirror of the same sized region at source
+
+        Reads and writes land on the source region (whatever is mapped there), so eg. map_mirror(0x0800, 0x2000, 0x0000)
+        repeats the first 2K of RAM three more times the way a lot of machines with partial address decoding do
+
+        @Param start: first address of the mirror
+        @Param end: one past the last address of the mirror
+        @Param source: first address of the region being mirrored, page aligned
+        @Return: None
+        """
+
+        pages = self._pages(start, end)
+        if source & 0xFF:
+            raise ValueError("Bus regions must start and end on a page boundary")
+        delta = start - source
+        read = self.read_byte_fast
+        write = self.write_fast
+
+        def mirror_read(addr: int) -> int:
+            return read(addr - delta)
+
+        def mirror_write(addr: int, value: int) -> None:
+            write(addr - delta, value)
+
+        for page in pages:
+            self._map_reader(page, mirror_read)
+            self._map_writer(page, mirror_write)
+
+    def map_device(self, start: int, end: int, read=None, write=None) -> None:
+        """
+        Hand a region over to a device
+
+        read is called as read(addr) and returns the byte, write is called as write(addr, value). Both get the
+        full 16-bit address so one callback can decode all its registers. Leaving either one as None lets that
+        side fall through to the memory behind the device instead
+
+        @Param start: first address
+        @Param end: one past the last address
+        @Param read: read callback, or None
+        @Param write: write callback, or None
+        @Return: None
+        """
+
+        for page in self._pages(start, end):
+            self._map_reader(page, read)
+            self._map_writer(page, write)
+
+    def watch_writes(self, start: int, end: int, watch) -> None:
+        """
+        Call watch(addr, value) after every write to a region, on top of whatever is mapped there
+
+        Only the watched pages pay for it, every other page keeps its plain write path. Watches stay put when a
+        page is remapped and several can sit on the same page, they are called in the order they were added
+
+        @Param start: first address
+        @Param end: one past the last address
+        @Param watch: watch callback
+        @Return: None
+        """
+
+        for page in self._pages(start, end):
+            self._write_watches[page] += (watch,)
+            self._map_writer(page, self._mapped_writers[page])
+
+    def unwatch_writes(self, start: int, end: int, watch) -> None:
+        """
+        Take a watch added by watch_writes back off a region, pages it isn't on are left alone
+
+        @Param start: first address
+        @Param end: one past the last address
+        @Param watch: watch callback
+        @Return: None
+        """
+
+        for page in self._pages(start, end):
+            watches = self._write_watches[page]
+            if watch in watches:
+                self._write_watches[page] = tuple(w for w in watches if w != watch)
+                self._map_writer(page, self._mapped_writers[page])
+
+    def watch_reads(self, start: int, end: int, watch) -> None:
+        """
+        Call watch(addr, value) after every read from a region, the read side of watch_writes()
+
+        Opcode and operand fetches are reads too, so a watched page of code calls watch for every byte of it
+        that runs
+
+        @Param start: first address
+        @Param end: one past the last address
+        @Param watch: watch callback
+        @Return: None
+        """
+
+        for page in self._pages(start, end):
+            self._read_watches[page] += (watch,)
+            self._map_reader(page, self._mapped_readers[page])
+
+    def unwatch_reads(self, start: int, end: int, watch) -> None:
+        """
+        Take a watch added by watch_reads back off a region, pages it isn't on are left alone
+
+        @Param start: first address
+        @Param end: one past the last address
+        @Param watch: watch callback
+        @Return: None
+        """
+
+        for page in self._pages(start, end):
+            watches = self._read_watches[page]
+            if watch in watches:
+                self._read_watches[page] = tuple(w for w in watches if w != watch)
+                self._map_reader(page, self._mapped_readers[page])
+
+    def _map_reader(self, page: int, read) -> None:
+        """
+        Set the read handler for a page, wrapping it in any watches on the page
+
+        @Param page: page number
+        @Param read: read handler, or None for plain memory
+        @Return: None
+        """
+
+        self._mapped_readers[page] = read
+        watches = self._read_watches[page]
+        if not watches:
+            self._readers[page] = read
+            return
+
+        mem = self._mem
+
+        def watched_read(addr: int) -> int:
+            value = mem[addr] if read is None else read(addr)
+            for watch in watches:
+                watch(addr, value)
+            return value
+
+        self._readers[page] = watched_read
+
+    def _map_writer(self, page: int, write) -> None:
+        """
+        Set the write handler for a page, wrapping it in any watches on the page
+
+        @Param page: page number
+        @Param write: write handler, or None for plain RAM
+        @Return: None
+        """
+
+        self._mapped_writers[page] = write
+        watches = self._write_watches[page]
+        if not watches:
+            self._writers[page] = write
+            return
+
+        mem = self._mem
+        dirty = self._dirty
+
+        def watched_write(addr: int, value: int) -> None:
+            if write is None:
+                mem[addr] = value
+                dirty[addr >> 8] = 1
+            else:
+                write(addr, value)
+            for watch in watches:
+                watch(addr, value)
+
+        self._writers[page] = watched_write
+
+    def read_byte(self, addr: int) -> int:
+        """
+        Checked byte read through the page tables
+
+        @Param addr: address to read
+        @Return: int
+        """
+
+        if not 0x0000 <= addr < self.size:
+            raise ValueError("Memory address is not valid")
+        return self.read_byte_fast(addr)
+
+    def write(self, addr: int, value: int) -> None:
+        """
+        Checked byte write through the page tables
+
+        @Param addr: address to write
+        @Param value: byte to write
+        @Return: None
+        """
+
+        if not 0x0000 <= addr < self.size:
+            raise ValueError("Memory address is not valid")
+        if not 0x0000 <= value <= 0xFF:
+            raise ValueError("Value too large. Must be of size uint8.")
+        self.write_fast(addr, value)
+
+    def read_byte_fast(self, addr: int) -> int:
+        """
+        Unchecked byte read, RAM and ROM come straight out of the backing memory
+
+        @Param addr: address to read
+        @Return: int
+        """
+
+        addr &= 0xFFFF
+        handler = self._readers[addr >> 8]
+        if handler is None:
+            return self._mem[addr]
+        return handler(addr)
+
+    def read_word_fast(self, addr: int) -> int:
+        """
+        Unchecked little-endian word read, one byte at a time since either byte could belong to a device
+
+        @Param addr: address of the low byte
+        @Return: int
+        """
+
+        #Low byte first, same order as the 6502, for devices whose reads have side effects
+        low_byte = self.read_byte_fast(addr)
+        return (self.read_byte_fast(addr + 1) << 8) | low_byte
+
+    def read_word_zero_page(self, addr: int) -> int:
+        """
+        Unchecked word read that wraps around inside the zero page
+
+        @Param addr: zero page address of the low byte
+        @Return: int
+        """
+
+        low_byte = self.read_byte_fast(addr & 0xFF)
+        return (self.read_byte_fast((addr + 1) & 0xFF) << 8) | low_byte
+
+    def write_fast(self, addr: int, value: int) -> None:
+        """
+        Unchecked byte write, RAM goes straight into the backing memory
+
+        @Param addr: address to write
+        @Param value: byte to write
+        @Return: None
+        """
+
+        addr &= 0xFFFF
+        handler = self._writers[addr >> 8]
+        if handler is None:
+            self._mem[addr] = value
+            self._dirty[addr >> 8] = 1
+        else:
+            handler(addr, value)
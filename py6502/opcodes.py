@@ -0,0 +1,246 @@
+"""
+Opcode metadata for the 6502
+
+Every instruction the processor knows how to execute has an entry here, keyed by its opcode byte.
+Each entry is a tuple of (mnemonic, addressing mode, base cycles), see py6502.addressing for the modes.
+
+The processor builds its 256-slot dispatch table from this once, when it is created, so the run loop
+never has to look anything up by name while it is executing. Anything that needs to know about opcodes
+(the processor, and later on tooling) should read from this table so they never disagree.
+
+Only the documented (legal) NMOS 6502 opcodes are here, 151 of them.
+"""
+
+from py6502.addressing import (
+    IMPLIED, ACCUMULATOR, IMMEDIATE, ZERO_PAGE, ZERO_PAGE_X, ZERO_PAGE_Y, ABSOLUTE, ABSOLUTE_X, ABSOLUTE_Y,
+    INDIRECT, INDIRECT_X, INDIRECT_Y, RELATIVE,
+)
+
+OPCODES = {
+    #Add with carry
+    0x69: ("ADC", IMMEDIATE, 2),
+    0x65: ("ADC", ZERO_PAGE, 3),
+    0x75: ("ADC", ZERO_PAGE_X, 4),
+    0x6D: ("ADC", ABSOLUTE, 4),
+    0x7D: ("ADC", ABSOLUTE_X, 4),
+    0x79: ("ADC", ABSOLUTE_Y, 4),
+    0x61: ("ADC", INDIRECT_X, 6),
+    0x71: ("ADC", INDIRECT_Y, 5),
+
+    #Logical and
+    0x29: ("AND", IMMEDIATE, 2),
+    0x25: ("AND", ZERO_PAGE, 3),
+    0x35: ("AND", ZERO_PAGE_X, 4),
+    0x2D: ("AND", ABSOLUTE, 4),
+    0x3D: ("AND", ABSOLUTE_X, 4),
+    0x39: ("AND", ABSOLUTE_Y, 4),
+    0x21: ("AND", INDIRECT_X, 6),
+    0x31: ("AND", INDIRECT_Y, 5),
+
+    #Arithmetic shift left
+    0x0A: ("ASL", ACCUMULATOR, 2),
+    0x06: ("ASL", ZERO_PAGE, 5),
+    0x16: ("ASL", ZERO_PAGE_X, 6),
+    0x0E: ("ASL", ABSOLUTE, 6),
+    0x1E: ("ASL", ABSOLUTE_X, 7),
+
+    #Branches
+    0x90: ("BCC", RELATIVE, 2),
+    0xB0: ("BCS", RELATIVE, 2),
+    0xF0: ("BEQ", RELATIVE, 2),
+    0x30: ("BMI", RELATIVE, 2),
+    0xD0: ("BNE", RELATIVE, 2),
+    0x10: ("BPL", RELATIVE, 2),
+    0x50: ("BVC", RELATIVE, 2),
+    0x70: ("BVS", RELATIVE, 2),
+
+    #Bit test
+    0x24: ("BIT", ZERO_PAGE, 3),
+    0x2C: ("BIT", ABSOLUTE, 4),
+
+    #Force interrupt
+    0x00: ("BRK", IMPLIED, 7),
+
+    #Flag clear / set
+    0x18: ("CLC", IMPLIED, 2),
+    0xD8: ("CLD", IMPLIED, 2),
+    0x58: ("CLI", IMPLIED, 2),
+    0xB8: ("CLV", IMPLIED, 2),
+    0x38: ("SEC", IMPLIED, 2),
+    0xF8: ("SED", IMPLIED, 2),
+    0x78: ("SEI", IMPLIED, 2),
+
+    #Compare accumulator
+    0xC9: ("CMP", IMMEDIATE, 2),
+    0xC5: ("CMP", ZERO_PAGE, 3),
+    0xD5: ("CMP", ZERO_PAGE_X, 4),
+    0xCD: ("CMP", ABSOLUTE, 4),
+    0xDD: ("CMP", ABSOLUTE_X, 4),
+    0xD9: ("CMP", ABSOLUTE_Y, 4),
+    0xC1: ("CMP", INDIRECT_X, 6),
+    0xD1: ("CMP", INDIRECT_Y, 5),
+
+    #Compare index x
+    0xE0: ("CPX", IMMEDIATE, 2),
+    0xE4: ("CPX", ZERO_PAGE, 3),
+    0xEC: ("CPX", ABSOLUTE, 4),
+
+    #Compare index y
+    0xC0: ("CPY", IMMEDIATE, 2),
+    0xC4: ("CPY", ZERO_PAGE, 3),
+    0xCC: ("CPY", ABSOLUTE, 4),
+
+    #Decrement memory
+    0xC6: ("DEC", ZERO_PAGE, 5),
+    0xD6: ("DEC", ZERO_PAGE_X, 6),
+    0xCE: ("DEC", ABSOLUTE, 6),
+    0xDE: ("DEC", ABSOLUTE_X, 7),
+
+    #Increment / decrement index registers
+    0xCA: ("DEX", IMPLIED, 2),
+    0x88: ("DEY", IMPLIED, 2),
+    0xE8: ("INX", IMPLIED, 2),
+    0xC8: ("INY", IMPLIED, 2),
+
+    #Exclusive or
+    0x49: ("EOR", IMMEDIATE, 2),
+    0x45: ("EOR", ZERO_PAGE, 3),
+    0x55: ("EOR", ZERO_PAGE_X, 4),
+    0x4D: ("EOR", ABSOLUTE, 4),
+    0x5D: ("EOR", ABSOLUTE_X, 4),
+    0x59: ("EOR", ABSOLUTE_Y, 4),
+    0x41: ("EOR", INDIRECT_X, 6),
+    0x51: ("EOR", INDIRECT_Y, 5),
+
+    #Increment memory
+    0xE6: ("INC", ZERO_PAGE, 5),
+    0xF6: ("INC", ZERO_PAGE_X, 6),
+    0xEE: ("INC", ABSOLUTE, 6),
+    0xFE: ("INC", ABSOLUTE_X, 7),
+
+    #Jumps
+    0x4C: ("JMP", ABSOLUTE, 3),
+    0x6C: ("JMP", INDIRECT, 5),
+    0x20: ("JSR", ABSOLUTE, 6),
+
+    #Load accumulator
+    0xA9: ("LDA", IMMEDIATE, 2),
+    0xA5: ("LDA", ZERO_PAGE, 3),
+    0xB5: ("LDA", ZERO_PAGE_X, 4),
+    0xAD: ("LDA", ABSOLUTE, 4),
+    0xBD: ("LDA", ABSOLUTE_X, 4),
+    0xB9: ("LDA", ABSOLUTE_Y, 4),
+    0xA1: ("LDA", INDIRECT_X, 6),
+    0xB1: ("LDA", INDIRECT_Y, 5),
+
+    #Load index x
+    0xA2: ("LDX", IMMEDIATE, 2),
+    0xA6: ("LDX", ZERO_PAGE, 3),
+    0xB6: ("LDX", ZERO_PAGE_Y, 4),
+    0xAE: ("LDX", ABSOLUTE, 4),
+    0xBE: ("LDX", ABSOLUTE_Y, 4),
+
+    #Load index y
+    0xA0: ("LDY", IMMEDIATE, 2),
+    0xA4: ("LDY", ZERO_PAGE, 3),
+    0xB4: ("LDY", ZERO_PAGE_X, 4),
+    0xAC: ("LDY", ABSOLUTE, 4),
+    0xBC: ("LDY", ABSOLUTE_X, 4),
+
+    #Logical shift right
+    0x4A: ("LSR", ACCUMULATOR, 2),
+    0x46: ("LSR", ZERO_PAGE, 5),
+    0x56: ("LSR", ZERO_PAGE_X, 6),
+    0x4E: ("LSR", ABSOLUTE, 6),
+    0x5E: ("LSR", ABSOLUTE_X, 7),
+
+    #No operation
+    0xEA: ("NOP", IMPLIED, 2),
+
+    #Logical inclusive or
+    0x09: ("ORA", IMMEDIATE, 2),
+    0x05: ("ORA", ZERO_PAGE, 3),
+    0x15: ("ORA", ZERO_PAGE_X, 4),
+    0x0D: ("ORA", ABSOLUTE, 4),
+    0x1D: ("ORA", ABSOLUTE_X, 4),
+    0x19: ("ORA", ABSOLUTE_Y, 4),
+    0x01: ("ORA", INDIRECT_X, 6),
+    0x11: ("ORA", INDIRECT_Y, 5),
+
+    #Stack push / pull
+    0x48: ("PHA", IMPLIED, 3),
+    0x08: ("PHP", IMPLIED, 3),
+    0x68: ("PLA", IMPLIED, 4),
+    0x28: ("PLP", IMPLIED, 4),
+
+    #Rotate left
+    0x2A: ("ROL", ACCUMULATOR, 2),
+    0x26: ("ROL", ZERO_PAGE, 5),
+    0x36: ("ROL", ZERO_PAGE_X, 6),
+    0x2E: ("ROL", ABSOLUTE, 6),
+    0x3E: ("ROL", ABSOLUTE_X, 7),
+
+    #Rotate right
+    0x6A: ("ROR", ACCUMULATOR, 2),
+    0x66: ("ROR", ZERO_PAGE, 5),
+    0x76: ("ROR", ZERO_PAGE_X, 6),
+    0x6E: ("ROR", ABSOLUTE, 6),
+    0x7E: ("ROR", ABSOLUTE_X, 7),
+
+    #Returns
+    0x40: ("RTI", IMPLIED, 6),
+    0x60: ("RTS", IMPLIED, 6),
+
+    #Subtract with carry
+    0xE9: ("SBC", IMMEDIATE, 2),
+    0xE5: ("SBC", ZERO_PAGE, 3),
+    0xF5: ("SBC", ZERO_PAGE_X, 4),
+    0xED: ("SBC", ABSOLUTE, 4),
+    0xFD: ("SBC", ABSOLUTE_X, 4),
+    0xF9: ("SBC", ABSOLUTE_Y, 4),
+    0xE1: ("SBC", INDIRECT_X, 6),
+    0xF1: ("SBC", INDIRECT_Y, 5),
+
+    #Store accumulator
+    0x85: ("STA", ZERO_PAGE, 3),
+    0x95: ("STA", ZERO_PAGE_X, 4),
+    0x8D: ("STA", ABSOLUTE, 4),
+    0x9D: ("STA", ABSOLUTE_X, 5),
+    0x99: ("STA", ABSOLUTE_Y, 5),
+    0x81: ("STA", INDIRECT_X, 6),
+    0x91: ("STA", INDIRECT_Y, 6),
+
+    #Store index x
+    0x86: ("STX", ZERO_PAGE, 3),
+    0x96: ("STX", ZERO_PAGE_Y, 4),
+    0x8E: ("STX", ABSOLUTE, 4),
+
+    #Store index y
+    0x84: ("STY", ZERO_PAGE, 3),
+    0x94: ("STY", ZERO_PAGE_X, 4),
+    0x8C: ("STY", ABSOLUTE, 4),
+
+    #Register transfers
+    0xAA: ("TAX", IMPLIED, 2),
+    0x8A: ("TXA", IMPLIED, 2),
+    0xA8: ("TAY", IMPLIED, 2),
+    0x98: ("TYA", IMPLIED, 2),
+    0xBA: ("TSX", IMPLIED, 2),
+    0x9A: ("TXS", IMPLIED, 2),
+}
+
+#Base cycles for every opcode byte, 0 for the illegal ones
+CYCLES = bytes(OPCODES[opcode][2] if opcode in OPCODES else 0 for opcode in range(256))
+
+#Read instructions in an indexed mode take one more cycle when adding the index carries into the next page,
+#since the processor has to go back and read from the right one. Stores and read-modify-write instructions
+#always take that cycle, so theirs is already in the base cycles. Taken branches have a penalty of their own
+#(one more cycle, and another if the target is on a different page), which the branch instructions add
+_PAGE_CROSSING_READS = {"ADC", "AND", "CMP", "EOR", "LDA", "LDX", "LDY", "ORA", "SBC"}
+
+#1 for every opcode that takes the page crossing penalty, indexed by opcode byte
+PAGE_PENALTY = bytes(
+    1 if opcode in OPCODES and OPCODES[opcode][0] in _PAGE_CROSSING_READS
+    and OPCODES[opcode][1] in (ABSOLUTE_X, ABSOLUTE_Y, INDIRECT_Y) else 0
+    for opcode in range(256)
+)
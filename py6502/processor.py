@@ -1,4 +1,10 @@
+import heapq
+import struct
+from array import array
+
 from py6502.memory import Memory
+from py6502.opcodes import OPCODES, PAGE_PENALTY
+from py6502.addressing import IMPLIED, ACCUMULATOR, ABSOLUTE_X, ABSOLUTE_Y, INDIRECT_Y, MODE_NAMES, MODE_CYCLES
 
 """
 6502 processor emulator
@@ -8,7 +14,253 @@ Everything explained in gratuitous detail (for my own purposes)
 Hopefully it will read clearly and helpfully
 """
 
+#Status register bits, NV-BDIZC
+FLAG_C = 0x01
+FLAG_Z = 0x02
+FLAG_I = 0x04
+FLAG_D = 0x08
+FLAG_B = 0x10
+FLAG_U = 0x20
+FLAG_V = 0x40
+FLAG_N = 0x80
+
+#N and Z flag bits for every possible 8-bit result, so setting both from a result is one index and one OR:
+#P = (P & 0x7D) | NZ[value]
+NZ = bytes((value & FLAG_N) | (FLAG_Z if value == 0 else 0) for value in range(256))
+
+#The processor itself keeps N and Z lazily, see Processor.__init__
+
+
+#The stack is page 1, the stack pointer is the 8-bit offset into it
+STACK_PAGE = 0x0100
+
+#Interrupt vectors
+NMI_VECTOR = 0xFFFA
+RESET_VECTOR = 0xFFFC
+IRQ_VECTOR = 0xFFFE
+
+#Cycle count nothing will ever reach, for "no limit" in run() and "no events" in the event queue
+_FOREVER = 1 << 62
+
+#Register half of a snapshot: A, X, Y, P, stack pointer, program counter, cycles. 16 bytes
+_SNAPSHOT = struct.Struct("<BBBBHHQ")
+
+
+def adc(a: int, value: int, status: int) -> tuple:
+    """
+    Add with carry on a packed status byte, binary or decimal
+
+    This is the arithmetic the ADC tables are built from, Processor.ins_adc looks the answer up instead
+
+    @Param a: accumulator
+    @Param value: operand
+    @Param status: status byte going in
+    @Return: tuple (result, status)
+    """
+
+    carry = status & FLAG_C
+    result = a + value + carry
+
+    #Zero flag always comes from the binary sum, even in decimal mode
+    status = (status & ~(FLAG_N | FLAG_V | FLAG_Z | FLAG_C)) | (NZ[result & 0xFF] & FLAG_Z)
+
+    if status & FLAG_D:
+        #Add the low digits, and if they went past 9 skip the six values that aren't BCD
+        low = (a & 0x0F) + (value & 0x0F) + carry
+        if low >= 0x0A:
+            low = ((low + 0x06) & 0x0F) + 0x10
+        result = (a & 0xF0) + (value & 0xF0) + low
+
+        #Negative and overflow are taken before the high digit is corrected
+        status |= result & FLAG_N
+        if ~(a ^ value) & (a ^ result) & 0x80:
+            status |= FLAG_V
+
+        if result >= 0xA0:
+            result += 0x60
+    else:
+        status |= result & FLAG_N
+        if ~(a ^ value) & (a ^ result) & 0x80:
+            status |= FLAG_V
+
+    if result > 0xFF:
+        status |= FLAG_C
+    return result & 0xFF, status
+
+
+def sbc(a: int, value: int, status: int) -> tuple:
+    """
+    Subtract with borrow on a packed status byte, binary or decimal
+
+    This is the arithmetic the SBC tables are built from, Processor.ins_sbc looks the answer up instead
+
+    @Param a: accumulator
+    @Param value: operand
+    @Param status: status byte going in
+    @Return: tuple (result, status)
+    """
+
+    borrow = 0 if status & FLAG_C else 1
+    result = a - value - borrow
+
+    #Every flag comes from the binary subtraction, even in decimal mode
+    status = (status & ~(FLAG_N | FLAG_V | FLAG_Z | FLAG_C)) | NZ[result & 0xFF]
+    if (a ^ value) & (a ^ result) & 0x80:
+        status |= FLAG_V
+    if result >= 0:
+        status |= FLAG_C
+
+    if status & FLAG_D:
+        #Subtract the low digits, and if they went below 0 skip back over the six values that aren't BCD
+        low = (a & 0x0F) - (value & 0x0F) - borrow
+        if low < 0:
+            low = ((low - 0x06) & 0x0F) - 0x10
+        result = (a & 0xF0) - (value & 0xF0) + low
+        if result < 0:
+            result -= 0x60
+
+    return result & 0xFF, status
+
+
+def _nz_of(status: int) -> int:
+    """
+    Lazy N / Z value (see Processor.__init__) that gives the N and Z flags of a status byte
+
+    Any result byte will do unless N and Z are both set, which no single byte can give, so that one is 0x100
+
+    @Param status: status byte
+    @Return: int
+    """
+
+    if status & FLAG_Z:
+        return (status & FLAG_N) << 1
+    return (status & FLAG_N) | 0x01
+
+
+class _AluTable:
+    def __init__(self, slot: int, operation, status: int) -> None:
+        """
+        Stand-in for one of the ALU_TABLES until it is first used
+
+        @Param slot: index in ALU_TABLES
+        @Param operation: adc or sbc
+        @Param status: FLAG_D for the decimal table, 0 for the binary one
+        @Return: None
+        """
+
+        self.slot = slot
+        self.operation = operation
+        self.status = status
+
+    def __getitem__(self, index: int) -> int:
+        #Build the real table, put it in our place and answer from it
+        table = ALU_TABLES[self.slot]
+        if table is self:
+            table = ALU_TABLES[self.slot] = self.build()
+        return table[index]
+
+    def build(self) -> array:
+        """
+        Work out every entry of the table
+
+        @Return: array
+        """
+
+        operation = self.operation
+        entries = array("I", [0]) * 0x20000
+        for carry in (0, FLAG_C):
+            for a in range(256):
+                row = (carry << 16) | (a << 8)
+                for value in range(256):
+                    result, status = operation(a, value, self.status | carry)
+                    entries[row | value] = result | ((status & 0xC3) << 8) | (_nz_of(status) << 16)
+        return entries
+
+
+#ADC and SBC for every carry, accumulator and operand, so doing the arithmetic is two indexes:
+#
+#    ALU_TABLES[operation | decimal][(carry << 16) | (a << 8) | value]
+#
+#operation is ALU_ADC or ALU_SBC and decimal is 1 in decimal mode, which is (P & FLAG_D) >> 3. Each table has
+#128K entries, and each entry packs
+#
+#    -the result in bits 0 - 7
+#    -the N, V, Z and C flags, in their places in the status byte, in bits 8 - 15
+#    -the lazy N / Z value the processor keeps (see Processor.__init__) in bits 16 - 24
+#
+#Building a table takes a fair fraction of a second, so each starts out as an _AluTable that builds the real
+#one and swaps it into the list the first time it is indexed. Code that never uses decimal mode never builds
+#the decimal tables. Hold on to the list rather than to any of the tables in it
+ALU_ADC = 0
+ALU_SBC = 2
+ALU_TABLES = [_AluTable(0, adc, 0), _AluTable(1, adc, FLAG_D), _AluTable(2, sbc, 0), _AluTable(3, sbc, FLAG_D)]
+
+
+def _flag(bit: int, doc: str) -> property:
+    """
+    Property that reads and writes one bit of P as a bool, so the old flag_* attributes keep working
+
+    @Param bit: status bit
+    @Param doc: docstring for the property
+    @Return: property
+    """
+
+    def get(self) -> bool:
+        return bool(self.P & bit)
+
+    def set(self, value: bool) -> None:
+        if value:
+            self.P |= bit
+        else:
+            self.P &= ~bit
+
+    return property(get, set, doc=doc)
+
+
 class Processor:
+    #Compatibility views of the bits in P
+    flag_v = _flag(FLAG_V, "Overflow flag")
+    flag_b = _flag(FLAG_B, "Break flag")
+    flag_d = _flag(FLAG_D, "Decimal flag")
+    flag_i = _flag(FLAG_I, "Interrupt disable")
+    flag_c = _flag(FLAG_C, "Carry flag")
+
+    @property
+    def flag_n(self) -> bool:
+        """
+        Negative flag, worked out from the last result
+
+        @Return: bool
+        """
+
+        return bool(self._nz & 0x180)
+
+    @flag_n.setter
+    def flag_n(self, value: bool) -> None:
+        self._nz = _nz_of((FLAG_N if value else 0) | (0 if self._nz & 0xFF else FLAG_Z))
+
+    @property
+    def flag_z(self) -> bool:
+        """
+        Zero flag, worked out from the last result
+
+        @Return: bool
+        """
+
+        return not self._nz & 0xFF
+
+    @flag_z.setter
+    def flag_z(self, value: bool) -> None:
+        self._nz = _nz_of((FLAG_N if self._nz & 0x180 else 0) | (FLAG_Z if value else 0))
+
+    #Fixed set of attributes instead of a per-instance __dict__, see __init__
+    __slots__ = (
+        "_memory", "_read", "_read_word", "_read_word_zero_page", "_write",
+        "reg_a", "reg_x", "reg_y", "program_counter", "stack_pointer", "cycles", "P", "_nz", "_dispatch", "_hooks",
+        "_events", "_sequence", "_stop", "_deadline", "_irq_pending", "_free_running",
+        "executed",
+    )
+
     def __init__(self, memory: Memory) -> None:
         """
         Processor class for the 6502. Boilerplate initializes the memory (from the previous memory class)
@@ -30,8 +282,25 @@ class Processor:
             -Zero
             -Carry
 
+        The status flags live packed in one byte, P, laid out NV-BDIZC the same way PHP pushes them, with
+        the unused bit 5 always on. flag_c, flag_v and the rest are still there as properties that read and
+        write their bit of P
+
+        Negative and zero are the exception. Nearly every instruction sets them and hardly anything ever looks,
+        so instead of working them out each time we keep the last result in _nz and work them out from that
+        when a branch, PHP, an interrupt or pack_status() asks. Z is set when the low byte of _nz is zero and
+        N when bit 7 (or bit 8, for the odd case of both being set, see _nz_of) is. Their bits in P are
+        always left clear, so anything outside the instruction handlers should go through pack_status() and
+        unpack_status() for the whole status byte
+
+        The stack pointer is 8 bits, the same as the real register, and the stack itself is STACK_PAGE | SP.
+        Pushes and pulls wrap around inside page 1
+
         Cycles to keep track of where we are as 6502 is a cycle-accurate processory to rely on precise timing
 
+        All of the state is in __slots__, so attribute access in the hot path is a fixed offset rather than a
+        dict lookup and snapshot() / restore() know exactly what there is to save
+
         Initialize processor class boilerplate
 
         @Param memory: Memory to use
@@ -47,32 +316,536 @@ class Processor:
         self.stack_pointer = 0
         self.cycles = 0
 
-        #Status flags
-        self.flag_n = False #Negative flag
-        self.flag_z = False #Zero flag
-        self.flag_i = True #Interrupt disable
-        self.flag_d = False #Decimal flag
-        self.flag_b = True #Break flag
-        self.flag_v = False #Overflow flag
-        self.flag_c = False #Carry flag
+        #Status flags, packed NV-BDIZC. Interrupt disable and break start out on, N and Z off
+        self.P = FLAG_U | FLAG_B | FLAG_I
+        self._nz = 0x01
+
+        #256-slot opcode dispatch table, see _build_dispatch_table, with any hooks wrapped on, see add_hook
+        self._dispatch = self._build_dispatch_table()
+        self._hooks = []
+
+        #Timed events, a heap of (cycle, sequence, callback), see schedule(). The run loop only ever compares
+        #cycles against _deadline, which is the earlier of the next event and the end of the current run
+        self._events = []
+        self._sequence = 0
+        self._stop = _FOREVER
+        self._deadline = _FOREVER
+        #IRQ that came in while interrupts were disabled, taken as soon as they are enabled again
+        self._irq_pending = False
+        #Set while run() is going on a cycle budget alone, see run()
+        self._free_running = False
+        #Instructions the last run() got through, see run()
+        self.executed = None
+
+    @property
+    def memory(self) -> Memory:
+        """
+        Memory the processor is attached to
+
+        Setting it also grabs the memory's unchecked fast path methods once, so the instruction handlers can
+        call them directly instead of looking them up on the memory every time
+
+        @Return: Memory
+        """
+
+        return self._memory
+
+    @memory.setter
+    def memory(self, memory: Memory) -> None:
+        self._memory = memory
+        self._read = memory.read_byte_fast
+        self._read_word = memory.read_word_fast
+        self._read_word_zero_page = memory.read_word_zero_page
+        self._write = memory.write_fast
+
+    def snapshot(self) -> bytes:
+        """
+        Save the registers, flags, cycles and memory into one blob
+
+        The first 16 bytes are A, X, Y, P, the stack pointer, the program counter and the cycle count, the
+        rest is a straight copy of memory, so a 64K machine comes to 64K + 16 bytes. Only the memory behind a
+        Bus is saved, not its page mappings or the state of any devices on it
+
+        @Return: bytes
+        """
+
+        header = _SNAPSHOT.pack(
+            self.reg_a, self.reg_x, self.reg_y, self.pack_status(), self.stack_pointer, self.program_counter,
+            self.cycles,
+        )
+        return header + self._memory.view()
+
+    def restore(self, blob: bytes) -> None:
+        """
+        Put the machine back the way a snapshot() left it
+
+        Memory comes back in a single buffer copy. That skips the Bus page tables (like load() does), so
+        devices and write watches don't see it, and a Translator running this processor needs invalidate()
+        calling afterwards
+
+        @Param blob: snapshot from a processor with the same size of memory
+        @Return: None
+        """
+
+        if len(blob) != _SNAPSHOT.size + self._memory.size:
+            raise ValueError("Snapshot is not the same size as this memory")
+
+        (
+            self.reg_a, self.reg_x, self.reg_y, status, sp, self.program_counter, self.cycles,
+        ) = _SNAPSHOT.unpack_from(blob)
+        #Older snapshots have the stack pointer as its full address in page 1
+        self.stack_pointer = sp & 0xFF
+        self.P = status & ~(FLAG_N | FLAG_Z)
+        self._nz = _nz_of(status)
+        self._memory.load(0x0000, memoryview(blob)[_SNAPSHOT.size:])
 
     def reset(self) -> None:
         """
         Reset processor to initial state
 
-        Certain values from the 6502 manual are used to reset program counter and stack pointer to their default values
+        Certain values from the 6502 manual are used to reset the stack pointer to its default value
         Certain flags are also set to their default values per the manual
+        The program counter is loaded from the reset vector at $FFFC, same as the real thing
 
         @Return: None
         """
 
-        self.program_counter = 0xFCE2
-        self.stack_pointer = 0x01FD
+        self.program_counter = self._read_word(RESET_VECTOR)
+        self.stack_pointer = 0xFD
         self.cycles = 0
+        self._irq_pending = False
+        self._update_deadline()
+
+        self.P = (self.P | FLAG_U | FLAG_B | FLAG_I) & ~FLAG_D
+
+    def _build_dispatch_table(self) -> list:
+        """
+        Build the 256-slot dispatch table the run loop executes from
+
+        Each slot is a tuple of (handler, mode, cycles):
+            -handler is the bound ins_* method for the instruction
+            -mode is the bound _mode_* method that fetches the operand and returns the effective address,
+             or None for implied and accumulator instructions which have no address to work out. Opcodes in
+             PAGE_PENALTY get the _page variant, which adds the page crossing cycle itself
+            -cycles is the base number of cycles the instruction takes
+
+        Everything is resolved here once, so step() never has to compare strings or look anything up by
+        name while it is running. Opcodes we don't know about get the illegal opcode handler.
+
+        @Return: list
+        """
+
+        #One operand fetcher per addressing mode, indexed by the mode constant
+        modes = [
+            None if mode in (IMPLIED, ACCUMULATOR) else getattr(self, "_mode_" + name)
+            for mode, name in enumerate(MODE_NAMES)
+        ]
+
+        page_modes = {
+            ABSOLUTE_X: self._mode_absolute_x_page,
+            ABSOLUTE_Y: self._mode_absolute_y_page,
+            INDIRECT_Y: self._mode_indirect_y_page,
+        }
+
+        table = [(self._ins_illegal, None, 0)] * 256
+
+        for opcode, (mnemonic, mode, cycles) in OPCODES.items():
+            fetch = page_modes[mode] if PAGE_PENALTY[opcode] else modes[mode]
+            table[opcode] = (getattr(self, "ins_" + mnemonic.lower()), fetch, cycles)
+
+        return table
+
+    def add_hook(self, wrap) -> None:
+        """
+        Layer a wrapped copy of the dispatch table on top of whatever is in already
+
+        This is how the profiler, tracer, debugger and idle loops get in without the run loop checking for
+        any of them. wrap takes a dispatch table and hands back a copy with some or all of its slots wrapped,
+        and has to cope with slots another hook has wrapped already (they come as (wrapper, None, cycles)).
+        Hooks can go on and come off in any order, see remove_hook()
+
+        @Param wrap: function taking a dispatch table and returning the wrapped copy
+        @Return: None
+        """
+
+        self._hooks.append(wrap)
+        self._dispatch = wrap(self._dispatch)
+        self._reload_dispatch()
+
+    def remove_hook(self, wrap) -> None:
+        """
+        Take a hook off, leaving every other hook in place
+
+        @Param wrap: function given to add_hook()
+        @Return: None
+        """
+
+        if wrap not in self._hooks:
+            raise ValueError("Hook is not on this processor")
+        self._hooks.remove(wrap)
+        self._rebuild_dispatch()
+
+    def _rebuild_dispatch(self) -> None:
+        """
+        Build the dispatch table again from scratch with the hooks wrapped on in the order they went on, for
+        when one comes off or a hook needs its wrappers making afresh
+
+        @Return: None
+        """
+
+        table = self._build_dispatch_table()
+        for wrap in self._hooks:
+            table = wrap(table)
+        self._dispatch = table
+        self._reload_dispatch()
+
+    def _reload_dispatch(self) -> None:
+        """
+        Get a run that is going on to pick up a new dispatch table
+
+        run() keeps the table in a local and only looks at self._dispatch again once it reaches the deadline,
+        so the deadline is brought forward to now. Hooks that go on or come off from an event or an instruction
+        take effect from the next instruction
+
+        @Return: None
+        """
+
+        self._deadline = self.cycles
+
+    def step(self) -> int:
+        """
+        Fetch, decode and execute a single instruction
+
+        Fetch the opcode the program counter points at and move the program counter past it, then decode it
+        by indexing into the dispatch table. The addressing mode (if there is one) fetches the operand bytes,
+        moving the program counter along with it, and hands the effective address to the instruction handler.
+
+        Any events that are due (see schedule()) are fired first
 
-        self.flag_i = True
-        self.flag_d = False
-        self.flag_b = True
+        @Return: int (cycles taken by the instruction)
+        """
+
+        if self.cycles >= self._deadline:
+            self._fire_events()
+
+        pc = self.program_counter
+        opcode = self._read(pc)
+        self.program_counter = (pc + 1) & 0xFFFF
+
+        handler, mode, cycles = self._dispatch[opcode]
+        if mode is None:
+            handler()
+        else:
+            handler(mode())
+
+        self.cycles += cycles
+        return cycles
+
+    def run(self, instructions: int = None, max_cycles: int = None, until_pc: int = None) -> int:
+        """
+        Execute instructions back to back until one of the limits given is reached
+
+        Same as calling step() over and over, but the loop is written out here with everything it needs
+        held in locals so we skip a method call and a handful of attribute lookups per instruction
+
+            -instructions stops after that many instructions
+            -max_cycles stops at the first instruction boundary at or past that many cycles from now
+            -until_pc stops when the program counter gets to that address, before running what is there
+
+        With only max_cycles given, the only check per instruction is one comparison of cycles against the
+        deadline, which is whichever comes first of the end of the budget and the next scheduled event.
+        Events are fired when the deadline is reached and then the deadline moves on, so a run with nothing
+        scheduled never pays for the event queue. Cycles spent taking interrupts count towards the budget
+
+        Runs with an instruction count or an address to stop at leave how many instructions they got through in
+        executed (even if one raised). A run on a cycle budget alone doesn't count them and leaves it None
+
+        Only a run on a cycle budget alone sets _free_running. Nothing is counting instructions or watching
+        the program counter then, so an IdleLoops (see py6502.idle) is free to jump a waiting loop straight
+        on to the deadline
+
+        @Param instructions: number of instructions to execute
+        @Param max_cycles: cycle budget
+        @Param until_pc: address to stop at
+        @Return: int (total cycles taken)
+        """
+
+        if instructions is None and max_cycles is None and until_pc is None:
+            raise ValueError("run() needs an instruction count, a cycle budget or an address to stop at")
+
+        read = self._read
+        dispatch = self._dispatch
+        start = self.cycles
+        limit = remaining = _FOREVER if instructions is None else instructions
+        stop = self._stop = _FOREVER if max_cycles is None else start + max_cycles
+        self._update_deadline()
+
+        try:
+            if instructions is None and until_pc is None:
+                self._free_running = True
+                while True:
+                    while self.cycles < self._deadline:
+                        pc = self.program_counter
+                        handler, mode, cycles = dispatch[read(pc)]
+                        self.program_counter = (pc + 1) & 0xFFFF
+                        if mode is None:
+                            handler()
+                        else:
+                            handler(mode())
+                        self.cycles += cycles
+                    if self.cycles >= stop:
+                        break
+                    self._fire_events()
+                    dispatch = self._dispatch
+            else:
+                while remaining:
+                    if self.cycles >= self._deadline:
+                        if self.cycles >= stop:
+                            break
+                        self._fire_events()
+                        dispatch = self._dispatch
+                        continue
+                    pc = self.program_counter
+                    if pc == until_pc:
+                        break
+                    handler, mode, cycles = dispatch[read(pc)]
+                    self.program_counter = (pc + 1) & 0xFFFF
+                    if mode is None:
+                        handler()
+                    else:
+                        handler(mode())
+                    self.cycles += cycles
+                    remaining -= 1
+        finally:
+            self.executed = None if self._free_running else limit - remaining
+            self._stop = _FOREVER
+            self._free_running = False
+            self._update_deadline()
+
+        return self.cycles - start
+
+    def schedule(self, cycle: int, event) -> None:
+        """
+        Call event() at the first instruction boundary once the cycle count reaches cycle
+
+        Devices use this to time their interrupts (eg. a timer schedules irq() for when it will next
+        underflow) instead of being polled every instruction. cycle is an absolute cycle count, compare it
+        against self.cycles. Events due at the same cycle fire in the order they were scheduled
+
+        @Param cycle: cycle count to fire at
+        @Param event: callback, takes no arguments
+        @Return: None
+        """
+
+        self._sequence += 1
+        heapq.heappush(self._events, (cycle, self._sequence, event))
+        if cycle < self._deadline:
+            self._deadline = cycle
+
+    def schedule_irq(self, cycle: int) -> None:
+        """
+        Raise an IRQ at a cycle count, see schedule() and irq()
+
+        @Param cycle: cycle count to raise it at
+        @Return: None
+        """
+
+        self.schedule(cycle, self.irq)
+
+    def schedule_nmi(self, cycle: int) -> None:
+        """
+        Raise an NMI at a cycle count, see schedule() and nmi()
+
+        @Param cycle: cycle count to raise it at
+        @Return: None
+        """
+
+        self.schedule(cycle, self.nmi)
+
+    def _fire_events(self) -> None:
+        """
+        Fire every event that is due, then work out the next deadline
+
+        @Return: None
+        """
+
+        events = self._events
+        while events and events[0][0] <= self.cycles:
+            heapq.heappop(events)[2]()
+        self._update_deadline()
+
+    def _update_deadline(self) -> None:
+        """
+        Deadline is the next event or the end of the current run, whichever is first
+
+        @Return: None
+        """
+
+        events = self._events
+        self._deadline = min(events[0][0], self._stop) if events else self._stop
+
+    def irq(self) -> None:
+        """
+        Interrupt request
+
+        Taken straight away if interrupts are enabled. If the interrupt disable flag is set it is held until
+        CLI, PLP or RTI clears it and taken then, the way a device holding the IRQ line low would be
+
+        Only call this between instructions. A device that wants to interrupt from inside one of its read or
+        write callbacks should schedule_irq(proc.cycles) instead, which waits for the instruction to finish
+
+        @Return: None
+        """
+
+        if self.P & FLAG_I:
+            self._irq_pending = True
+        else:
+            self._irq_pending = False
+            self._interrupt(IRQ_VECTOR)
+
+    def nmi(self) -> None:
+        """
+        Non-maskable interrupt, always taken straight away
+
+        @Return: None
+        """
+
+        self._interrupt(NMI_VECTOR)
+
+    def _interrupt(self, vector: int) -> None:
+        """
+        Take a hardware interrupt
+
+        Same as BRK apart from the status pushed having the break bit clear (which is how a handler tells them
+        apart) and the program counter pushed being the next instruction. Takes 7 cycles
+
+        @Param vector: address of the vector to jump through
+        @Return: None
+        """
+
+        pc = self.program_counter
+        sp = self.stack_pointer
+        write = self._write
+        write(STACK_PAGE | sp, pc >> 8)
+        write(STACK_PAGE | ((sp - 1) & 0xFF), pc & 0xFF)
+        write(STACK_PAGE | ((sp - 2) & 0xFF), self.pack_status() & ~FLAG_B)
+        self.stack_pointer = (sp - 3) & 0xFF
+        self.P |= FLAG_I
+        self.program_counter = self._read_word(vector)
+        self.cycles += 7
+
+    def _check_irq(self) -> None:
+        """
+        Called when the interrupt disable flag might have just been cleared, to take an IRQ that was held
+
+        It is scheduled for now rather than taken here so it happens at the next instruction boundary,
+        after the instruction that cleared the flag has finished
+
+        @Return: None
+        """
+
+        if self._irq_pending and not self.P & FLAG_I:
+            self._irq_pending = False
+            self.schedule(self.cycles, self.irq)
+
+    def _ins_illegal(self) -> None:
+        """
+        Called for any opcode that has no entry in the opcode table
+
+        The program counter has already moved past the opcode, so step back one to report it
+
+        @Return: None
+        """
+
+        addr = (self.program_counter - 1) & 0xFFFF
+        raise ValueError(f"Unsupported opcode: ${self._read(addr):02X} at ${addr:04X}")
+
+    def _fetch_byte(self) -> int:
+        """
+        Fetch the byte at the program counter and move the program counter past it
+
+        @Return: int
+        """
+
+        pc = self.program_counter
+        self.program_counter = (pc + 1) & 0xFFFF
+        return self._read(pc)
+
+    def _fetch_word(self) -> int:
+        """
+        Fetch the little-endian word at the program counter and move the program counter past it
+
+        @Return: int
+        """
+
+        pc = self.program_counter
+        self.program_counter = (pc + 2) & 0xFFFF
+        return self._read_word(pc)
+
+    #Operand fetching for the dispatch table
+    #Each of these reads the operand bytes for one addressing mode from the program counter and returns the
+    #effective address, see calculate_effective_address for what each mode means
+
+    def _mode_zero_page(self) -> int:
+        return self._fetch_byte()
+
+    def _mode_zero_page_x(self) -> int:
+        return (self._fetch_byte() + self.reg_x) & 0xFF
+
+    def _mode_zero_page_y(self) -> int:
+        return (self._fetch_byte() + self.reg_y) & 0xFF
+
+    def _mode_absolute(self) -> int:
+        return self._fetch_word()
+
+    def _mode_absolute_x(self) -> int:
+        return (self._fetch_word() + self.reg_x) & 0xFFFF
+
+    def _mode_absolute_y(self) -> int:
+        return (self._fetch_word() + self.reg_y) & 0xFFFF
+
+    def _mode_immediate(self) -> int:
+        #The operand is the value itself, so its address is just where it sits in the instruction
+        pc = self.program_counter
+        self.program_counter = (pc + 1) & 0xFFFF
+        return pc
+
+    def _mode_indirect(self) -> int:
+        return self._ea_indirect(self._fetch_word())
+
+    def _mode_indirect_x(self) -> int:
+        return self._ea_indirect_x(self._fetch_byte())
+
+    def _mode_indirect_y(self) -> int:
+        return self._ea_indirect_y(self._fetch_byte())
+
+    def _mode_relative(self) -> int:
+        #Offset is relative to the instruction after the branch, which is where the program counter is now
+        return self._ea_relative(self._fetch_byte())
+
+    #Same again for the read instructions in PAGE_PENALTY, which cost a cycle more when adding the index
+    #changes the high byte of the address
+
+    def _mode_absolute_x_page(self) -> int:
+        base = self._fetch_word()
+        addr = (base + self.reg_x) & 0xFFFF
+        if (addr ^ base) & 0xFF00:
+            self.cycles += 1
+        return addr
+
+    def _mode_absolute_y_page(self) -> int:
+        base = self._fetch_word()
+        addr = (base + self.reg_y) & 0xFFFF
+        if (addr ^ base) & 0xFF00:
+            self.cycles += 1
+        return addr
+
+    def _mode_indirect_y_page(self) -> int:
+        base = self._read_word_zero_page(self._fetch_byte())
+        addr = (base + self.reg_y) & 0xFFFF
+        if (addr ^ base) & 0xFF00:
+            self.cycles += 1
+        return addr
 
     def read_reg_a(self) -> int:
         """
@@ -106,35 +879,108 @@ class Processor:
     
     def push(self, data: int) -> None:
         """
-        Push data onto stack and don't bypass memory safety checks ok
+        Push data onto stack
+
+        The stack lives in page 1 and the stack pointer is the 8-bit offset into it, so pushing past $0100
+        wraps around to $01FF the same as the real thing. The stack instructions do this inline rather than
+        calling here
 
+        @Param data: byte to push
         @Return: None
         """
 
-        self.memory.write(self.stack_pointer, data)
-        self.stack_pointer -= 1
-        self.cycles +=1
+        sp = self.stack_pointer
+        self._write(STACK_PAGE | sp, data)
+        self.stack_pointer = (sp - 1) & 0xFF
 
     def pop(self) -> int:
         """
-        Pop data from stack
+        Pop data from stack, wrapping around from $01FF to $0100
 
         @Return: int
         """
 
-        self.stack_pointer += 1
-        self.cycles +=1
-        return self.memory[self.stack_pointer - 1]
-
-    def calculate_effective_address(self, mode: str, op: int) -> int:
+        self.stack_pointer = sp = (self.stack_pointer + 1) & 0xFF
+        return self._read(STACK_PAGE | sp)
+
+    #Effective address for each addressing mode given its operand, see calculate_effective_address
+    #These work from an operand that has already been fetched, where the _mode_* methods above fetch it
+
+    def _ea_none(self, op: int) -> int:
+        raise ValueError("Addressing mode has no effective address")
+
+    def _ea_zero_page(self, op: int) -> int:
+        return op & 0xFF
+
+    def _ea_zero_page_x(self, op: int) -> int:
+        return (op + self.reg_x) & 0xFF
+
+    def _ea_zero_page_y(self, op: int) -> int:
+        return (op + self.reg_y) & 0xFF
+
+    def _ea_absolute(self, op: int) -> int:
+        return op & 0xFFFF
+
+    def _ea_absolute_x(self, op: int) -> int:
+        return (op + self.reg_x) & 0xFFFF
+
+    def _ea_absolute_y(self, op: int) -> int:
+        return (op + self.reg_y) & 0xFFFF
+
+    def _ea_indirect(self, op: int) -> int:
+        #The 6502 never carries into the high byte of the pointer, so JMP ($10FF) reads its high byte
+        #from $1000 rather than $1100. Programs rely on it, so we have to copy it
+        low_byte = self._read(op)
+        high_byte = self._read((op & 0xFF00) | ((op + 1) & 0xFF))
+        return (high_byte << 8) | low_byte
+
+    def _ea_indirect_x(self, op: int) -> int:
+        #Pointer lives in the zero page, and both bytes of it wrap around inside the zero page
+        return self._read_word_zero_page(op + self.reg_x)
+
+    def _ea_indirect_y(self, op: int) -> int:
+        return (self._read_word_zero_page(op) + self.reg_y) & 0xFFFF
+
+    def _ea_relative(self, op: int) -> int:
+        #Operand is a signed byte, anything with bit 7 on is negative
+        if (op & 0x80):
+            op -= 0x100
+        return (self.program_counter + op) & 0xFFFF
+
+    #Indexed by the mode constants from py6502.addressing, built once when the class is created
+    _EFFECTIVE_ADDRESS = (
+        _ea_none,           #implied
+        _ea_none,           #accumulator
+        _ea_none,           #immediate
+        _ea_zero_page,
+        _ea_zero_page_x,
+        _ea_zero_page_y,
+        _ea_absolute,
+        _ea_absolute_x,
+        _ea_absolute_y,
+        _ea_indirect,
+        _ea_indirect_x,
+        _ea_indirect_y,
+        _ea_relative,
+    )
+
+    def calculate_effective_address(self, mode: int, op: int) -> int:
         """
         Caclulates the effective address of each addressing mode for instructions such as LDA, STA...
 
-        -Absolute (Where the full 16 bit address is provided as an operand, eg. LDA #$42, value $42 is loaded to accumulator)
+        -Absolute (Where the full 16 bit address is provided as an operand, eg. LDA $4200)
         -Zero page (Where address is specified as an 8-bit values, within the first 256 bytes of memory 0x00 -> 0xFF, assumed zero high address byte)
         -Absolute X and Y (Address is calculated by adding the value in the the X or Y register to a 16-bit base address)
         -Zero page X and Y (Address is calculated by adding the value in register X or Y to an 8-bit zero page address)
+        -Indirect (The operand is the address of a 16-bit address, used by JMP)
         -Indirect X and Y (Address is calculated using indexed indirect or indirect indexed addressing)
+        -Relative (The operand is a signed offset from the program counter, used by branches)
+
+        Implied, accumulator and immediate modes don't have an effective address, the value is either
+        nowhere or in the instruction itself, so asking for one raises a ValueError
+
+        Modes are the int constants from py6502.addressing and index straight into a table of resolvers,
+        so there is no chain of comparisons to walk through
 
         @Param mode: Addressing mode
         @Param op: operand
@@ -142,42 +988,26 @@ class Processor:
         @Return: int
         """
 
-        if mode == "absolute":
-            return op
-        elif mode == "zero_page":
-            return op & 0xFF
-        elif mode == "absolute_x":
-            return op + self.reg_x
-        elif mode == "absolute_y":
-            return op + self.reg_y
-        elif mode == "zero_page_x":
-            return (op + self.reg_x) & 0xFF
-        elif mode == "zero_page_y":
-            return (op + self.reg_y) & 0xFF
-        else:
+        if not 0 <= mode < len(self._EFFECTIVE_ADDRESS):
             raise ValueError(f"Unsupported addressing mode: {mode}")
-        
-    def get_cycles_for_mode(self, mode: str) -> int:
+        return self._EFFECTIVE_ADDRESS[mode](self, op)
+
+    def get_cycles_for_mode(self, mode: int) -> int:
         """
         To keep the processor cycle-accurate, values for each addressing mode must be accurate
 
-        Store cycles in a dictionary with key(mode) and value(cycles to be added)
+        Cycles are kept in a table indexed by mode (MODE_CYCLES in py6502.addressing) that is only built once.
+        These are for a read like LDA without crossing a page, the run loop uses the per-opcode cycles in
+        py6502.opcodes (CYCLES and PAGE_PENALTY) instead
 
         @Param mode: addressing mode
         @Return: int
         """
 
-        cycles = {
-            "absolute" : 4,
-            "zero_page" : 3,
-            "absolute_x" : 4,
-            "absolute_y" : 4,
-            "zero_page_x" : 4,
-            "zero_page_y" : 4
-        }
+        if not 0 <= mode < len(MODE_CYCLES):
+            return 0
+        return MODE_CYCLES[mode]
 
-        return cycles.get(mode, 0)
-    
     def ins_nop(self) -> None:
         """
         NOP - No operation
@@ -193,8 +1023,6 @@ class Processor:
         @Return: None
         """
 
-        self.cycles += 2
-
     def ins_clc(self) -> None:
         """
         CLC - Clear carry flag
@@ -204,8 +1032,7 @@ class Processor:
         @Return: None
         """
 
-        self.flag_c = False
-        self.cycles += 2
+        self.P &= ~FLAG_C
 
     def ins_cld(self) -> None:
         """
@@ -215,8 +1042,7 @@ class Processor:
 
         @Return: None
         """
-        self.flag_d = False
-        self.cycles += 2
+        self.P &= ~FLAG_D
 
     def ins_cli(self) -> None:
         """
@@ -227,8 +1053,8 @@ class Processor:
         @Return: None
         """
 
-        self.flag_i = False
-        self.cycles += 2
+        self.P &= ~FLAG_I
+        self._check_irq()
 
     def ins_clv(self) -> None:
         """
@@ -239,8 +1065,7 @@ class Processor:
         @Return: None
         """
 
-        self.flag_v = False
-        self.cycles += 2
+        self.P &= ~FLAG_V
 
     def ins_sec(self) -> None:
         """
@@ -251,8 +1076,7 @@ class Processor:
         @Return: None
         """
 
-        self.flag_c = True
-        self.cycles += 2
+        self.P |= FLAG_C
 
     def ins_sed(self) -> None:
         """
@@ -263,8 +1087,7 @@ class Processor:
         @Return: None
         """
 
-        self.flag_d = True
-        self.cycles += 2
+        self.P |= FLAG_D
 
     def ins_sei(self) -> None:
         """
@@ -275,10 +1098,9 @@ class Processor:
         @Return: None
         """
 
-        self.flag_i = True
-        self.cycles += 2
+        self.P |= FLAG_I
 
-    def ins_lda(self, mode: str, op: int, val: int) -> None:
+    def ins_lda(self, addr: int) -> None:
         """
         LDA - Load data accumulator from memory
 
@@ -288,48 +1110,21 @@ class Processor:
         if the accumulator is zero as a result of LDA, otherwise resets the zero flag; set the negative flag if
         bit 7 of the accumulator is 1, otherwise resets the negative flag.
 
-        @Param mode: addressing mode to be used
-        @Param op: operand
-        @Param val: value to be loaded to accumulator
-        @Return: None
-        """
+        The addressing mode has already been worked out by the dispatch table by the time we get here,
+        so all LDA has to do is read from the effective address
 
+        @Param addr: effective address to load the accumulator from
+        @Return: None
         """
 
-        *** OLD - immediate only ***
-
-        #Value of accumulator register is stored
-        self.reg_a = val
-
-        #If accumulator is zero, set zero flag
-        if (self.reg_a == 0):
-            self.flag_z = True
+        self.reg_a = value = self._read(addr)
+        self._nz = value
 
-        #If bit 7 is 1, set negative flag
-        #Performs bitwise & on accumulator comparing reg_a value to 10000000
-        #If true, result is just 0x80 again, if false, result is zero
-        if (self.reg_a & 0x80):
-            self.flag_n = True
-
-        #Cycle increment
-        self.cycles += 1
-        
+    def ins_sta(self, addr: int) -> None:
         """
+        STA - Store contents of accumulator to memory
 
-        effective_addr = self.calculate_effective_address(mode, op)
-        self.reg_a = self.memory.read(effective_addr)
-
-        if (self.reg_a & 0x80):
-            self.flag_n = True
-        if (self.reg_a == 0):
-            self.flag_z = True
-        self.cycles += self.get_cycles_for_mode(mode)
-
-    def ins_sta(self, mode: str, op: int) -> None:
-        """
-        STA - Store contents of accumulator to memory
-
-        Affects none of the flags in the processor status register and does not affect accumulator
+        Affects none of the flags in the processor status register and does not affect accumulator
 
         Multiple addressing modes:
             -Absolute (Full 16-bit address is provided as operand)
@@ -338,14 +1133,11 @@ class Processor:
             -Zero page X, Y (Address is calculated by adding the value or X or Y register to an 8-bit zero pages address)
             -Indirect X, Y (Address is calculated using indexed indirec tof indirect indexed addressing)
 
-        @Param mode: addressing mode
-        @Param op: operand
+        @Param addr: effective address to store the accumulator to
         @Return: None
         """
 
-        effective_addr = self.calculate_effective_address(mode, op)
-        self.memory.write(effective_addr, self.reg_a)
-        self.cycles += self.get_cycles_for_mode(mode)
+        self._write(addr, self.reg_a)
 
     def ins_tax(self) -> None:
         """
@@ -361,12 +1153,8 @@ class Processor:
         @Return: None
         """
 
-        self.reg_x = self.reg_a
-        if (self.reg_x == 0):
-            self.flag_z = True
-        if(self.reg_x & 0x80):
-            self.flag_n = True
-        self.cycles += 2
+        self.reg_x = value = self.reg_a
+        self._nz = value
 
     def ins_txa(self) -> None:
         """
@@ -382,12 +1170,8 @@ class Processor:
         @Return: None
         """
 
-        self.reg_a = self.reg_x
-        if (self.reg_a == 0):
-            self.flag_z = True
-        if (self.reg_a & 0x80):
-            self.flag_n = True
-        self.cycles += 2
+        self.reg_a = value = self.reg_x
+        self._nz = value
 
     def ins_tay(self) -> None:
         """
@@ -398,12 +1182,8 @@ class Processor:
         @Return: None
         """
 
-        self.reg_y = self.reg_a
-        if (self.reg_y == 0):
-            self.flag_z = True
-        if(self.reg_y & 0x80):
-            self.flag_n = True
-        self.cycles += 2
+        self.reg_y = value = self.reg_a
+        self._nz = value
 
     def ins_tya(self) -> None:
         """
@@ -414,12 +1194,8 @@ class Processor:
         @Return: None
         """
 
-        self.reg_a = self.reg_y
-        if (self.reg_a == 0):
-            self.flag_z = True
-        if (self.reg_a & 0x80):
-            self.flag_n = True
-        self.cycles += 2
+        self.reg_a = value = self.reg_y
+        self._nz = value
 
     def ins_tsx(self) -> None:
         """
@@ -438,14 +1214,8 @@ class Processor:
         @Return: None
         """
 
-        self.reg_x = self.stack_pointer
-
-        if (self.reg_x == 0):
-            self.flag_z = True
-        if (self.reg_x & 0x80):
-            self.flag_n = True
-
-        self.cycles += 2
+        self.reg_x = value = self.stack_pointer
+        self._nz = value
 
     def ins_txs(self) -> None:
         """
@@ -461,7 +1231,6 @@ class Processor:
         """
 
         self.stack_pointer = self.reg_x
-        self.cycles += 2
 
     def ins_dex(self) -> None:
         """
@@ -477,14 +1246,8 @@ class Processor:
         @Return: None
         """
 
-        self.reg_x -= 1
-
-        if (self.reg_x == 0):
-            self.flag_z = True
-        if (self.reg_x & 0x80):
-            self.flag_n = True
-
-        self.cycles += 2
+        self.reg_x = value = (self.reg_x - 1) & 0xFF
+        self._nz = value
 
     def ins_dey(self) -> None:
         """
@@ -495,14 +1258,8 @@ class Processor:
         @Return: None
         """
 
-        self.reg_y -= 1
-
-        if (self.reg_y == 0):
-            self.flag_z = True
-        if (self.reg_y & 0x80):
-            self.flag_n = True
-        
-        self.cycles += 2
+        self.reg_y = value = (self.reg_y - 1) & 0xFF
+        self._nz = value
 
     def ins_inx(self) -> None:
         """
@@ -518,14 +1275,8 @@ class Processor:
         @Return: None
         """
 
-        self.reg_x += 1
-
-        if (self.reg_x == 0):
-            self.flag_z = True
-        if (self.reg_x & 0x80):
-            self.flag_n = True
-
-        self.cycles += 2
+        self.reg_x = value = (self.reg_x + 1) & 0xFF
+        self._nz = value
 
     def ins_iny(self) -> None:
         """
@@ -536,21 +1287,591 @@ class Processor:
         @Return: None
         """
 
-        self.reg_y += 1
+        self.reg_y = value = (self.reg_y + 1) & 0xFF
+        self._nz = value
 
-        if (self.reg_y == 0):
-            self.flag_z = True
-        if (self.reg_y & 0x80):
-            self.flag_n = True
-
-        self.cycles += 2
-
-    def ins_dec(self, mode: str, op: str) -> None:
+    def ins_dec(self, addr: int) -> None:
         """
         DEC - Decrement memory by one
 
         Subtracts one in two's complement from the contents of the addressed memory location
 
         Multiple addressing modes:
-            -Absolute (DEC $nnnn, )
-        """
\ No newline at end of file
+            -Absolute (DEC $nnnn)
+            -Zero page (DEC $nn)
+            -Absolute X (DEC $nnnn,X)
+            -Zero page X (DEC $nn,X)
+
+        Does not affect carry or overflow flags
+        Sets the negative flag if bit 7 of the result is on, otherwise reset
+        Sets the zero flag if the result is zero, otherwise reset
+
+        @Param addr: effective address of the memory to decrement
+        @Return: None
+        """
+
+        #Wrap 0x00 around to 0xFF so the result is still a valid byte
+        value = (self._read(addr) - 1) & 0xFF
+        self._write(addr, value)
+        self._nz = value
+
+    def ins_inc(self, addr: int) -> None:
+        """
+        INC - Increment memory by one
+
+        Adds one to the contents of the addressed memory location, wrapping 0xFF around to 0x00
+
+        Does not affect carry or overflow flags
+        Sets the negative flag if bit 7 of the result is on, otherwise reset
+        Sets the zero flag if the result is zero, otherwise reset
+
+        @Param addr: effective address of the memory to increment
+        @Return: None
+        """
+
+        value = (self._read(addr) + 1) & 0xFF
+        self._write(addr, value)
+        self._nz = value
+
+    def ins_ldx(self, addr: int) -> None:
+        """
+        LDX - Load index x with memory
+
+        Same as LDA but the value goes to index register x
+
+        @Param addr: effective address to load index x from
+        @Return: None
+        """
+
+        self.reg_x = value = self._read(addr)
+        self._nz = value
+
+    def ins_ldy(self, addr: int) -> None:
+        """
+        LDY - Load index y with memory
+
+        Same as LDA but the value goes to index register y
+
+        @Param addr: effective address to load index y from
+        @Return: None
+        """
+
+        self.reg_y = value = self._read(addr)
+        self._nz = value
+
+    def ins_stx(self, addr: int) -> None:
+        """
+        STX - Store index x in memory
+
+        Affects no flags
+
+        @Param addr: effective address to store index x to
+        @Return: None
+        """
+
+        self._write(addr, self.reg_x)
+
+    def ins_sty(self, addr: int) -> None:
+        """
+        STY - Store index y in memory
+
+        Affects no flags
+
+        @Param addr: effective address to store index y to
+        @Return: None
+        """
+
+        self._write(addr, self.reg_y)
+
+    def ins_and(self, addr: int) -> None:
+        """
+        AND - AND memory with accumulator
+
+        Bitwise AND of the accumulator and memory, result is stored in the accumulator
+
+        Sets the negative flag if bit 7 of the result is on, otherwise reset
+        Sets the zero flag if the result is zero, otherwise reset
+
+        @Param addr: effective address of the operand
+        @Return: None
+        """
+
+        self.reg_a = value = self.reg_a & self._read(addr)
+        self._nz = value
+
+    def ins_eor(self, addr: int) -> None:
+        """
+        EOR - Exclusive OR memory with accumulator
+
+        See AND above, but with exclusive OR
+
+        @Param addr: effective address of the operand
+        @Return: None
+        """
+
+        self.reg_a = value = self.reg_a ^ self._read(addr)
+        self._nz = value
+
+    def ins_ora(self, addr: int) -> None:
+        """
+        ORA - OR memory with accumulator
+
+        See AND above, but with inclusive OR
+
+        @Param addr: effective address of the operand
+        @Return: None
+        """
+
+        self.reg_a = value = self.reg_a | self._read(addr)
+        self._nz = value
+
+    def ins_bit(self, addr: int) -> None:
+        """
+        BIT - Test bits in memory with accumulator
+
+        ANDs the accumulator with memory to set the zero flag, but throws the result away so the accumulator
+        is left alone. Bits 7 and 6 of the memory value are copied straight into the negative and overflow flags
+
+        @Param addr: effective address of the operand
+        @Return: None
+        """
+
+        value = self._read(addr)
+        self.P = (self.P & 0xBF) | (value & FLAG_V)
+        self._nz = _nz_of((value & FLAG_N) | (0 if self.reg_a & value else FLAG_Z))
+
+    def ins_adc(self, addr: int) -> None:
+        """
+        ADC - Add memory to accumulator with carry
+
+        Adds memory and the carry flag to the accumulator, result is stored in the accumulator
+
+        Carry flag is set if the result doesn't fit in 8 bits, otherwise reset
+        Overflow flag is set if the sign of the result is wrong, ie. two positives made a negative or two negatives
+        made a positive, otherwise reset
+
+        In decimal mode both bytes are treated as two BCD digits (0x00 -> 0x99). Negative, overflow and zero flags
+        follow what the NMOS 6502 actually does in decimal mode, which is not entirely sensible
+
+        The result and flags are looked up in ALU_TABLES, see adc() for the arithmetic
+
+        @Param addr: effective address of the operand
+        @Return: None
+        """
+
+        P = self.P
+        table = ALU_TABLES[ALU_ADC | ((P & FLAG_D) >> 3)]
+        entry = table[((P & FLAG_C) << 16) | (self.reg_a << 8) | self._read(addr)]
+        self.reg_a = entry & 0xFF
+        self.P = (P & 0xBE) | ((entry >> 8) & (FLAG_V | FLAG_C))
+        self._nz = entry >> 16
+
+    def ins_sbc(self, addr: int) -> None:
+        """
+        SBC - Subtract memory from accumulator with borrow
+
+        Subtracts memory and the inverse of the carry flag (the borrow) from the accumulator,
+        result is stored in the accumulator
+
+        Carry flag is reset if a borrow was needed, otherwise set
+        Overflow flag is set if the sign of the result is wrong, otherwise reset
+
+        In decimal mode the accumulator gets the BCD difference but every flag comes from the binary
+        subtraction, same as on the NMOS 6502
+
+        The result and flags are looked up in ALU_TABLES, see sbc() for the arithmetic
+
+        @Param addr: effective address of the operand
+        @Return: None
+        """
+
+        P = self.P
+        table = ALU_TABLES[ALU_SBC | ((P & FLAG_D) >> 3)]
+        entry = table[((P & FLAG_C) << 16) | (self.reg_a << 8) | self._read(addr)]
+        self.reg_a = entry & 0xFF
+        self.P = (P & 0xBE) | ((entry >> 8) & (FLAG_V | FLAG_C))
+        self._nz = entry >> 16
+
+    def _compare(self, reg: int, addr: int) -> None:
+        """
+        Compare a register with memory for CMP, CPX and CPY
+
+        Subtracts memory from the register without storing the result anywhere
+
+        Carry flag is set if the register is greater than or equal to memory, otherwise reset
+        Negative and zero flags are set from the result of the subtraction
+
+        @Param reg: register value
+        @Param addr: effective address of the operand
+        @Return: None
+        """
+
+        value = reg - self._read(addr)
+        self.P = (self.P & 0xFE) | (value >= 0)
+        self._nz = value & 0xFF
+
+    def ins_cmp(self, addr: int) -> None:
+        """
+        CMP - Compare memory and accumulator
+
+        @Param addr: effective address of the operand
+        @Return: None
+        """
+
+        self._compare(self.reg_a, addr)
+
+    def ins_cpx(self, addr: int) -> None:
+        """
+        CPX - Compare memory and index x
+
+        @Param addr: effective address of the operand
+        @Return: None
+        """
+
+        self._compare(self.reg_x, addr)
+
+    def ins_cpy(self, addr: int) -> None:
+        """
+        CPY - Compare memory and index y
+
+        @Param addr: effective address of the operand
+        @Return: None
+        """
+
+        self._compare(self.reg_y, addr)
+
+    def ins_asl(self, addr: int = None) -> None:
+        """
+        ASL - Arithmetic shift left
+
+        Shifts every bit of the accumulator or memory one place left. Bit 0 is filled with a zero and bit 7
+        goes into the carry flag
+
+        Accumulator mode has no address, the dispatch table calls us with nothing and we work on the accumulator
+
+        @Param addr: effective address of the operand, None for the accumulator
+        @Return: None
+        """
+
+        value = self.reg_a if addr is None else self._read(addr)
+        value <<= 1
+        self.P = (self.P & 0xFE) | (value >> 8)
+        self._nz = value = value & 0xFF
+
+        if addr is None:
+            self.reg_a = value
+        else:
+            self._write(addr, value)
+
+    def ins_lsr(self, addr: int = None) -> None:
+        """
+        LSR - Logical shift right
+
+        Shifts every bit of the accumulator or memory one place right. Bit 7 is filled with a zero and bit 0
+        goes into the carry flag, so the negative flag always ends up reset
+
+        @Param addr: effective address of the operand, None for the accumulator
+        @Return: None
+        """
+
+        value = self.reg_a if addr is None else self._read(addr)
+        self.P = (self.P & 0xFE) | (value & 0x01)
+        self._nz = value = value >> 1
+
+        if addr is None:
+            self.reg_a = value
+        else:
+            self._write(addr, value)
+
+    def ins_rol(self, addr: int = None) -> None:
+        """
+        ROL - Rotate left
+
+        Same as ASL, except bit 0 is filled with the old carry flag instead of a zero
+
+        @Param addr: effective address of the operand, None for the accumulator
+        @Return: None
+        """
+
+        value = self.reg_a if addr is None else self._read(addr)
+        value = (value << 1) | (self.P & FLAG_C)
+        self.P = (self.P & 0xFE) | (value >> 8)
+        self._nz = value = value & 0xFF
+
+        if addr is None:
+            self.reg_a = value
+        else:
+            self._write(addr, value)
+
+    def ins_ror(self, addr: int = None) -> None:
+        """
+        ROR - Rotate right
+
+        Same as LSR, except bit 7 is filled with the old carry flag instead of a zero
+
+        @Param addr: effective address of the operand, None for the accumulator
+        @Return: None
+        """
+
+        value = self.reg_a if addr is None else self._read(addr)
+        value |= (self.P & FLAG_C) << 8
+        self.P = (self.P & 0xFE) | (value & 0x01)
+        self._nz = value = value >> 1
+
+        if addr is None:
+            self.reg_a = value
+        else:
+            self._write(addr, value)
+
+    def ins_jmp(self, addr: int) -> None:
+        """
+        JMP - Jump to new location
+
+        Sets the program counter to the effective address, absolute or indirect. Affects no flags
+
+        @Param addr: address to jump to
+        @Return: None
+        """
+
+        self.program_counter = addr
+
+    def ins_jsr(self, addr: int) -> None:
+        """
+        JSR - Jump to subroutine
+
+        Pushes the address of the last byte of the JSR instruction (high byte first) and jumps.
+        RTS adds the missing one back on when it returns
+
+        @Param addr: address of the subroutine
+        @Return: None
+        """
+
+        ret = (self.program_counter - 1) & 0xFFFF
+        sp = self.stack_pointer
+        self._write(STACK_PAGE | sp, ret >> 8)
+        self._write(STACK_PAGE | ((sp - 1) & 0xFF), ret & 0xFF)
+        self.stack_pointer = (sp - 2) & 0xFF
+        self.program_counter = addr
+
+    def ins_rts(self) -> None:
+        """
+        RTS - Return from subroutine
+
+        Pulls the return address pushed by JSR and adds one to get to the next instruction
+
+        @Return: None
+        """
+
+        sp = self.stack_pointer
+        low_byte = self._read(STACK_PAGE | ((sp + 1) & 0xFF))
+        sp = (sp + 2) & 0xFF
+        self.stack_pointer = sp
+        self.program_counter = (((self._read(STACK_PAGE | sp) << 8) | low_byte) + 1) & 0xFFFF
+
+    def _branch(self, taken: bool, addr: int) -> None:
+        """
+        Shared by all the branch instructions
+
+        If the branch is taken, the program counter moves to the target and the branch costs an extra cycle,
+        or two if the target is on a different page from the instruction after the branch
+
+        @Param taken: whether the branch condition was met
+        @Param addr: branch target
+        @Return: None
+        """
+
+        if taken:
+            self.cycles += 2 if (addr ^ self.program_counter) & 0xFF00 else 1
+            self.program_counter = addr
+
+    def ins_bcc(self, addr: int) -> None:
+        """
+        BCC - Branch on carry clear
+
+        @Param addr: branch target
+        @Return: None
+        """
+
+        self._branch(not self.P & FLAG_C, addr)
+
+    def ins_bcs(self, addr: int) -> None:
+        """
+        BCS - Branch on carry set
+
+        @Param addr: branch target
+        @Return: None
+        """
+
+        self._branch(self.P & FLAG_C, addr)
+
+    def ins_beq(self, addr: int) -> None:
+        """
+        BEQ - Branch on result zero
+
+        @Param addr: branch target
+        @Return: None
+        """
+
+        self._branch(not self._nz & 0xFF, addr)
+
+    def ins_bne(self, addr: int) -> None:
+        """
+        BNE - Branch on result not zero
+
+        @Param addr: branch target
+        @Return: None
+        """
+
+        self._branch(self._nz & 0xFF, addr)
+
+    def ins_bmi(self, addr: int) -> None:
+        """
+        BMI - Branch on result minus
+
+        @Param addr: branch target
+        @Return: None
+        """
+
+        self._branch(self._nz & 0x180, addr)
+
+    def ins_bpl(self, addr: int) -> None:
+        """
+        BPL - Branch on result plus
+
+        @Param addr: branch target
+        @Return: None
+        """
+
+        self._branch(not self._nz & 0x180, addr)
+
+    def ins_bvc(self, addr: int) -> None:
+        """
+        BVC - Branch on overflow clear
+
+        @Param addr: branch target
+        @Return: None
+        """
+
+        self._branch(not self.P & FLAG_V, addr)
+
+    def ins_bvs(self, addr: int) -> None:
+        """
+        BVS - Branch on overflow set
+
+        @Param addr: branch target
+        @Return: None
+        """
+
+        self._branch(self.P & FLAG_V, addr)
+
+    def pack_status(self) -> int:
+        """
+        Pack the status flags into a single byte, the way PHP and BRK push them
+
+        Bit layout is NV-BDIZC, bit 5 is unused and always reads as 1. This is where the lazy N and Z flags
+        get worked out
+
+        @Return: int
+        """
+
+        nz = self._nz
+        return self.P | FLAG_U | ((nz | (nz >> 1)) & FLAG_N) | (0 if nz & 0xFF else FLAG_Z)
+
+    def unpack_status(self, value: int) -> None:
+        """
+        Unpack a status byte into the flags, the way PLP and RTI pull them
+
+        The break flag and bit 5 don't really exist in the processor, so they are ignored
+
+        @Param value: packed status byte
+        @Return: None
+        """
+
+        self.P = (value & ~(FLAG_B | FLAG_U | FLAG_N | FLAG_Z)) | (self.P & (FLAG_B | FLAG_U))
+        self._nz = _nz_of(value)
+
+    def ins_pha(self) -> None:
+        """
+        PHA - Push accumulator on stack
+
+        @Return: None
+        """
+
+        sp = self.stack_pointer
+        self._write(STACK_PAGE | sp, self.reg_a)
+        self.stack_pointer = (sp - 1) & 0xFF
+
+    def ins_pla(self) -> None:
+        """
+        PLA - Pull accumulator from stack
+
+        Sets negative and zero flags from the value pulled
+
+        @Return: None
+        """
+
+        self.stack_pointer = sp = (self.stack_pointer + 1) & 0xFF
+        self.reg_a = value = self._read(STACK_PAGE | sp)
+        self._nz = value
+
+    def ins_php(self) -> None:
+        """
+        PHP - Push processor status on stack
+
+        The copy pushed always has the break bit set
+
+        @Return: None
+        """
+
+        sp = self.stack_pointer
+        self._write(STACK_PAGE | sp, self.pack_status() | FLAG_B)
+        self.stack_pointer = (sp - 1) & 0xFF
+
+    def ins_plp(self) -> None:
+        """
+        PLP - Pull processor status from stack
+
+        @Return: None
+        """
+
+        self.stack_pointer = sp = (self.stack_pointer + 1) & 0xFF
+        self.unpack_status(self._read(STACK_PAGE | sp))
+        self._check_irq()
+
+    def ins_brk(self) -> None:
+        """
+        BRK - Force break
+
+        Software interrupt. Pushes the program counter (skipping the padding byte after BRK) and the status
+        with the break bit set, sets the interrupt disable flag, then jumps through the IRQ/BRK vector at $FFFE
+
+        @Return: None
+        """
+
+        ret = (self.program_counter + 1) & 0xFFFF
+        sp = self.stack_pointer
+        write = self._write
+        write(STACK_PAGE | sp, ret >> 8)
+        write(STACK_PAGE | ((sp - 1) & 0xFF), ret & 0xFF)
+        write(STACK_PAGE | ((sp - 2) & 0xFF), self.pack_status() | FLAG_B)
+        self.stack_pointer = (sp - 3) & 0xFF
+        self.P |= FLAG_I
+        self.program_counter = self._read_word(IRQ_VECTOR)
+
+    def ins_rti(self) -> None:
+        """
+        RTI - Return from interrupt
+
+        Pulls the status then the program counter, unlike RTS nothing is added to the address pulled
+
+        @Return: None
+        """
+
+        sp = self.stack_pointer
+        read = self._read
+        self.unpack_status(read(STACK_PAGE | ((sp + 1) & 0xFF)))
+        low_byte = read(STACK_PAGE | ((sp + 2) & 0xFF))
+        sp = (sp + 3) & 0xFF
+        self.stack_pointer = sp
+        self.program_counter = (read(STACK_PAGE | sp) << 8) | low_byte
+        self._check_irq()
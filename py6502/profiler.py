@@ -0,0 +1,284 @@
+import time
+
+from py6502.processor import Processor
+from py6502.opcodes import OPCODES
+from py6502.addressing import MODE_NAMES
+
+"""
+Execution profiler for programs running on a Processor
+
+Counts how many times each opcode and each address runs and how many cycles they take, and builds a tree of
+JSR / RTS calls with the cycles spent under each subroutine.
+
+Profiling costs nothing while it is off. Rather than every ins_* method checking a flag, enable() hooks a copy
+of the processor's dispatch table in (see Processor.add_hook) where every slot is a small recording wrapper
+around the real handler, and disable() takes it off again, leaving any other hooks where they are. The run loop
+and the handlers never know the difference.
+Per-mode totals aren't recorded at all, they fall out of the per-opcode ones when asked for.
+
+Only Processor.step() and Processor.run() go through the dispatch table, so code running under a Translator
+doesn't show up. Switching profiling on or off takes effect from the next step() or run() call.
+"""
+
+
+class CallNode:
+    def __init__(self, addr: int) -> None:
+        """
+        One subroutine in the call tree, reached through a particular chain of calls
+
+        @Param addr: address the subroutine starts at, None for the top of the tree
+        @Return: None
+        """
+
+        self.addr = addr
+        self.calls = 0
+        #Cycles spent in this subroutine itself, not counting anything it calls
+        self.cycles = 0
+        self.children = {}
+
+    def total_cycles(self) -> int:
+        """
+        Cycles spent in this subroutine and everything it calls
+
+        @Return: int
+        """
+
+        return self.cycles + sum(child.total_cycles() for child in self.children.values())
+
+    def to_dict(self) -> dict:
+        """
+        Export the tree from here down as plain dicts and lists, children with the most cycles first
+
+        @Return: dict
+        """
+
+        children = sorted(self.children.values(), key=lambda child: child.total_cycles(), reverse=True)
+        return {
+            "addr": self.addr,
+            "calls": self.calls,
+            "self_cycles": self.cycles,
+            "cycles": self.total_cycles(),
+            "children": [child.to_dict() for child in children],
+        }
+
+
+class Profiler:
+    def __init__(self, proc: Processor, timing: bool = False) -> None:
+        """
+        Profiler for one processor, off until enable() is called
+
+        @Param proc: processor to profile
+        @Param timing: also measure host time spent in each opcode's handler, for tuning the emulator itself
+        @Return: None
+        """
+
+        self.proc = proc
+        self.timing = timing
+        self._enabled = False
+        self.clear()
+
+    def clear(self) -> None:
+        """
+        Throw away everything recorded so far
+
+        @Return: None
+        """
+
+        self.opcode_counts = [0] * 256
+        self.opcode_cycles = [0] * 256
+        self.opcode_time = [0] * 256
+        self.pc_counts = [0] * 0x10000
+        self.pc_cycles = [0] * 0x10000
+        self.root = CallNode(None)
+        self._stack = [self.root]
+
+        #The wrappers hold on to the lists they record into, so give them the new ones
+        if self._enabled:
+            self.proc._rebuild_dispatch()
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Whether the instrumented dispatch table is in
+
+        @Return: bool
+        """
+
+        return self._enabled
+
+    def enable(self) -> None:
+        """
+        Hook the instrumented dispatch table in
+
+        @Return: None
+        """
+
+        if not self._enabled:
+            self.proc.add_hook(self._instrument)
+            self._enabled = True
+
+    def disable(self) -> None:
+        """
+        Take the instrumented dispatch table off, whatever else has been hooked in since
+
+        @Return: None
+        """
+
+        if self._enabled:
+            self.proc.remove_hook(self._instrument)
+            self._enabled = False
+
+    def __enter__(self) -> "Profiler":
+        self.enable()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.disable()
+
+    def _instrument(self, table: list) -> list:
+        """
+        Build the instrumented copy of a dispatch table
+
+        Each slot becomes (wrapper, None, cycles). The wrapper fetches the operand itself, calls the real
+        handler and records the instruction, and the run loop still adds the base cycles afterwards as usual
+
+        @Param table: dispatch table to wrap
+        @Return: list
+        """
+
+        return [self._wrap(opcode, *entry) for opcode, entry in enumerate(table)]
+
+    def _wrap(self, opcode: int, handler, mode, cycles: int) -> tuple:
+        """
+        Recording wrapper for one dispatch table slot
+
+        @Param opcode: opcode the slot is for
+        @Param handler: real instruction handler
+        @Param mode: operand fetcher, or None
+        @Param cycles: base cycles
+        @Return: tuple (wrapper, None, cycles)
+        """
+
+        proc = self.proc
+        opcode_counts = self.opcode_counts
+        opcode_cycles = self.opcode_cycles
+        opcode_time = self.opcode_time
+        pc_counts = self.pc_counts
+        pc_cycles = self.pc_cycles
+        stack = self._stack
+        clock = time.perf_counter_ns
+        timing = self.timing
+        mnemonic = OPCODES[opcode][0] if opcode in OPCODES else None
+
+        def record() -> None:
+            pc = (proc.program_counter - 1) & 0xFFFF
+            before = proc.cycles
+            if timing:
+                start = clock()
+            if mode is None:
+                handler()
+            else:
+                handler(mode())
+            if timing:
+                opcode_time[opcode] += clock() - start
+
+            #Base cycles plus whatever the handler added itself, like a taken branch
+            taken = cycles + proc.cycles - before
+            opcode_counts[opcode] += 1
+            opcode_cycles[opcode] += taken
+            pc_counts[pc] += 1
+            pc_cycles[pc] += taken
+            stack[-1].cycles += taken
+
+            if mnemonic == "JSR":
+                node = stack[-1].children.get(proc.program_counter)
+                if node is None:
+                    node = stack[-1].children[proc.program_counter] = CallNode(proc.program_counter)
+                node.calls += 1
+                stack.append(node)
+            elif mnemonic == "RTS" and len(stack) > 1:
+                stack.pop()
+
+        return (record, None, cycles)
+
+    def opcodes(self) -> list:
+        """
+        Flat profile by opcode, most cycles first
+
+        @Return: list of dicts (opcode, mnemonic, mode, count, cycles, time_ns)
+        """
+
+        rows = [
+            {
+                "opcode": opcode,
+                "mnemonic": mnemonic,
+                "mode": MODE_NAMES[mode],
+                "count": self.opcode_counts[opcode],
+                "cycles": self.opcode_cycles[opcode],
+                "time_ns": self.opcode_time[opcode],
+            }
+            for opcode, (mnemonic, mode, cycles) in OPCODES.items()
+            if self.opcode_counts[opcode]
+        ]
+        return sorted(rows, key=lambda row: row["cycles"], reverse=True)
+
+    def modes(self) -> list:
+        """
+        Flat profile by addressing mode, most cycles first
+
+        @Return: list of dicts (mode, count, cycles)
+        """
+
+        totals = {}
+        for row in self.opcodes():
+            total = totals.setdefault(row["mode"], {"mode": row["mode"], "count": 0, "cycles": 0})
+            total["count"] += row["count"]
+            total["cycles"] += row["cycles"]
+        return sorted(totals.values(), key=lambda row: row["cycles"], reverse=True)
+
+    def addresses(self, top: int = None) -> list:
+        """
+        Flat profile by address, most cycles first
+
+        @Param top: only the hottest this many addresses, all of them by default
+        @Return: list of dicts (pc, count, cycles)
+        """
+
+        rows = [
+            {"pc": pc, "count": count, "cycles": self.pc_cycles[pc]}
+            for pc, count in enumerate(self.pc_counts)
+            if count
+        ]
+        rows.sort(key=lambda row: row["cycles"], reverse=True)
+        return rows if top is None else rows[:top]
+
+    def call_tree(self) -> dict:
+        """
+        JSR / RTS call tree, see CallNode.to_dict
+
+        The top of the tree (addr None) is everything that ran outside any subroutine we saw called
+
+        @Return: dict
+        """
+
+        return self.root.to_dict()
+
+    def report(self, top: int = 20) -> str:
+        """
+        Flat profile as a text table, opcodes then addresses
+
+        @Param top: rows to show in each table
+        @Return: str
+        """
+
+        total = sum(self.opcode_cycles) or 1
+        lines = [f"{'opcode':<20}{'count':>12}{'cycles':>14}{'%':>8}"]
+        for row in self.opcodes()[:top]:
+            name = f"${row['opcode']:02X} {row['mnemonic']} {row['mode']}"
+            lines.append(f"{name:<20}{row['count']:>12}{row['cycles']:>14}{100 * row['cycles'] / total:>8.1f}")
+
+        lines.append("")
+        lines.append(f"{'address':<20}{'count':>12}{'cycles':>14}{'%':>8}")
+        for row in self.addresses(top):
+            lines.append(f"${row['pc']:04X}{'':<15}{row['count']:>12}{row['cycles']:>14}{100 * row['cycles'] / total:>8.1f}")
+        return "\n".join(lines)
@@ -0,0 +1,201 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from py6502.memory import Memory
+from py6502.processor import Processor
+
+"""
+Job runner for sharding lots of emulator runs across cores
+
+One Python process only ever gets one core, so big regression runs go through a pool of worker processes instead.
+
+A job is a tuple of (image, entry, cycles) or (image, entry, cycles, load_addr):
+    -image is the program as bytes, loaded at load_addr (0x0000 if not given, so a full 64K image just works)
+    -entry is where the program counter starts
+    -cycles is the cycle budget, the job stops at the first instruction boundary at or past it
+
+Images never travel to the workers as lists. By default every distinct image is written once into a block of
+shared memory that all the workers map, so a job on the wire is just a handful of ints no matter how big its
+image is, and a thousand jobs that run the same ROM from different entry points share one copy of it. With
+shared=False each job carries its image as plain bytes instead.
+
+Each job comes back as a Result with the final registers, packed status, cycles and copies of the memory
+ranges asked for. A job that crashes (eg. on an illegal opcode) comes back with its error instead of taking the
+whole run down with it.
+"""
+
+#Shared image block, mapped once per worker process by _init_worker
+_images = None
+_images_block = None
+
+
+class Result:
+    def __init__(self, reg_a: int, reg_x: int, reg_y: int, stack_pointer: int, program_counter: int,
+                 status: int, cycles: int, memory: dict, error: str = None) -> None:
+        """
+        Final state of one job
+
+        @Param reg_a: accumulator
+        @Param reg_x: X register
+        @Param reg_y: Y register
+        @Param stack_pointer: stack pointer
+        @Param program_counter: program counter
+        @Param status: status flags packed NV-BDIZC
+        @Param cycles: cycles used
+        @Param memory: dict of start address -> bytes, one entry per range asked for
+        @Param error: what went wrong, or None if the job ran out its budget normally
+        @Return: None
+        """
+
+        self.reg_a = reg_a
+        self.reg_x = reg_x
+        self.reg_y = reg_y
+        self.stack_pointer = stack_pointer
+        self.program_counter = program_counter
+        self.status = status
+        self.cycles = cycles
+        self.memory = memory
+        self.error = error
+
+    def __repr__(self) -> str:
+        return (
+            f"Result(A=${self.reg_a:02X} X=${self.reg_x:02X} Y=${self.reg_y:02X} SP=${self.stack_pointer:02X} "
+            f"PC=${self.program_counter:04X} P=${self.status:02X} cycles={self.cycles} error={self.error!r})"
+        )
+
+
+def run_job(image: bytes, entry: int, cycles: int, load_addr: int = 0x0000, ranges: tuple = ()) -> Result:
+    """
+    Run one job in this process
+
+    @Param image: program bytes
+    @Param entry: starting program counter
+    @Param cycles: cycle budget
+    @Param load_addr: where to load the image
+    @Param ranges: (start, end) memory ranges to copy into the result, end not included
+    @Return: Result
+    """
+
+    mem = Memory()
+    mem.load(load_addr, image)
+    proc = Processor(mem)
+    proc.reset()
+    proc.program_counter = entry
+
+    error = None
+    try:
+        proc.run(max_cycles=cycles)
+    except ValueError as e:
+        error = str(e)
+
+    return Result(
+        proc.reg_a, proc.reg_x, proc.reg_y, proc.stack_pointer, proc.program_counter, proc.pack_status(),
+        proc.cycles, {start: mem.dump(start, end) for start, end in ranges}, error,
+    )
+
+
+def _init_worker(name: str) -> None:
+    """
+    Map the shared image block, once per worker
+
+    @Param name: name of the shared memory block
+    @Return: None
+    """
+
+    global _images, _images_block
+    _images_block = shared_memory.SharedMemory(name=name)
+    _images = _images_block.buf
+
+
+def _run_shared(job: tuple) -> Result:
+    """
+    Worker side of a job whose image is in the shared block
+
+    @Param job: (offset, length, load_addr, entry, cycles, ranges)
+    @Return: Result
+    """
+
+    offset, length, load_addr, entry, cycles, ranges = job
+    return run_job(_images[offset:offset + length], entry, cycles, load_addr, ranges)
+
+
+def _run_inline(job: tuple) -> Result:
+    """
+    Worker side of a job that carries its own image
+
+    @Param job: (image, load_addr, entry, cycles, ranges)
+    @Return: Result
+    """
+
+    image, load_addr, entry, cycles, ranges = job
+    return run_job(image, entry, cycles, load_addr, ranges)
+
+
+def run_jobs(jobs: list, ranges: tuple = (), workers: int = None, chunksize: int = 64, shared: bool = True) -> list:
+    """
+    Run a list of jobs over a pool of worker processes
+
+    Results come back in the same order as the jobs
+
+    @Param jobs: list of (image, entry, cycles) or (image, entry, cycles, load_addr) tuples
+    @Param ranges: (start, end) memory ranges to copy into every result, end not included
+    @Param workers: number of worker processes, defaults to one per core
+    @Param chunksize: jobs handed to a worker at a time, bigger is less overhead for lots of short jobs
+    @Param shared: ship images through shared memory (True) or as bytes with each job (False)
+    @Return: list of Result
+    """
+
+    ranges = tuple(ranges)
+    workers = workers or os.cpu_count() or 1
+
+    if not shared:
+        tasks = [
+            (bytes(image), load_addr, entry, cycles, ranges)
+            for image, entry, cycles, load_addr in _normalize(jobs)
+        ]
+        with ProcessPoolExecutor(workers) as pool:
+            return list(pool.map(_run_inline, tasks, chunksize=chunksize))
+
+    #Lay every distinct image out once, back to back
+    offsets = {}
+    layout = []
+    size = 0
+    tasks = []
+    for image, entry, cycles, load_addr in _normalize(jobs):
+        image = bytes(image)
+        offset = offsets.get(image)
+        if offset is None:
+            offset = offsets[image] = size
+            layout.append(image)
+            size += len(image)
+        tasks.append((offset, len(image), load_addr, entry, cycles, ranges))
+
+    block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    try:
+        pos = 0
+        for image in layout:
+            block.buf[pos:pos + len(image)] = image
+            pos += len(image)
+
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(block.name,)) as pool:
+            return list(pool.map(_run_shared, tasks, chunksize=chunksize))
+    finally:
+        block.close()
+        block.unlink()
+
+
+def _normalize(jobs: list):
+    """
+    Fill in the default load address for jobs that don't give one
+
+    @Param jobs: list of job tuples
+    @Return: generator of (image, entry, cycles, load_addr)
+    """
+
+    for job in jobs:
+        if len(job) == 3:
+            image, entry, cycles = job
+            yield image, entry, cycles, 0x0000
+        else:
+            yield job
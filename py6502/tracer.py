@@ -0,0 +1,253 @@
+import struct
+from collections import namedtuple
+
+from py6502.processor import Processor
+
+"""
+Instruction trace recorder
+
+Records the state of the processor before every instruction it runs as a fixed-width 16-byte record:
+
+    -program counter (2 bytes), opcode, A, X, Y, low byte of the stack pointer, P (1 byte each)
+    -cycle count before the instruction (8 bytes)
+
+Records are packed straight into a preallocated bytearray with Struct.pack_into, so recording an instruction
+is one call and never allocates. Like the profiler, tracing is switched on by hooking a wrapped copy of the
+processor's dispatch table in (see Processor.add_hook), so a processor that isn't being traced pays nothing.
+
+With a file the buffer is written out in one go every time it fills up and then reused, so memory stays at
+capacity * 16 bytes however long the trace gets. Without a file the buffer is a ring that keeps the last
+capacity instructions, which is usually what you want when chasing down a crash.
+
+Trace files are an 8-byte header (TRACE_MAGIC, format version, record size) followed by the records back to
+back, little-endian. read_trace() streams them back as TraceRecords, and read_trace_array() loads a whole file
+as a NumPy structured array (NumPy is only needed for that one function).
+
+A Tracer, a Profiler and a Debugger can all be on one processor at once, and switched off again in any order.
+"""
+
+TRACE_MAGIC = b"6502TR"
+TRACE_VERSION = 1
+
+#pc, opcode, a, x, y, sp, p, cycles
+_RECORD = struct.Struct("<HBBBBBBQ")
+_HEADER = struct.Struct("<6sBB")
+
+TraceRecord = namedtuple("TraceRecord", ["pc", "opcode", "a", "x", "y", "sp", "p", "cycles"])
+
+#NumPy dtype matching _RECORD, for read_trace_array
+TRACE_DTYPE = [
+    ("pc", "<u2"), ("opcode", "u1"), ("a", "u1"), ("x", "u1"), ("y", "u1"), ("sp", "u1"), ("p", "u1"),
+    ("cycles", "<u8"),
+]
+
+
+class Tracer:
+    def __init__(self, proc: Processor, capacity: int = 0x10000, path: str = None) -> None:
+        """
+        Trace recorder for one processor, off until start() is called
+
+        @Param proc: processor to trace
+        @Param capacity: records the buffer holds
+        @Param path: trace file to write, or None to keep the last capacity records in memory
+        @Return: None
+        """
+
+        if capacity <= 0:
+            raise ValueError("Trace buffer needs room for at least one record")
+
+        self.proc = proc
+        self.capacity = capacity
+        self._buffer = bytearray(capacity * _RECORD.size)
+        #Byte offset of the next record in the buffer
+        self._offset = 0
+        #Set once the ring has gone all the way round (in memory traces only)
+        self._wrapped = False
+        self._started = False
+        self._file = None
+        if path is not None:
+            self._file = open(path, "wb")
+            self._file.write(_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, _RECORD.size))
+
+    def start(self) -> None:
+        """
+        Hook the recording dispatch table in
+
+        @Return: None
+        """
+
+        if not self._started:
+            self.proc.add_hook(self._instrument)
+            self._started = True
+
+    def stop(self) -> None:
+        """
+        Take the recording dispatch table off, whatever else has been hooked in since
+
+        @Return: None
+        """
+
+        if self._started:
+            self.proc.remove_hook(self._instrument)
+            self._started = False
+
+    def __enter__(self) -> "Tracer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+        self.flush()
+
+    def _instrument(self, table: list) -> list:
+        """
+        Build the recording copy of a dispatch table
+
+        @Param table: dispatch table to wrap
+        @Return: list
+        """
+
+        return [self._wrap(opcode, *entry) for opcode, entry in enumerate(table)]
+
+    def _wrap(self, opcode: int, handler, mode, cycles: int) -> tuple:
+        """
+        Recording wrapper for one dispatch table slot
+
+        The opcode comes from the slot rather than from memory, so the trace never reads through the Bus
+
+        @Param opcode: opcode the slot is for
+        @Param handler: instruction handler
+        @Param mode: operand fetcher, or None
+        @Param cycles: base cycles
+        @Return: tuple (wrapper, None, cycles)
+        """
+
+        proc = self.proc
+        pack = _RECORD.pack_into
+        size = _RECORD.size
+        end = len(self._buffer)
+
+        def record() -> None:
+            pc = (proc.program_counter - 1) & 0xFFFF
+            offset = self._offset
+            pack(
+                self._buffer, offset, pc, opcode, proc.reg_a, proc.reg_x, proc.reg_y,
+                proc.stack_pointer, proc.pack_status(), proc.cycles,
+            )
+            offset += size
+            if offset == end:
+                offset = self._full()
+            self._offset = offset
+
+            if mode is None:
+                handler()
+            else:
+                handler(mode())
+
+        return (record, None, cycles)
+
+    def _full(self) -> int:
+        """
+        Buffer has filled up: write it out to the file, or go round the ring again
+
+        @Return: int (offset of the next record)
+        """
+
+        if self._file is not None:
+            self._file.write(self._buffer)
+        else:
+            self._wrapped = True
+        return 0
+
+    def flush(self) -> None:
+        """
+        Write the records waiting in the buffer out to the file
+
+        @Return: None
+        """
+
+        if self._file is not None:
+            self._file.write(memoryview(self._buffer)[:self._offset])
+            self._file.flush()
+            self._offset = 0
+
+    def close(self) -> None:
+        """
+        Stop tracing and finish the file off
+
+        @Return: None
+        """
+
+        self.stop()
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+    def records(self) -> list:
+        """
+        Records still in the buffer, oldest first
+
+        For an in-memory trace that is the last capacity instructions, for a file trace it is whatever hasn't
+        been written out yet
+
+        @Return: list of TraceRecord
+        """
+
+        data = memoryview(self._buffer)
+        if self._wrapped:
+            data = bytes(data[self._offset:]) + bytes(data[:self._offset])
+        else:
+            data = data[:self._offset]
+        return [TraceRecord._make(fields) for fields in _RECORD.iter_unpack(data)]
+
+
+def read_trace(path: str, chunk: int = 0x10000):
+    """
+    Stream the records in a trace file back, without loading the whole file
+
+    @Param path: trace file
+    @Param chunk: records to read from the file at a time
+    @Return: generator of TraceRecord
+    """
+
+    with open(path, "rb") as f:
+        _check_header(f.read(_HEADER.size))
+        while True:
+            data = f.read(chunk * _RECORD.size)
+            if not data:
+                return
+            for fields in _RECORD.iter_unpack(data):
+                yield TraceRecord._make(fields)
+
+
+def read_trace_array(path: str):
+    """
+    Load a whole trace file as a NumPy structured array with fields named as in TraceRecord
+
+    @Param path: trace file
+    @Return: numpy.ndarray
+    """
+
+    import numpy
+
+    with open(path, "rb") as f:
+        _check_header(f.read(_HEADER.size))
+    return numpy.fromfile(path, dtype=numpy.dtype(TRACE_DTYPE), offset=_HEADER.size)
+
+
+def _check_header(header: bytes) -> None:
+    """
+    Make sure a trace file is one we can read
+
+    @Param header: first bytes of the file
+    @Return: None
+    """
+
+    if len(header) != _HEADER.size:
+        raise ValueError("Not a trace file")
+    magic, version, size = _HEADER.unpack(header)
+    if magic != TRACE_MAGIC or size != _RECORD.size:
+        raise ValueError("Not a trace file")
+    if version != TRACE_VERSION:
+        raise ValueError(f"Unsupported trace format version {version}")
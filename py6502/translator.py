@@ -0,0 +1,427 @@
+from py6502.memory import Bus
+from py6502.processor import Processor, NZ, ALU_TABLES
+from py6502.opcodes import OPCODES, PAGE_PENALTY
+from py6502.addressing import (
+    IMPLIED, ACCUMULATOR, IMMEDIATE, ZERO_PAGE, ZERO_PAGE_X, ZERO_PAGE_Y, ABSOLUTE, ABSOLUTE_X, ABSOLUTE_Y,
+    INDIRECT, INDIRECT_X, INDIRECT_Y, RELATIVE, OPERAND_BYTES,
+)
+
+"""
+Dynamic translation of 6502 code into Python
+
+Processor decodes and dispatches every instruction it runs, every time it runs it. The translator instead takes
+the basic block starting at the program counter (straight line code up to and including the next jump, branch,
+call or return), writes it out as the source of one Python function and compile()s it. Operands are baked into
+the source as constants, registers live in locals for the whole block and the flags are kept packed in one int,
+so running a block costs a single call no matter how many instructions are in it.
+
+Blocks are cached by start address. Code can be rewritten under the cache though, so every page with translated
+code on it gets a write watch on the Bus (see Bus.watch_writes). A write into the bytes of a cached block throws
+that block away, and it gets translated again the next time it runs. Pages without code never pay for any of
+this. A block that writes over code (including itself) stops right after the write and lets the next block pick
+up from there, so self-modifying code still sees its own changes.
+
+This needs the processor to be on a Bus, since plain Memory has no way to watch writes. Reads and writes from
+translated code go through the Bus fast path, so devices and ROM behave the same as under Processor.
+
+Timing is kept the same as under Processor too. A block only runs if it can't get to the next deadline (see
+Processor.schedule) even taking every page crossing and branch penalty, otherwise Processor.step() runs the
+next instruction instead, so timed events fire on the same instruction boundary. Inside a block the cycle count
+is kept in a local and written back to the processor before every memory access and every instruction left to
+the Processor handler, so a device, a watch or CLI / PLP letting a held IRQ in schedules at the right cycle, and
+if that moves the deadline the block stops right after the instruction that did it.
+"""
+
+#Instructions that end a block, the program counter after them isn't known until they run
+_TERMINATORS = {"JMP", "JSR", "RTS", "RTI", "BRK", "BCC", "BCS", "BEQ", "BNE", "BMI", "BPL", "BVC", "BVS"}
+
+#Instructions left to the Processor handler, with the state synced out to the processor and back around them.
+#CLI, PLP and RTI can let a held IRQ in, which the handlers take care of
+_FALLBACK = {"BRK", "RTI", "CLI", "PLP"}
+
+#Instructions that write to memory, a block checks after each of these that it hasn't just written over code
+_WRITES = {"STA", "STX", "STY", "INC", "DEC", "ASL", "LSR", "ROL", "ROR", "PHA", "PHP"}
+
+#Implied mode instructions that still touch memory, through the stack
+_STACK = {"PHA", "PHP", "PLA", "RTS"}
+
+#Source templates
+#
+#Registers are in locals a, x, y and s, and p is the status byte packed NV-BDIZC. c is the cycle count the block
+#started at plus any page crossing penalties so far, and deadline the processor's deadline when it started. {addr} is the effective address,
+#a constant where the instruction bytes fix it and otherwise the addr local the addressing mode sets up first.
+#{value} is the operand, either a constant for immediate mode or a read of {addr}. s is the 8-bit stack pointer,
+#so stack accesses are to 0x0100 | s and it wraps inside page 1
+
+_OPERATIONS = {
+    "LDA": "a = {value}\np = (p & 0x7D) | NZ[a]",
+    "LDX": "x = {value}\np = (p & 0x7D) | NZ[x]",
+    "LDY": "y = {value}\np = (p & 0x7D) | NZ[y]",
+    "STA": "write({addr}, a)",
+    "STX": "write({addr}, x)",
+    "STY": "write({addr}, y)",
+    "TAX": "x = a\np = (p & 0x7D) | NZ[x]",
+    "TAY": "y = a\np = (p & 0x7D) | NZ[y]",
+    "TXA": "a = x\np = (p & 0x7D) | NZ[a]",
+    "TYA": "a = y\np = (p & 0x7D) | NZ[a]",
+    "INX": "x = (x + 1) & 0xFF\np = (p & 0x7D) | NZ[x]",
+    "INY": "y = (y + 1) & 0xFF\np = (p & 0x7D) | NZ[y]",
+    "DEX": "x = (x - 1) & 0xFF\np = (p & 0x7D) | NZ[x]",
+    "DEY": "y = (y - 1) & 0xFF\np = (p & 0x7D) | NZ[y]",
+    "INC": "m = (read({addr}) + 1) & 0xFF\nwrite({addr}, m)\np = (p & 0x7D) | NZ[m]",
+    "DEC": "m = (read({addr}) - 1) & 0xFF\nwrite({addr}, m)\np = (p & 0x7D) | NZ[m]",
+    "AND": "a &= {value}\np = (p & 0x7D) | NZ[a]",
+    "EOR": "a ^= {value}\np = (p & 0x7D) | NZ[a]",
+    "ORA": "a |= {value}\np = (p & 0x7D) | NZ[a]",
+    "BIT": "m = {value}\np = (p & 0x3D) | (m & 0xC0) | (0x00 if a & m else 0x02)",
+    "ADC": "m = ALU[(p & 0x08) >> 3][((p & 0x01) << 16) | (a << 8) | {value}]\na = m & 0xFF\np = (p & 0x3C) | ((m >> 8) & 0xC3)",
+    "SBC": "m = ALU[2 | ((p & 0x08) >> 3)][((p & 0x01) << 16) | (a << 8) | {value}]\na = m & 0xFF\np = (p & 0x3C) | ((m >> 8) & 0xC3)",
+    "CMP": "m = a - {value}\np = (p & 0x7C) | NZ[m & 0xFF] | (m >= 0)",
+    "CPX": "m = x - {value}\np = (p & 0x7C) | NZ[m & 0xFF] | (m >= 0)",
+    "CPY": "m = y - {value}\np = (p & 0x7C) | NZ[m & 0xFF] | (m >= 0)",
+    "CLC": "p &= 0xFE",
+    "CLD": "p &= 0xF7",
+    "CLV": "p &= 0xBF",
+    "SEC": "p |= 0x01",
+    "SED": "p |= 0x08",
+    "SEI": "p |= 0x04",
+    "NOP": "pass",
+    "PHA": "write(0x0100 | s, a)\ns = (s - 1) & 0xFF",
+    "PHP": "write(0x0100 | s, p | 0x10)\ns = (s - 1) & 0xFF",
+    "PLA": "s = (s + 1) & 0xFF\na = read(0x0100 | s)\np = (p & 0x7D) | NZ[a]",
+    "TSX": "x = s\np = (p & 0x7D) | NZ[x]",
+    "TXS": "s = x",
+}
+
+#Shifts work on m, which is loaded from and stored back to either the accumulator or memory
+_SHIFTS = {
+    "ASL": "p = (p & 0x7C) | (m >> 7)\nm = (m << 1) & 0xFF\np |= NZ[m]",
+    "LSR": "p = (p & 0x7C) | (m & 0x01)\nm >>= 1\np |= NZ[m]",
+    "ROL": "m = (m << 1) | (p & 0x01)\np = (p & 0x7C) | (m >> 8)\nm &= 0xFF\np |= NZ[m]",
+    "ROR": "m |= (p & 0x01) << 8\np = (p & 0x7C) | (m & 0x01)\nm >>= 1\np |= NZ[m]",
+}
+
+_BRANCHES = {
+    "BCC": "not p & 0x01",
+    "BCS": "p & 0x01",
+    "BNE": "not p & 0x02",
+    "BEQ": "p & 0x02",
+    "BVC": "not p & 0x40",
+    "BVS": "p & 0x40",
+    "BPL": "not p & 0x80",
+    "BMI": "p & 0x80",
+}
+
+_ENTER = "a = proc.reg_a\nx = proc.reg_x\ny = proc.reg_y\ns = proc.stack_pointer\np = proc.pack_status()"
+
+_START = f"{_ENTER}\nc = proc.cycles\ndeadline = proc._deadline"
+
+_SYNC = "proc.reg_a = a\nproc.reg_x = x\nproc.reg_y = y\nproc.stack_pointer = s\nproc.unpack_status(p)"
+
+_BLOCK = """
+def make(proc, read, write, stale, NZ, ALU):
+    def block():
+{body}
+
+    return block
+"""
+
+
+def _indent(source: str, depth: int) -> str:
+    """
+    Indent every line of a template
+
+    @Param source: template source
+    @Param depth: indent level, four spaces each
+    @Return: str
+    """
+
+    pad = "    " * depth
+    return "\n".join(pad + line for line in source.split("\n"))
+
+
+def _leave(pc: str, cycles: int, count: int) -> str:
+    """
+    Source that writes the state back to the processor and returns from the block
+
+    @Param pc: expression for the next program counter
+    @Param cycles: cycles the block used
+    @Param count: instructions the block ran
+    @Return: str
+    """
+
+    return f"{_SYNC}\nproc.program_counter = {pc}\nproc.cycles = c + {cycles}\nreturn {count}"
+
+
+def _address(mode: int, arg: int, npc: int) -> str:
+    """
+    Source that leaves the effective address of an instruction in addr
+
+    @Param mode: addressing mode
+    @Param arg: operand from the instruction bytes
+    @Param npc: address of the next instruction
+    @Return: str, or None for modes without an address
+    """
+
+    if mode in (ZERO_PAGE, ABSOLUTE):
+        return f"addr = 0x{arg:04X}"
+    if mode == ZERO_PAGE_X:
+        return f"addr = (0x{arg:02X} + x) & 0xFF"
+    if mode == ZERO_PAGE_Y:
+        return f"addr = (0x{arg:02X} + y) & 0xFF"
+    if mode == ABSOLUTE_X:
+        return f"addr = (0x{arg:04X} + x) & 0xFFFF"
+    if mode == ABSOLUTE_Y:
+        return f"addr = (0x{arg:04X} + y) & 0xFFFF"
+    if mode == INDIRECT:
+        #Same page wrap bug as the real thing, see Processor._ea_indirect
+        high = (arg & 0xFF00) | ((arg + 1) & 0xFF)
+        return f"addr = read(0x{arg:04X}) | (read(0x{high:04X}) << 8)"
+    if mode == INDIRECT_X:
+        return f"m = (0x{arg:02X} + x) & 0xFF\naddr = read(m) | (read((m + 1) & 0xFF) << 8)"
+    if mode == INDIRECT_Y:
+        return f"m = read(0x{arg:02X}) | (read(0x{(arg + 1) & 0xFF:02X}) << 8)\naddr = (m + y) & 0xFFFF"
+    if mode == RELATIVE:
+        offset = arg - 0x100 if arg & 0x80 else arg
+        return f"addr = 0x{(npc + offset) & 0xFFFF:04X}"
+    return None
+
+
+class Translator:
+    def __init__(self, proc: Processor, max_block: int = 64) -> None:
+        """
+        Translates and runs blocks of code for one processor
+
+        @Param proc: processor to run, its memory has to be a Bus
+        @Param max_block: most instructions to put in one block
+        @Return: None
+        """
+
+        if not isinstance(proc.memory, Bus):
+            raise ValueError("Translator needs the processor's memory to be a Bus")
+
+        self.proc = proc
+        self.max_block = max_block
+        self._bus = proc.memory
+        self._read = self._bus.read_byte_fast
+
+        #start address -> (block function, length in bytes, most cycles it can take)
+        self._blocks = {}
+        #page -> start addresses of the cached blocks with code on it
+        self._pages = {}
+        #Set when a write lands on translated code, checked by blocks after every write
+        self._stale = [False]
+
+    def run(self, instructions: int) -> int:
+        """
+        Run whole blocks until at least this many instructions have gone by
+
+        Runs over by at most one block. Illegal opcodes are handed to Processor.step, which raises. So is
+        anything close enough to the deadline that a block could run past it, so scheduled events (see
+        Processor.schedule) fire at the same instruction boundary they would under Processor.run
+
+        @Param instructions: instructions to run
+        @Return: int, cycles taken
+        """
+
+        proc = self.proc
+        blocks = self._blocks
+        stale = self._stale
+        start = proc.cycles
+        done = 0
+        while done < instructions:
+            if proc.cycles >= proc._deadline:
+                proc._fire_events()
+            block = blocks.get(proc.program_counter)
+            if block is None:
+                block = self._translate(proc.program_counter)
+                if block is None:
+                    proc.step()
+                    done += 1
+                    continue
+            if proc.cycles + block[2] > proc._deadline:
+                proc.step()
+                done += 1
+                continue
+            stale[0] = False
+            done += block[0]()
+        return proc.cycles - start
+
+    def is_cached(self, addr: int) -> bool:
+        """
+        Check if there is a translated block starting at an address
+
+        @Param addr: start address
+        @Return: bool
+        """
+
+        return addr in self._blocks
+
+    def invalidate(self, start: int = 0x0000, end: int = 0x10000) -> None:
+        """
+        Throw away every cached block with code in a region, the whole cache by default
+
+        @Param start: first address
+        @Param end: one past the last address
+        @Return: None
+        """
+
+        for addr, (block, length, worst) in list(self._blocks.items()):
+            if addr < end and addr + length > start:
+                self._drop(addr)
+
+    def _translate(self, start: int) -> tuple:
+        """
+        Translate and cache the block starting at an address
+
+        @Param start: start address
+        @Return: tuple (block function, length in bytes, most cycles it can take), or None if the first opcode
+                 is illegal
+        """
+
+        #Code is read straight out of the backing memory like the disassembler does, so translating a block never
+        #sets off a device or a watch the 6502 itself wouldn't have
+        code = self._bus.view()
+        lines = []
+        pc = start
+        cycles = 0
+        count = 0
+        npc = start
+        #Most cycles the page crossing and branch penalties can add
+        penalties = 0
+
+        while True:
+            opcode = code[pc]
+            entry = OPCODES.get(opcode)
+            if entry is None or count == self.max_block:
+                #Ran into an illegal opcode or the size limit, the next block carries on from here
+                if count == 0:
+                    return None
+                lines.append(_leave(f"0x{pc:04X}", cycles, count))
+                break
+            mnemonic, mode, base = entry
+            size = OPERAND_BYTES[mode]
+            if size == 1:
+                arg = code[(pc + 1) & 0xFFFF]
+            elif size == 2:
+                arg = code[(pc + 1) & 0xFFFF] | (code[(pc + 2) & 0xFFFF] << 8)
+            else:
+                arg = 0
+            npc = (pc + 1 + size) & 0xFFFF
+            before = cycles
+            cycles += base
+            count += 1
+
+            lines.append(f"#${pc:04X} {mnemonic}")
+            #The processor's cycle count is the one at the start of the instruction while it runs, same as
+            #under Processor.step
+            touches = mnemonic in _STACK or (
+                mode not in (IMPLIED, ACCUMULATOR, IMMEDIATE, RELATIVE)
+                and not (mnemonic == "JMP" and mode == ABSOLUTE)
+            )
+            if touches or mnemonic in _FALLBACK:
+                lines.append(f"proc.cycles = c + {before}")
+            address = _address(mode, arg, npc)
+            if mode in (ZERO_PAGE, ABSOLUTE, RELATIVE):
+                target = address[len("addr = "):]
+            else:
+                target = "addr"
+                if address is not None:
+                    lines.append(address)
+                if PAGE_PENALTY[opcode]:
+                    #Cycles that depend on the registers, see PAGE_PENALTY
+                    base_addr = "m" if mode == INDIRECT_Y else f"0x{arg:04X}"
+                    lines.append(f"if (addr ^ {base_addr}) & 0xFF00:\n    c += 1\n    proc.cycles += 1")
+                    penalties += 1
+
+            if mnemonic in _FALLBACK:
+                call = f"proc.program_counter = 0x{npc:04X}\nproc.ins_{mnemonic.lower()}()"
+                if mnemonic in _TERMINATORS:
+                    lines.append(f"{_SYNC}\n{call}\nproc.cycles += {base}\nreturn {count}")
+                    break
+                lines.append(f"{_SYNC}\n{call}\n{_ENTER}")
+                lines.append(f"if proc._deadline != deadline:\n{_indent(_leave(f'0x{npc:04X}', cycles, count), 1)}")
+            elif mnemonic in _BRANCHES:
+                taken = cycles + (2 if (int(target, 16) ^ npc) & 0xFF00 else 1)
+                penalties += taken - cycles
+                lines.append(f"if {_BRANCHES[mnemonic]}:\n{_indent(_leave(target, taken, count), 1)}")
+                lines.append(_leave(f"0x{npc:04X}", cycles, count))
+                break
+            elif mnemonic == "JMP":
+                lines.append(_leave(target, cycles, count))
+                break
+            elif mnemonic == "JSR":
+                ret = (npc - 1) & 0xFFFF
+                lines.append(
+                    f"write(0x0100 | s, 0x{ret >> 8:02X})\nwrite(0x0100 | ((s - 1) & 0xFF), 0x{ret & 0xFF:02X})\n"
+                    "s = (s - 2) & 0xFF"
+                )
+                lines.append(_leave(target, cycles, count))
+                break
+            elif mnemonic == "RTS":
+                lines.append(
+                    "m = read(0x0100 | ((s + 1) & 0xFF))\ns = (s + 2) & 0xFF\nm = (((read(0x0100 | s) << 8) | m) + 1) & 0xFFFF"
+                )
+                lines.append(_leave("m", cycles, count))
+                break
+            elif mnemonic in _SHIFTS:
+                if mode == ACCUMULATOR:
+                    lines.append(f"m = a\n{_SHIFTS[mnemonic]}\na = m")
+                else:
+                    lines.append(f"m = read({target})\n{_SHIFTS[mnemonic]}\nwrite({target}, m)")
+            else:
+                value = f"0x{arg:02X}" if mode == IMMEDIATE else f"read({target})"
+                lines.append(_OPERATIONS[mnemonic].format(value=value, addr=target))
+
+            if touches:
+                check = "proc._deadline != deadline"
+                if mnemonic in _WRITES:
+                    check = "stale[0] or " + check
+                lines.append(f"if {check}:\n{_indent(_leave(f'0x{npc:04X}', cycles, count), 1)}")
+
+            pc = npc
+
+        body = _indent(_START + "\n" + "\n".join(lines), 2)
+        namespace = {}
+        exec(compile(_BLOCK.format(body=body), f"<block ${start:04X}>", "exec"), namespace)
+        block = namespace["make"](self.proc, self._read, self._bus.write_fast, self._stale, NZ, ALU_TABLES)
+
+        length = (npc - start) & 0xFFFF
+        self._blocks[start] = entry = (block, length, cycles + penalties)
+        for page in {((start + i) & 0xFFFF) >> 8 for i in range(length)}:
+            blocks = self._pages.get(page)
+            if blocks is None:
+                blocks = self._pages[page] = set()
+                self._bus.watch_writes(page << 8, (page + 1) << 8, self._code_written)
+            blocks.add(start)
+        return entry
+
+    def _drop(self, start: int) -> None:
+        """
+        Throw away one cached block, and the write watch on any page that has no code left on it
+
+        @Param start: start address of the block
+        @Return: None
+        """
+
+        block, length, worst = self._blocks.pop(start)
+        for page in {((start + i) & 0xFFFF) >> 8 for i in range(length)}:
+            blocks = self._pages[page]
+            blocks.discard(start)
+            if not blocks:
+                del self._pages[page]
+                self._bus.unwatch_writes(page << 8, (page + 1) << 8, self._code_written)
+
+    def _code_written(self, addr: int, value: int) -> None:
+        """
+        Write watch on pages with code, drops any block the write landed inside
+
+        @Param addr: address written
+        @Param value: byte written
+        @Return: None
+        """
+
+        for start in list(self._pages.get(addr >> 8, ())):
+            if (addr - start) & 0xFFFF < self._blocks[start][1]:
+                self._drop(start)
+                self._stale[0] = True
@@ -4,4 +4,7 @@ setup (
     name = 'py6502',
     version = '0.1',
     packages = find_packages(),
+    entry_points = {
+        'console_scripts': ['py6502 = py6502.cli:main'],
+    },
     )
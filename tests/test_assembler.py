@@ -0,0 +1,122 @@
+import os
+import shutil
+import tempfile
+import unittest
+from py6502 import assembler
+from py6502 import memory
+from py6502 import processor
+
+#Copies the table to $0400 until it hits the zero, then counts in Y how many bytes it copied
+PROGRAM = """
+SCREEN = $0400
+start:  LDX #$00
+loop:   LDA table,X     ;forward reference, so absolute
+        BEQ done
+        STA SCREEN,X
+        INX
+        BNE loop
+done:   TXA
+        TAY
+        BRK
+table:  .byte "hi", 3, 0
+"""
+
+class AssemblerTest(unittest.TestCase):
+    def setUp(self):
+        assembler._memo.clear()
+
+    def test_assemble(self):
+        """
+        Test addressing modes, symbols and fixups
+
+        @Return: None
+        """
+
+        print(f"\nTest case 1-1: Every addressing mode")
+        result = assembler.assemble(
+            "NOP\nLSR A\nASL\nLDA #$10\nLDA $10\nLDA $10,X\nLDX $10,Y\nLDA $1234\nLDA $1234,X\n"
+            "LDA $1234,Y\nJMP ($1234)\nLDA ($10,X)\nLDA ($10),Y\nBNE *"
+        )
+        self.assertEqual(result.image(), bytes([
+            0xEA, 0x4A, 0x0A, 0xA9, 0x10, 0xA5, 0x10, 0xB5, 0x10, 0xB6, 0x10, 0xAD, 0x34, 0x12, 0xBD, 0x34, 0x12,
+            0xB9, 0x34, 0x12, 0x6C, 0x34, 0x12, 0xA1, 0x10, 0xB1, 0x10, 0xD0, 0xFE,
+        ]))
+
+        print(f"Test case 1-2: Forward references are patched")
+        result = assembler.assemble(PROGRAM, 0x0600)
+        self.assertEqual(result.symbols["table"], 0x0610)
+        self.assertEqual(result.image()[2:5], bytes([0xBD, 0x10, 0x06]))
+        self.assertEqual(result.image()[5:7], bytes([0xF0, 0x06]))
+
+        print(f"Test case 1-3: Segments, words and byte selectors")
+        result = assembler.assemble("JMP go\n.org $0700\ngo: .word go, go + 2\n.byte <go, >go", 0x0600)
+        self.assertEqual(result.segments, [(0x0600, bytes([0x4C, 0x00, 0x07])), (0x0700, bytes([0, 7, 2, 7, 0, 7]))])
+        self.assertEqual(result.start, 0x0600)
+        self.assertEqual(result.end, 0x0706)
+
+        print(f"Test case 1-5: Semicolons inside strings and characters aren't comments")
+        result = assembler.assemble('.byte ";", \';\' ;comment\n.byte "a;b" ;"c"')
+        self.assertEqual(result.image(), b";;a;b")
+
+        print(f"Test case 1-6: * is the address of the line all the way along it")
+        result = assembler.assemble(".byte <*, <*, <*\n.word *, *", 0x0610)
+        self.assertEqual(result.image(), bytes([0x10, 0x10, 0x10, 0x13, 0x06, 0x13, 0x06]))
+
+        print(f"Test case 1-4: Errors say which line")
+        with self.assertRaises(assembler.AssemblyError) as error:
+            assembler.assemble("NOP\nLDA nowhere")
+        self.assertEqual(error.exception.line, 2)
+        with self.assertRaises(assembler.AssemblyError):
+            assembler.assemble("STA #1")
+        with self.assertRaises(assembler.AssemblyError):
+            assembler.assemble("here: BNE far\n.org $0700\nfar: NOP")
+
+    def test_load(self):
+        """
+        Test running assembled code and the on-disk cache
+
+        @Return: None
+        """
+
+        print(f"\nTest case 2-1: Loading into memory and running")
+        proc = processor.Processor(memory.Memory())
+        proc.reset()
+        assembler.assemble(PROGRAM, 0x0600).load(proc.memory)
+        proc.program_counter = 0x0600
+        proc.run(until_pc=0x060F)
+        self.assertEqual(proc.memory.read_byte(0x0400), ord("h"))
+        self.assertEqual(proc.memory.read_byte(0x0402), 3)
+        self.assertEqual(proc.reg_y, 3)
+
+        print(f"Test case 2-2: Loading into a bytearray")
+        buffer = bytearray(0x10000)
+        assembler.assemble(PROGRAM, 0x0600).load(buffer)
+        self.assertEqual(buffer[0x0600:0x0602], bytes([0xA2, 0x00]))
+
+        print(f"Test case 2-3: Unchanged source comes from the cache")
+        cache = tempfile.mkdtemp()
+        try:
+            first = assembler.assemble(PROGRAM, 0x0600, cache_dir=cache)
+            self.assertEqual(assembler.assemble(PROGRAM, 0x0600).segments, first.segments)
+            self.assertEqual(len(os.listdir(cache)), 1)
+            assembler._memo.clear()
+            cached = assembler.assemble(PROGRAM, 0x0600, cache_dir=cache)
+            self.assertIsNot(cached, first)
+            self.assertEqual(cached.segments, first.segments)
+            self.assertEqual(cached.symbols, first.symbols)
+            assembler.assemble(PROGRAM, 0x0700, cache_dir=cache)
+            self.assertEqual(len(os.listdir(cache)), 2)
+        finally:
+            shutil.rmtree(cache)
+
+        print(f"Test case 2-4: Changing one result leaves the cached one alone")
+        first = assembler.assemble(PROGRAM, 0x0600)
+        first.symbols["table"] = 0
+        first.segments.clear()
+        again = assembler.assemble(PROGRAM, 0x0600)
+        self.assertEqual(again.symbols["table"], 0x0610)
+        self.assertEqual(again.image(), buffer[0x0600:again.end])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
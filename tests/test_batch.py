@@ -0,0 +1,171 @@
+import unittest
+from py6502 import batch
+from py6502.assembler import assemble
+from py6502 import memory
+from py6502 import processor
+
+#LDA #$00 / LDX $10 / loop: CLC / STX $11 / ADC $11 / DEX / BNE loop / STA $12 / done: JMP done
+SUM_PROGRAM = bytes([
+    0xA9, 0x00, 0xA6, 0x10, 0x18, 0x86, 0x11, 0x65, 0x11, 0xCA, 0xD0, 0xF8, 0x85, 0x12, 0x4C, 0x0E, 0x06,
+])
+
+#Runs most of what the lane kernels cover, for a number of loops that depends on $10. Assembled at $06E8 so that
+#the BNE back to loop crosses a page
+LANES_PROGRAM = """
+start:  LDX $10
+        TSX
+        TXS
+        TXA
+        ASL A
+        ROL A
+        EOR #$5A
+        TAY
+        LSR A
+        ROR A
+        ORA #$01
+        AND #$7F
+        SEC
+        CLV
+        SEI
+        CLI
+        NOP
+        LDX $10
+loop:   INY
+        DEY
+        INY
+        CPY #$40
+        BCC small
+        CMP #$20
+        BMI small
+        LDA #$10
+small:  DEX
+        BNE loop
+        TYA
+        CPX #0
+        BEQ done
+done:   JMP start
+"""
+
+class BatchTest(unittest.TestCase):
+    def setUp(self):
+        self.batch = batch.Batch(8)
+        for i in range(self.batch.count):
+            self.batch.load(i, 0x0600, SUM_PROGRAM)
+            self.batch.load(i, 0x0010, bytes([i + 1]))
+            self.batch.program_counter[i] = 0x0600
+
+    def test_lockstep(self):
+        """
+        Test every machine in the batch runs its own copy of the program
+
+        @Return: None
+        """
+
+        print(f"\nTest case 1-1: Sum 1..n on eight machines")
+        self.batch.run(100)
+        for i in range(self.batch.count):
+            n = i + 1
+            self.assertEqual(self.batch.reg_a[i], n * (n + 1) // 2)
+            self.assertEqual(self.batch.view(i)[0x12], n * (n + 1) // 2)
+            self.assertEqual(self.batch.program_counter[i], 0x060E)
+
+    def test_matches_processor(self):
+        """
+        Test a machine in the batch ends up exactly where a Processor does
+
+        @Return: None
+        """
+
+        print(f"\nTest case 2-1: Batch against Processor")
+        self.batch.run(40)
+        for i in range(self.batch.count):
+            proc = processor.Processor(memory.Memory())
+            proc.memory.load(0x0600, SUM_PROGRAM)
+            proc.memory.write(0x0010, i + 1)
+            proc.program_counter = 0x0600
+            proc.run(40)
+
+            copy = self.batch.to_processor(i)
+            self.assertEqual(copy.reg_a, proc.reg_a)
+            self.assertEqual(copy.reg_x, proc.reg_x)
+            self.assertEqual(copy.program_counter, proc.program_counter)
+            self.assertEqual(copy.cycles, proc.cycles)
+            self.assertEqual(copy.memory.dump(), proc.memory.dump())
+
+    def test_load_processor(self):
+        """
+        Test copying a Processor into the batch and back out
+
+        @Return: None
+        """
+
+        print(f"\nTest case 3-1: Round trip through the batch")
+        proc = processor.Processor(memory.Memory())
+        proc.reset()
+        proc.reg_a = 0x12
+        proc.flag_c = True
+        proc.program_counter = 0x0600
+        proc.memory.write(0x0600, 0xEA)
+        self.batch.load_processor(3, proc)
+        self.assertEqual(self.batch.status[3] & batch.FLAG_C, batch.FLAG_C)
+
+        copy = self.batch.to_processor(3)
+        self.assertEqual(copy.reg_a, 0x12)
+        self.assertEqual(copy.flag_c, True)
+        self.assertEqual(copy.stack_pointer, 0xFD)
+        self.assertEqual(copy.memory.read_byte(0x0600), 0xEA)
+
+    def test_illegal_opcode(self):
+        """
+        Test a machine that hits a bad opcode halts without stopping the others
+
+        @Return: None
+        """
+
+        print(f"\nTest case 4-1: One machine halts")
+        self.batch.load(2, 0x0600, bytes([0x02]))
+        self.batch.run(100)
+        self.assertEqual(self.batch.halted[2], 1)
+        self.assertEqual(self.batch.program_counter[2], 0x0600)
+        self.assertEqual(self.batch.reg_a[3], 10)
+
+        print(f"Test case 4-2: Halted machines aren't stepped or counted")
+        self.batch.load(2, 0x0600, bytes([0xEA]))
+        self.assertEqual(self.batch.step(), 7)
+        self.assertEqual(self.batch.program_counter[2], 0x0600)
+
+    def test_lanes(self):
+        """
+        Test the lane kernels against a Processor, on machines that drift apart so both kinds of kernel get used
+
+        @Return: None
+        """
+
+        print(f"\nTest case 5-1: Lane kernels against Processor")
+        program = assemble(LANES_PROGRAM, 0x06E8)
+        lanes = batch.Batch(64)
+        procs = []
+        for i in range(lanes.count):
+            proc = processor.Processor(memory.Memory())
+            proc.reset()
+            program.load(proc.memory)
+            proc.memory.write(0x0010, (i * 5) & 0xFF)
+            proc.flag_v = bool(i & 1)
+            proc.program_counter = 0x06E8
+            lanes.load_processor(i, proc)
+            procs.append(proc)
+
+        self.assertEqual(lanes.run(500), 500 * lanes.count)
+        for i, proc in enumerate(procs):
+            proc.run(500)
+            copy = lanes.to_processor(i)
+            self.assertEqual(
+                (copy.reg_a, copy.reg_x, copy.reg_y, copy.stack_pointer, copy.program_counter),
+                (proc.reg_a, proc.reg_x, proc.reg_y, proc.stack_pointer, proc.program_counter),
+            )
+            self.assertEqual(copy.pack_status(), proc.pack_status())
+            self.assertEqual(copy.cycles, proc.cycles)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
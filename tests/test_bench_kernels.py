@@ -0,0 +1,61 @@
+import json
+import unittest
+from benchmarks import bench_kernels
+
+def results(ips, memory_bytes, name="memcpy"):
+    """
+    Benchmark results with a single kernel in
+
+    @Return: dict
+    """
+
+    return {
+        "version": bench_kernels.RESULTS_VERSION,
+        "kernels": {name: {"instructions_per_sec": ips, "mhz": ips * 3 / 1e6, "memory_bytes": memory_bytes}},
+    }
+
+class CompareTest(unittest.TestCase):
+    def test_compare(self):
+        """
+        Test regressions are only reported past the threshold, and only in the bad direction
+
+        @Return: None
+        """
+
+        baseline = results(1000000, 100000)
+
+        print(f"\nTest case 1-1: Within the threshold either way")
+        self.assertEqual(bench_kernels.compare(results(950000, 105000), baseline, 0.10), [])
+        self.assertEqual(bench_kernels.compare(results(2000000, 50000), baseline, 0.10), [])
+
+        print(f"Test case 1-2: Slower past the threshold")
+        regressions = bench_kernels.compare(results(800000, 100000), baseline, 0.10)
+        self.assertEqual(len(regressions), 1)
+        name, metric, before, after, change = regressions[0]
+        self.assertEqual((name, metric, before, after), ("memcpy", "instructions_per_sec", 1000000, 800000))
+        self.assertAlmostEqual(change, -0.2)
+
+        print(f"Test case 1-3: Bigger past the threshold")
+        regressions = bench_kernels.compare(results(1000000, 120000), baseline, 0.10)
+        self.assertEqual([regression[1] for regression in regressions], ["memory_bytes"])
+
+        print(f"Test case 1-4: Kernels on only one side are skipped")
+        self.assertEqual(bench_kernels.compare(results(1, 10 ** 9, "crc8"), baseline, 0.10), [])
+
+    def test_baseline(self):
+        """
+        Test the checked in baseline covers every kernel
+
+        @Return: None
+        """
+
+        print(f"\nTest case 2-1: Baseline loads and matches itself")
+        with open(bench_kernels.BASELINE) as f:
+            baseline = json.load(f)
+        self.assertEqual(baseline["version"], bench_kernels.RESULTS_VERSION)
+        self.assertEqual(set(baseline["kernels"]), set(bench_kernels.KERNELS))
+        self.assertEqual(bench_kernels.compare(baseline, baseline, 0.0), [])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,166 @@
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout, redirect_stderr
+from py6502 import cli
+
+#LDA #$00 / LDX #$0A / loop: STX $10 / CLC / ADC $10 / DEX / BNE loop / STA $20 / done: JMP done
+PROGRAM = bytes([0xA9, 0x00, 0xA2, 0x0A, 0x86, 0x10, 0x18, 0x65, 0x10, 0xCA, 0xD0, 0xF8, 0x85, 0x20, 0x4C, 0x0E, 0x06])
+
+class CliTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def path(self, name, data=None):
+        """
+        Path in the temporary directory, written with data if given
+
+        @Return: str
+        """
+
+        path = os.path.join(self.dir.name, name)
+        if data is not None:
+            with open(path, "wb") as f:
+                f.write(data)
+        return path
+
+    def run_cli(self, *argv):
+        """
+        Run the command line with a JSON result, and hand back the exit status and the result
+
+        @Return: tuple (int, dict)
+        """
+
+        result = self.path("result.json")
+        with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+            status = cli.main(list(argv) + ["--json", result])
+        with open(result) as f:
+            return status, json.load(f)
+
+    def hex_record(self, kind, addr, data):
+        """
+        One Intel HEX record line
+
+        @Return: str
+        """
+
+        record = bytes([len(data), addr >> 8, addr & 0xFF, kind]) + data
+        return ":" + (record + bytes([-sum(record) & 0xFF])).hex().upper() + "\n"
+
+    def test_formats(self):
+        """
+        Test each image format loads and runs
+
+        @Return: None
+        """
+
+        print(f"\nTest case 1-1: Raw image at a load address")
+        status, result = self.run_cli(self.path("sum.bin", PROGRAM), "--load", "$0600", "--cycles", "500")
+        self.assertEqual(status, 0)
+        self.assertEqual(result["a"], 55)
+        self.assertEqual(result["pc"], 0x060E)
+        self.assertEqual(result["start"], 0x0600)
+        self.assertGreaterEqual(result["cycles"], 500)
+        self.assertGreater(result["instructions"], 40)
+        self.assertIsNone(result["error"])
+
+        print(f"Test case 1-2: PRG carries its own load address")
+        status, result = self.run_cli(self.path("sum.prg", b"\x00\x06" + PROGRAM), "--instructions", "100")
+        self.assertEqual(result["a"], 55)
+        self.assertEqual(result["instructions"], 100)
+
+        print(f"Test case 1-3: Intel HEX with a start address record")
+        text = (
+            self.hex_record(0x00, 0x0600, PROGRAM[:9]) + self.hex_record(0x00, 0x0609, PROGRAM[9:])
+            + self.hex_record(0x05, 0x0000, bytes([0x00, 0x00, 0x06, 0x00])) + self.hex_record(0x01, 0x0000, b"")
+        )
+        status, result = self.run_cli(self.path("sum.hex", text.encode()), "--until", "$060E")
+        self.assertEqual(result["a"], 55)
+        self.assertEqual(result["pc"], 0x060E)
+
+        print(f"Test case 1-4: Full 64K image starts at its reset vector")
+        image = bytearray(0x10000)
+        image[0x0600:0x0600 + len(PROGRAM)] = PROGRAM
+        image[0xFFFC:0xFFFE] = b"\x00\x06"
+        status, result = self.run_cli(self.path("full.bin", bytes(image)), "--cycles", "1e3")
+        self.assertEqual(result["a"], 55)
+
+        print(f"Test case 1-5: Vectors and entry from the command line")
+        status, result = self.run_cli(
+            self.path("brk.bin", bytes([0x00, 0xEA, 0xA9, 0x42, 0x4C, 0x04, 0x07])), "--load", "0x0700",
+            "--irq", "$0702", "--entry", "$0700", "--instructions", "3",
+        )
+        self.assertEqual(result["a"], 0x42)
+        self.assertEqual(result["sp"], 0xFA)
+
+    def test_errors(self):
+        """
+        Test exit status for programs that stop and images that don't load
+
+        @Return: None
+        """
+
+        print(f"\nTest case 2-1: Illegal opcode is exit status 1")
+        status, result = self.run_cli(self.path("bad.bin", bytes([0xEA, 0x02])), "--load", "$0600", "--cycles", "10")
+        self.assertEqual(status, 1)
+        self.assertIn("Unsupported opcode: $02", result["error"])
+        self.assertEqual(result["instructions"], 1)
+
+        print(f"Test case 2-2: Bad checksum is exit status 2")
+        path = self.path("bad.hex", b":0100000000FE\n")
+        with redirect_stderr(io.StringIO()) as err:
+            self.assertEqual(cli.main([path]), 2)
+        self.assertIn("bad.hex:1: bad checksum", err.getvalue())
+
+        print(f"Test case 2-3: Image too big for where it's loaded")
+        with redirect_stderr(io.StringIO()):
+            self.assertEqual(cli.main([self.path("big.bin", bytes(0x200)), "--load", "$FF00"]), 2)
+
+        print(f"Test case 2-4: --until somewhere never reached still stops at the default budget")
+        status, result = self.run_cli(self.path("sum.bin", PROGRAM), "--load", "$0600", "--until", "$0700")
+        self.assertEqual(status, 0)
+        self.assertEqual(result["pc"], 0x060E)
+        self.assertGreaterEqual(result["cycles"], cli.DEFAULT_CYCLES)
+        self.assertLess(result["cycles"], cli.DEFAULT_CYCLES + 7)
+
+    def test_idle(self):
+        """
+        Test --idle skips loops and still lands in the same place
+
+        @Return: None
+        """
+
+        print(f"\nTest case 3-1: Same state with and without --idle")
+        path = self.path("sum.bin", PROGRAM)
+        status, plain = self.run_cli(path, "--load", "$0600", "--cycles", "100000")
+        status, fast = self.run_cli(path, "--load", "$0600", "--cycles", "100000", "--idle")
+        for key in ("a", "x", "y", "sp", "pc", "p", "cycles"):
+            self.assertEqual(fast[key], plain[key], key)
+        self.assertIsNone(fast["instructions"])
+        self.assertGreater(fast["idle_skipped_cycles"], 90000)
+
+    def test_lazy_imports(self):
+        """
+        Test the optional parts stay unimported until asked for
+
+        @Return: None
+        """
+
+        print(f"\nTest case 4-1: Importing the runner leaves the tracer, profiler and idle loops alone")
+        code = "import sys, py6502.cli; print(sorted(m for m in sys.modules if m.startswith('py6502')))"
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True).stdout
+        for module in ("py6502.tracer", "py6502.profiler", "py6502.idle", "py6502.assembler"):
+            self.assertNotIn(module, output)
+        self.assertIn("py6502.processor", output)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,119 @@
+import unittest
+from py6502 import memory
+from py6502 import processor
+from py6502 import debugger
+from py6502 import tracer
+from py6502.assembler import assemble
+
+PROGRAM = """
+start:  LDX #$03
+loop:   STX $0200
+        LDA $0301
+        DEX
+        BNE loop
+done:   JMP done
+"""
+
+class DebuggerTest(unittest.TestCase):
+    def setUp(self):
+        self.proc = processor.Processor(memory.Bus())
+        self.proc.reset()
+        self.program = assemble(PROGRAM, 0x0600)
+        self.program.load(self.proc.memory)
+        self.proc.program_counter = 0x0600
+        self.debugger = debugger.Debugger(self.proc)
+
+    def test_breakpoints(self):
+        """
+        Test stopping on and carrying on from breakpoints
+
+        @Return: None
+        """
+
+        loop = self.program.symbols["loop"]
+
+        print(f"\nTest case 1-1: Stops before the instruction runs")
+        self.debugger.add_breakpoint(loop)
+        hit = self.debugger.run(100)
+        self.assertEqual((hit.reason, hit.addr), ("breakpoint", loop))
+        self.assertEqual(self.proc.program_counter, loop)
+        self.assertEqual(self.proc.cycles, 2)
+
+        print(f"Test case 1-2: Running again goes round the loop once")
+        hit = self.debugger.run(100)
+        self.assertEqual(hit.addr, loop)
+        self.assertEqual(self.proc.reg_x, 2)
+
+        print(f"Test case 1-3: Removing the last one puts the dispatch table back")
+        self.debugger.remove_breakpoint(loop)
+        self.assertTrue(all(entry[0].__name__.startswith(("ins_", "_ins")) for entry in self.proc._dispatch))
+        self.assertIsNone(self.debugger.run(until_pc=self.program.symbols["done"]))
+        self.assertEqual(self.proc.reg_x, 0)
+
+        print(f"Test case 1-4: Raised straight out of Processor.run")
+        self.debugger.add_breakpoint(self.program.symbols["done"])
+        self.proc.program_counter = 0x0600
+        with self.assertRaises(debugger.DebugBreak):
+            self.proc.run(100)
+
+        print(f"Test case 1-5: Clearing breakpoints leaves a tracer that went on after it")
+        trace = tracer.Tracer(self.proc, capacity=16)
+        trace.start()
+        self.debugger.clear()
+        self.proc.program_counter = 0x0600
+        self.proc.run(3)
+        self.assertEqual(len(trace.records()), 3)
+        trace.stop()
+        self.assertEqual(self.proc._hooks, [])
+
+    def test_watchpoints(self):
+        """
+        Test read and write watchpoints
+
+        @Return: None
+        """
+
+        print(f"\nTest case 2-1: Write stops after the instruction")
+        self.debugger.add_watchpoint(0x0200)
+        hit = self.debugger.run(100)
+        self.assertEqual((hit.reason, hit.addr, hit.value), ("write", 0x0200, 3))
+        self.assertEqual(self.proc.program_counter, 0x0605)
+
+        print(f"Test case 2-2: Other addresses on the page don't stop it")
+        self.debugger.remove_watchpoint(0x0200)
+        self.debugger.add_watchpoint(0x0201)
+        self.assertIsNone(self.debugger.run(until_pc=self.program.symbols["done"]))
+
+        print(f"Test case 2-3: Reads")
+        self.debugger.remove_watchpoint(0x0201)
+        self.proc.memory.write(0x0301, 0x42)
+        self.debugger.add_watchpoint(0x0301, read=True, write=False)
+        self.proc.program_counter = 0x0600
+        hit = self.debugger.run(100)
+        self.assertEqual((hit.reason, hit.value), ("read", 0x42))
+        self.assertEqual(self.proc.reg_a, 0x42)
+
+        print(f"Test case 2-4: A hit on the last instruction of a bounded run")
+        self.debugger.clear()
+        self.debugger.add_watchpoint(0x0200)
+        self.proc.program_counter = 0x0600
+        hit = self.debugger.run(2)
+        self.assertEqual((hit.reason, hit.addr), ("write", 0x0200))
+        self.assertEqual(self.proc.program_counter, 0x0605)
+        self.debugger.remove_watchpoint(0x0200)
+        self.assertIsNone(self.debugger.run(until_pc=self.program.symbols["done"]))
+        self.proc.run(3)
+
+        print(f"Test case 2-5: Unwatched pages go back to plain memory")
+        self.debugger.clear()
+        self.assertTrue(all(reader is None for reader in self.proc.memory._readers))
+        self.assertTrue(all(writer is None for writer in self.proc.memory._writers))
+
+        print(f"Test case 2-6: Watchpoints need a Bus")
+        proc = processor.Processor(memory.Memory())
+        with self.assertRaises(ValueError):
+            debugger.Debugger(proc).add_watchpoint(0x0200)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+from py6502 import assembler
+from py6502 import disassembler
+from py6502 import memory
+from py6502.opcodes import OPCODES
+from py6502.addressing import OPERAND_BYTES
+
+class DisassemblerTest(unittest.TestCase):
+    def test_decode(self):
+        """
+        Test decoding bytes, memory and files
+
+        @Return: None
+        """
+
+        print(f"\nTest case 1-1: Operands and branch targets")
+        instructions = list(disassembler.disassemble(bytes([0xA9, 0x10, 0x6C, 0x34, 0x12, 0xD0, 0xF9]), 0x0600))
+        self.assertEqual([instruction.addr for instruction in instructions], [0x0600, 0x0602, 0x0605])
+        self.assertEqual([instruction.operand for instruction in instructions], [0x10, 0x1234, 0x0600])
+        self.assertEqual(
+            [disassembler.format_instruction(instruction) for instruction in instructions],
+            ["LDA #$10", "JMP ($1234)", "BNE $0600"],
+        )
+
+        print(f"Test case 1-2: Illegal and cut off opcodes are data")
+        instructions = list(disassembler.disassemble(bytes([0x02, 0xAD, 0x34])))
+        self.assertEqual([instruction.mnemonic for instruction in instructions], [None, None, None])
+        self.assertEqual(disassembler.format_instruction(instructions[0]), ".byte $02")
+
+        print(f"Test case 1-3: Memory ranges take their operands from past the end")
+        mem = memory.Memory()
+        mem.load(0x0700, bytes([0xEA, 0x4C, 0x00, 0x07]))
+        instructions = list(disassembler.disassemble_memory(mem, 0x0700, 0x0702))
+        self.assertEqual(len(instructions), 2)
+        self.assertEqual(instructions[1].operand, 0x0700)
+        self.assertIn("$0701  4C  JMP $0700", disassembler.listing(instructions))
+
+        print(f"Test case 1-4: Part of a file")
+        fd, path = tempfile.mkstemp()
+        os.write(fd, bytes([0xFF] * 0x10) + bytes([0xE8, 0xCA, 0x60]))
+        os.close(fd)
+        try:
+            instructions = list(disassembler.disassemble_file(path, base=0x8000, offset=0x10))
+            self.assertEqual([instruction.mnemonic for instruction in instructions], ["INX", "DEX", "RTS"])
+            self.assertEqual(instructions[0].addr, 0x8000)
+            self.assertEqual(len(list(disassembler.disassemble_file(path, length=4))), 4)
+        finally:
+            os.remove(path)
+
+    def test_round_trip(self):
+        """
+        Test every opcode assembles back to the same bytes
+
+        @Return: None
+        """
+
+        print(f"\nTest case 2-1: Disassemble then assemble every opcode")
+        for opcode, (mnemonic, mode, cycles) in OPCODES.items():
+            code = bytes([opcode]) + bytes([0x10, 0x12][:OPERAND_BYTES[mode]])
+            instruction = next(disassembler.disassemble(code, 0x0600))
+            self.assertEqual(instruction.mnemonic, mnemonic)
+            text = disassembler.format_instruction(instruction)
+            self.assertEqual(assembler.assemble(text, 0x0600).image(), code, text)
+
+        print(f"Test case 2-2: Absolute operands below $0100 stay absolute")
+        for opcode, (mnemonic, mode, cycles) in OPCODES.items():
+            if OPERAND_BYTES[mode] == 2:
+                code = bytes([opcode, 0x10, 0x00])
+                text = disassembler.format_instruction(next(disassembler.disassemble(code, 0x0600)))
+                self.assertEqual(assembler.assemble(text, 0x0600).image(), code, text)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
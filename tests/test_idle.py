@@ -0,0 +1,151 @@
+import unittest
+from py6502 import memory
+from py6502 import processor
+from py6502 import tracer
+from py6502 import idle
+
+#LDY #$03 / outer: LDX #$00 / inner: DEX / BNE inner / DEY / BNE outer / STY $20 / done: JMP done
+DELAY_PROGRAM = bytes([0xA0, 0x03, 0xA2, 0x00, 0xCA, 0xD0, 0xFD, 0x88, 0xD0, 0xF8, 0x84, 0x20, 0x4C, 0x0C, 0x06])
+
+#wait: LDA $10 / AND #$80 / BEQ wait / STA $11 / done: JMP done
+WAIT_PROGRAM = bytes([0xA5, 0x10, 0x29, 0x80, 0xF0, 0xFA, 0x85, 0x11, 0x4C, 0x08, 0x06])
+
+class IdleTest(unittest.TestCase):
+    def machine(self, program, mem=None):
+        """
+        Processor with a program loaded at $0600
+
+        @Return: Processor
+        """
+
+        proc = processor.Processor(mem if mem is not None else memory.Memory())
+        proc.reset()
+        proc.memory.load(0x0600, program)
+        proc.program_counter = 0x0600
+        return proc
+
+    def state(self, proc):
+        """
+        Everything observable about a processor
+
+        @Return: tuple
+        """
+
+        return (
+            proc.reg_a, proc.reg_x, proc.reg_y, proc.pack_status(), proc.stack_pointer, proc.program_counter,
+            proc.cycles, proc.memory.dump(),
+        )
+
+    def test_countdown(self):
+        """
+        Test delay loops come out the same fast-forwarded
+
+        @Return: None
+        """
+
+        print(f"\nTest case 1-1: Same state for every budget")
+        for budget in (1, 7, 100, 1279, 1280, 1281, 3000, 3900, 5000):
+            plain = self.machine(DELAY_PROGRAM)
+            plain.run(max_cycles=budget)
+            fast = self.machine(DELAY_PROGRAM)
+            with idle.IdleLoops(fast):
+                fast.run(max_cycles=budget)
+            self.assertEqual(self.state(fast), self.state(plain), budget)
+
+        print(f"Test case 1-2: The inner loop is skipped rather than run")
+        fast = self.machine(DELAY_PROGRAM)
+        with idle.IdleLoops(fast) as loops:
+            fast.run(max_cycles=100000)
+        self.assertEqual(fast.program_counter, 0x060C)
+        self.assertEqual(fast.memory.read_byte(0x0020), 0x00)
+        self.assertEqual(loops.skips, 3 + 1)
+        self.assertGreater(loops.skipped_cycles, 90000)
+
+        print(f"Test case 1-3: Runs that count instructions are left alone")
+        fast = self.machine(DELAY_PROGRAM)
+        with idle.IdleLoops(fast) as loops:
+            fast.run(1000)
+        self.assertEqual(loops.skips, 0)
+
+    def test_wait(self):
+        """
+        Test a poll loop jumps on to the event that ends it
+
+        @Return: None
+        """
+
+        def machine():
+            proc = self.machine(WAIT_PROGRAM)
+            proc.schedule(5000, lambda: proc.memory.write(0x0010, 0x80))
+            return proc
+
+        print(f"\nTest case 2-1: Same state as polling the long way")
+        for budget in (3, 4999, 5000, 5007, 5012, 20000):
+            plain = machine()
+            plain.run(max_cycles=budget)
+            fast = machine()
+            with idle.IdleLoops(fast):
+                fast.run(max_cycles=budget)
+            self.assertEqual(self.state(fast), self.state(plain), budget)
+
+        print(f"Test case 2-2: The event is reached in one jump")
+        fast = machine()
+        with idle.IdleLoops(fast) as loops:
+            fast.run(max_cycles=20000)
+        self.assertEqual(fast.memory.read_byte(0x0011), 0x80)
+        self.assertEqual(loops.skips, 2)
+
+    def test_hold_off(self):
+        """
+        Test the loops that can't be skipped aren't
+
+        @Return: None
+        """
+
+        print(f"\nTest case 3-1: Reads from a device run every time")
+        bus = memory.Bus()
+        reads = []
+        bus.map_device(0xD000, 0xD100, read=lambda addr: reads.append(addr) or 0x00)
+        #wait: LDA $D011 / BPL wait
+        proc = self.machine(bytes([0xAD, 0x11, 0xD0, 0x10, 0xFB]), bus)
+        with idle.IdleLoops(proc) as loops:
+            proc.run(max_cycles=700)
+        self.assertEqual(len(reads), 100)
+        self.assertEqual(loops.skips, 0)
+
+        print(f"Test case 3-2: Tracing on top sees every instruction")
+        proc = self.machine(DELAY_PROGRAM)
+        with idle.IdleLoops(proc) as loops:
+            with tracer.Tracer(proc, capacity=16) as trace:
+                proc.run(max_cycles=1000)
+        self.assertEqual(loops.skips, 0)
+        self.assertEqual({record.pc for record in trace.records()}, {0x0604, 0x0605})
+
+        print(f"Test case 3-3: Whichever goes on first, and carries on once the tracer is off")
+        proc = self.machine(DELAY_PROGRAM)
+        trace = tracer.Tracer(proc, capacity=16)
+        trace.start()
+        with idle.IdleLoops(proc) as loops:
+            proc.run(max_cycles=1000)
+            self.assertEqual(loops.skips, 0)
+            trace.stop()
+            proc.run(max_cycles=100000)
+        self.assertEqual(proc.program_counter, 0x060C)
+        self.assertGreater(loops.skips, 0)
+        self.assertEqual(proc._hooks, [])
+
+        print(f"Test case 3-4: Code written over is looked at again")
+        proc = self.machine(DELAY_PROGRAM)
+        with idle.IdleLoops(proc) as loops:
+            proc.run(max_cycles=100)
+            count = proc.reg_x
+            #DEX -> NOP, which leaves a loop that never ends
+            proc.memory.write(0x0604, 0xEA)
+            proc.run(max_cycles=1000)
+        self.assertEqual(loops.skips, 2)
+        self.assertEqual(proc.reg_x, count)
+        self.assertIn(proc.program_counter, (0x0604, 0x0605))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -1,5 +1,8 @@
+import os
+import tempfile
 import unittest
 from py6502 import memory
+from py6502 import processor
 
 """
 Homegrown test suite just like mother used to make
@@ -20,7 +23,7 @@ class MemTest(unittest.TestCase):
 
         #Test case one
         print(f"Test case 1-1: Default memory init")
-        self.size = 65535
+        self.size = 65536
         self.size_hex = hex(self.size)
         
         print(f"\nMemory size: {self.mem.size}")
@@ -77,6 +80,350 @@ class MemTest(unittest.TestCase):
         print(f"Expected: $FFFF")
         self.assertEqual(res, 0xFFFF)
 
+        #Test case five
+        print(f"Test case 2-5: Read word at top of memory")
+        self.mem.write(0xFFFE, 0x00)
+        self.mem.write(0xFFFF, 0xE0)
+        res = self.mem.read_word(0xFFFE)
+        print(f"Read word: ${res:04X}")
+        print(f"Expected: $E000")
+        self.assertEqual(res, 0xE000)
+
+    def test_fast_path(self) -> None:
+        """
+        Test the unchecked accessors the processor uses
+
+        @Return: None
+        """
+
+        print("\nTest case 5-1: Addresses wrap instead of raising")
+        self.mem.write_fast(0x10042, 0x99)
+        self.assertEqual(self.mem.read_byte(0x0042), 0x99)
+        self.assertEqual(self.mem.read_byte_fast(0x10042), 0x99)
+
+        print("Test case 5-2: Word read in one go, wrapping at the top of memory")
+        self.mem.load(0x1234, bytes([0xCD, 0xAB]))
+        self.assertEqual(self.mem.read_word_fast(0x1234), 0xABCD)
+        self.mem.write(0xFFFF, 0x34)
+        self.mem.write(0x0000, 0x12)
+        self.assertEqual(self.mem.read_word_fast(0xFFFF), 0x1234)
+
+        print("Test case 5-3: Zero page word read wraps inside the zero page")
+        self.mem.write(0x00FF, 0x78)
+        self.mem.write(0x0100, 0x00)
+        self.mem.write(0x0000, 0x56)
+        self.assertEqual(self.mem.read_word_zero_page(0xFF), 0x5678)
+
+        print("Test case 5-4: Values still have to be bytes")
+        with self.assertRaises(ValueError):
+            self.mem.write_fast(0x0000, 0x100)
+
+    def test_load_dump(self) -> None:
+        """
+        Test bulk load, dump and view
+
+        @Return: None
+        """
+
+        print("\nTest case 3-1: Load and dump a block")
+        self.mem.load(0x0600, bytes([0xA9, 0x01, 0x8D, 0x00, 0x02]))
+        self.assertEqual(self.mem.read_byte(0x0602), 0x8D)
+        self.assertEqual(self.mem.dump(0x0600, 0x0605), bytes([0xA9, 0x01, 0x8D, 0x00, 0x02]))
+
+        print("Test case 3-2: Dump is a snapshot, view is live")
+        snapshot = self.mem.dump(0x0600, 0x0601)
+        live = self.mem.view(0x0600, 0x0601)
+        self.mem.write(0x0600, 0xEA)
+        self.assertEqual(snapshot[0], 0xA9)
+        self.assertEqual(live[0], 0xEA)
+
+        print("Test case 3-3: Load past the end of memory")
+        with self.assertRaises(ValueError):
+            self.mem.load(0xFFFF, bytes(2))
+
+    def test_load_file(self) -> None:
+        """
+        Test loading and mapping images from files
+
+        @Return: None
+        """
+
+        with tempfile.TemporaryDirectory() as tmp:
+            rom = os.path.join(tmp, "rom.bin")
+            with open(rom, "wb") as f:
+                f.write(bytes(range(16)))
+
+            print("\nTest case 4-1: Load a ROM image at an address")
+            self.assertEqual(self.mem.load_file(rom, 0xF000), 16)
+            self.assertEqual(self.mem.dump(0xF000, 0xF010), bytes(range(16)))
+
+            print("Test case 4-2: Map a snapshot as memory")
+            snap = os.path.join(tmp, "snap.bin")
+            with open(snap, "wb") as f:
+                f.write(self.mem.dump())
+            mapped = memory.Memory.from_file(snap)
+            self.assertEqual(mapped.size, 65536)
+            self.assertEqual(mapped.read_byte(0xF00F), 15)
+
+            print("Test case 4-3: Writes to a mapped snapshot don't reach the file")
+            mapped.write(0xF00F, 0xFF)
+            self.assertEqual(mapped.read_byte(0xF00F), 0xFF)
+            with open(snap, "rb") as f:
+                self.assertEqual(f.read()[0xF00F], 15)
+
+    def test_dirty_pages(self) -> None:
+        """
+        Test written pages are tracked and can be diffed
+
+        @Return: None
+        """
+
+        print("\nTest case 6-1: Writes and loads mark the pages they touch")
+        self.assertEqual(self.mem.dirty_pages(), [])
+        self.mem.write(0x0010, 0x01)
+        self.mem.write_fast(0x10005, 0x02)
+        self.mem.load(0x06F0, bytes(0x20))
+        self.assertEqual(self.mem.dirty_pages(), [0x00, 0x06, 0x07])
+
+        print("Test case 6-2: Clearing starts afresh, older generations still work")
+        before = self.mem.clear_dirty()
+        self.assertEqual(self.mem.dirty_pages(), [])
+        self.assertEqual(self.mem.generation, before)
+        self.mem.write(0xFFFF, 0x03)
+        self.assertEqual(self.mem.dirty_pages(), [0xFF])
+        self.assertEqual(self.mem.dirty_pages(0), [0x00, 0x06, 0x07, 0xFF])
+
+        print("Test case 6-3: Only advancing moves the generation on")
+        self.assertEqual(self.mem.generation, before)
+        self.assertEqual(self.mem.advance_generation(), before + 1)
+        self.assertEqual(self.mem.advance_generation(), before + 1)
+        self.assertEqual(self.mem.dirty_pages(before), [0xFF])
+        self.assertEqual(self.mem.dirty_pages(before + 1), [])
+
+        print("Test case 6-4: Processor stores mark pages too")
+        proc = processor.Processor(self.mem)
+        #LDA #$42 / STA $0300 / PHA
+        self.mem.load(0x0600, bytes([0xA9, 0x42, 0x8D, 0x00, 0x03, 0x48]))
+        self.mem.clear_dirty()
+        proc.program_counter = 0x0600
+        proc.run(3)
+        self.assertEqual(self.mem.dirty_pages(), [0x01, 0x03])
+
+        print("Test case 6-5: Diff against an earlier dump")
+        old = self.mem.dump()
+        self.assertEqual(self.mem.diff_pages(old), [])
+        self.mem.write(0x0300, 0x42)
+        self.mem.write(0x0400, 0x01)
+        self.assertEqual(self.mem.diff_pages(old), [0x04])
+        self.assertEqual(self.mem.diff_pages(old, [0x03]), [])
+        self.assertRaises(ValueError, self.mem.diff_pages, memory.Memory(0x1000))
+
+        print("Test case 6-6: Diff against a bytearray, and one fork against another")
+        self.assertEqual(self.mem.diff_pages(bytearray(old), [0x03, 0x04]), [0x04])
+        self.assertEqual(self.mem.fork().diff_pages(memory.Memory().fork()), [0x00, 0x01, 0x03, 0x04, 0x06, 0xFF])
+
+        print("Test case 6-7: Forks and the bus track their own writes")
+        child = self.mem.fork()
+        child.write(0x0500, 0x01)
+        self.assertEqual(child.dirty_pages(), [0x05])
+        self.assertEqual(child.diff_pages(self.mem), [0x05])
+        bus = memory.Bus()
+        bus.map_device(0xD000, 0xD100, write=lambda addr, value: None)
+        bus.watch_writes(0x0200, 0x0300, lambda addr, value: None)
+        bus.write(0xD000, 0x01)
+        bus.write(0x0200, 0x01)
+        bus.write_fast(0x0800, 0x01)
+        self.assertEqual(bus.dirty_pages(), [0x02, 0x08])
+
+
+class BusTest(unittest.TestCase):
+    def setUp(self):
+        self.bus = memory.Bus()
+
+    def test_ram_default(self) -> None:
+        """
+        Test every page starts out as plain RAM
+
+        @Return: None
+        """
+
+        print("\nTest case 1-1: Bus reads and writes like memory")
+        self.bus.write(0x1234, 0x56)
+        self.assertEqual(self.bus.read_byte(0x1234), 0x56)
+        self.assertEqual(self.bus.read_byte_fast(0x1234), 0x56)
+        self.assertEqual(self.bus.dump(0x1234, 0x1235), bytes([0x56]))
+
+    def test_rom(self) -> None:
+        """
+        Test ROM pages ignore writes
+
+        @Return: None
+        """
+
+        print("\nTest case 2-1: Load ROM and write to it")
+        self.bus.map_rom(0xE000, 0x10000, bytes([0xEA] * 16))
+        self.bus.write(0xE000, 0x00)
+        self.bus.write_fast(0xE001, 0x00)
+        self.assertEqual(self.bus.read_byte(0xE000), 0xEA)
+        self.assertEqual(self.bus.read_byte(0xE001), 0xEA)
+
+        print("Test case 2-2: Regions must be page aligned")
+        with self.assertRaises(ValueError):
+            self.bus.map_rom(0xE010, 0xF000)
+
+    def test_mirror(self) -> None:
+        """
+        Test mirrored regions land on their source
+
+        @Return: None
+        """
+
+        print("\nTest case 3-1: 2K of RAM mirrored up to $2000")
+        self.bus.map_mirror(0x0800, 0x2000, 0x0000)
+        self.bus.write(0x0801, 0x11)
+        self.assertEqual(self.bus.read_byte(0x0001), 0x11)
+        self.assertEqual(self.bus.read_byte(0x1801), 0x11)
+
+    def test_device(self) -> None:
+        """
+        Test device callbacks see reads and writes in their region
+
+        @Return: None
+        """
+
+        written = []
+        self.bus.map_device(0xD000, 0xE000, read=lambda addr: addr & 0xFF, write=lambda addr, value: written.append((addr, value)))
+
+        print("\nTest case 4-1: Device reads and writes")
+        self.assertEqual(self.bus.read_byte(0xD012), 0x12)
+        self.bus.write(0xD000, 0x41)
+        self.assertEqual(written, [(0xD000, 0x41)])
+        self.assertEqual(self.bus.read_word_fast(0xD0FF), 0x00FF)
+
+        print("Test case 4-2: Processor stores go to the device")
+        proc = processor.Processor(self.bus)
+        #LDA #$42 / STA $D001
+        self.bus.load(0x0600, bytes([0xA9, 0x42, 0x8D, 0x01, 0xD0]))
+        proc.program_counter = 0x0600
+        proc.run(2)
+        self.assertEqual(written[-1], (0xD001, 0x42))
+
+        print("Test case 4-3: Unmapping makes it RAM again")
+        self.bus.map_ram(0xD000, 0xE000)
+        self.bus.write(0xD000, 0x99)
+        self.assertEqual(self.bus.read_byte(0xD000), 0x99)
+
+        print("Test case 4-4: Word reads hit the device low byte first")
+        reads = []
+        self.bus.map_device(0xD000, 0xD100, read=lambda addr: reads.append(addr) or 0x00)
+        self.bus.read_word_fast(0xD0FF)
+        self.assertEqual(reads, [0xD0FF])
+        self.bus.read_word_fast(0xD010)
+        self.assertEqual(reads, [0xD0FF, 0xD010, 0xD011])
+
+    def test_watch_writes(self) -> None:
+        """
+        Test write watches sit on top of whatever is mapped
+
+        @Return: None
+        """
+
+        seen = []
+        watch = lambda addr, value: seen.append((addr, value))
+
+        print("\nTest case 5-1: Watch on RAM")
+        self.bus.watch_writes(0x0200, 0x0300, watch)
+        self.bus.write(0x0234, 0x56)
+        self.bus.write(0x0300, 0x01)
+        self.assertEqual(seen, [(0x0234, 0x56)])
+        self.assertEqual(self.bus.read_byte(0x0234), 0x56)
+
+        print("Test case 5-2: Watch stays put through a remap")
+        self.bus.map_rom(0x0200, 0x0300)
+        self.bus.write(0x0235, 0x57)
+        self.assertEqual(seen[-1], (0x0235, 0x57))
+        self.assertEqual(self.bus.read_byte(0x0235), 0x00)
+
+        print("Test case 5-3: Unwatching puts the plain handler back")
+        self.bus.unwatch_writes(0x0200, 0x0300, watch)
+        self.bus.map_ram(0x0200, 0x0300)
+        self.bus.write(0x0236, 0x58)
+        self.assertEqual(len(seen), 2)
+        self.assertIsNone(self.bus._writers[0x02])
+
+        print("Test case 5-4: Read watches see what the device returned")
+        self.bus.map_device(0xD000, 0xD100, read=lambda addr: 0x99)
+        self.bus.watch_reads(0xD000, 0xD100, watch)
+        self.assertEqual(self.bus.read_byte(0xD010), 0x99)
+        self.assertEqual(seen[-1], (0xD010, 0x99))
+        self.bus.unwatch_reads(0xD000, 0xD100, watch)
+        self.bus.read_byte(0xD011)
+        self.assertEqual(len(seen), 3)
+
+
+class ForkTest(unittest.TestCase):
+    def setUp(self):
+        self.mem = memory.Memory()
+        self.mem.load(0x0200, bytes(range(256)))
+        self.root = self.mem.fork()
+
+    def test_copy_on_write(self) -> None:
+        """
+        Test forks share pages until one side writes
+
+        @Return: None
+        """
+
+        print("\nTest case 1-1: Fork starts out sharing everything")
+        child = self.root.fork()
+        self.assertEqual(child.dump(), self.mem.dump())
+        self.assertEqual(child.private_pages(), 0)
+
+        print("Test case 1-2: Writes only copy the page they land on")
+        child.write(0x0210, 0xAA)
+        self.assertEqual(child.private_pages(), 1)
+        self.assertEqual(child.read_byte(0x0210), 0xAA)
+        self.assertEqual(self.root.read_byte(0x0210), 0x10)
+
+        print("Test case 1-3: Parent writes don't leak into the fork either")
+        grandchild = child.fork()
+        child.write(0x0211, 0xBB)
+        self.assertEqual(grandchild.read_byte(0x0210), 0xAA)
+        self.assertEqual(grandchild.read_byte(0x0211), 0x11)
+        self.assertEqual(child.private_pages(), 1)
+        self.assertEqual(grandchild.private_pages(), 0)
+
+        print("Test case 1-4: Flat memory is cut loose from the fork")
+        self.mem.write(0x0200, 0x99)
+        self.assertEqual(self.root.read_byte(0x0200), 0x00)
+
+    def test_fork_api(self) -> None:
+        """
+        Test a fork behaves like any other memory
+
+        @Return: None
+        """
+
+        print("\nTest case 2-1: Bulk load and dump across pages")
+        self.root.load(0x02F0, bytes([0x55] * 0x20))
+        self.assertEqual(self.root.dump(0x02EF, 0x0311), bytes([0xEF] + [0x55] * 0x20 + [0x00]))
+        self.assertEqual(bytes(self.root.view(0x0300, 0x0302)), bytes([0x55, 0x55]))
+
+        print("Test case 2-2: Checks still raise")
+        self.assertRaises(ValueError, self.root.write, 0x10000, 0x00)
+        self.assertRaises(ValueError, self.root.write, 0x0000, 0x100)
+        self.assertRaises(ValueError, memory.Memory(0x1001).fork)
+
+        print("Test case 2-3: Processor runs on a fork")
+        proc = processor.Processor(self.root.fork())
+        #LDA $0205 / STA $0300
+        proc.memory.load(0x0600, bytes([0xAD, 0x05, 0x02, 0x8D, 0x00, 0x03]))
+        proc.program_counter = 0x0600
+        proc.run(2)
+        self.assertEqual(proc.memory.read_byte(0x0300), 0x05)
+        self.assertEqual(self.root.read_byte(0x0300), 0x55)
+        self.assertEqual(len(proc.snapshot()), 0x10000 + 16)
+
 
 if __name__ == "__main__":
     unittest.main(verbosity=2)
\ No newline at end of file
@@ -1,6 +1,7 @@
 import unittest
 from py6502 import memory
 from py6502 import processor
+from py6502 import addressing
 
 
 INITIAL_STATE_ON = 1
@@ -13,6 +14,17 @@ class ProcessorTest(unittest.TestCase):
         self.mem = memory.Memory()
         self.proc = processor.Processor(self.mem)
 
+    def load(self, addr, program):
+        """
+        Write a program into memory and point the program counter at it
+
+        @Return: None
+        """
+
+        for i, byte in enumerate(program):
+            self.mem.write(addr + i, byte)
+        self.proc.program_counter = addr
+
     def test_proc_init(self):
         """
         Test processor inital state and setup
@@ -32,6 +44,506 @@ class ProcessorTest(unittest.TestCase):
         self.assertEqual(self.proc.flag_v, FLAG_OFF)
         self.assertEqual(self.proc.flag_z, FLAG_OFF)
 
+    def test_dispatch_table(self):
+        """
+        Test the dispatch table has a slot for every opcode
+
+        @Return: None
+        """
+
+        print(f"\nTest case 2-1: Dispatch table size")
+        self.assertEqual(len(self.proc._dispatch), 256)
+
+        print(f"Test case 2-2: Known opcode resolves to its handler")
+        handler, mode, cycles = self.proc._dispatch[0xAD]
+        self.assertEqual(handler, self.proc.ins_lda)
+        self.assertEqual(mode, self.proc._mode_absolute)
+        self.assertEqual(cycles, 4)
+
+        print(f"Test case 2-3: Implied opcode has no addressing mode")
+        handler, mode, cycles = self.proc._dispatch[0xEA]
+        self.assertEqual(handler, self.proc.ins_nop)
+        self.assertIsNone(mode)
+
+    def test_step(self):
+        """
+        Test fetch, decode and execute of single instructions
+
+        @Return: None
+        """
+
+        #LDA $10 / TAX / INX / STA $0200,X
+        program = [0xA5, 0x10, 0xAA, 0xE8, 0x9D, 0x00, 0x02]
+        for i, byte in enumerate(program):
+            self.mem.write(0x0600 + i, byte)
+        self.mem.write(0x0010, 0x41)
+        self.proc.program_counter = 0x0600
+
+        print(f"\nTest case 3-1: LDA zero page")
+        self.assertEqual(self.proc.step(), 3)
+        self.assertEqual(self.proc.reg_a, 0x41)
+        self.assertEqual(self.proc.program_counter, 0x0602)
+
+        print(f"Test case 3-2: TAX / INX")
+        self.proc.step()
+        self.proc.step()
+        self.assertEqual(self.proc.reg_x, 0x42)
+        self.assertEqual(self.proc.program_counter, 0x0604)
+
+        print(f"Test case 3-3: STA absolute X")
+        self.assertEqual(self.proc.step(), 5)
+        self.assertEqual(self.mem.read_byte(0x0242), 0x41)
+        self.assertEqual(self.proc.program_counter, 0x0607)
+        self.assertEqual(self.proc.cycles, 3 + 2 + 2 + 5)
+
+    def test_run(self):
+        """
+        Test running several instructions back to back
+
+        @Return: None
+        """
+
+        #DEC $20 / DEC $20 / NOP
+        program = [0xC6, 0x20, 0xC6, 0x20, 0xEA]
+        for i, byte in enumerate(program):
+            self.mem.write(0x0600 + i, byte)
+        self.mem.write(0x0020, 0x01)
+        self.proc.program_counter = 0x0600
+
+        print(f"\nTest case 4-1: Run three instructions")
+        self.assertEqual(self.proc.run(3), 5 + 5 + 2)
+        self.assertEqual(self.mem.read_byte(0x0020), 0xFF)
+        self.assertEqual(self.proc.program_counter, 0x0605)
+        self.assertEqual(self.proc.flag_n, FLAG_ON)
+
+    def test_illegal_opcode(self):
+        """
+        Test an opcode with no handler raises
+
+        @Return: None
+        """
+
+        print(f"\nTest case 5-1: Illegal opcode")
+        self.mem.write(0x0600, 0x02)
+        self.proc.program_counter = 0x0600
+        with self.assertRaises(ValueError):
+            self.proc.step()
+
+    def test_effective_address(self):
+        """
+        Test effective address calculation for every addressing mode
+
+        @Return: None
+        """
+
+        self.proc.reg_x = 0x05
+        self.proc.reg_y = 0x10
+
+        print(f"\nTest case 6-1: Zero page and absolute")
+        self.assertEqual(self.proc.calculate_effective_address(addressing.ZERO_PAGE, 0x42), 0x42)
+        self.assertEqual(self.proc.calculate_effective_address(addressing.ABSOLUTE, 0x4200), 0x4200)
+
+        print(f"Test case 6-2: Indexed modes wrap")
+        self.assertEqual(self.proc.calculate_effective_address(addressing.ZERO_PAGE_X, 0xFE), 0x03)
+        self.assertEqual(self.proc.calculate_effective_address(addressing.ZERO_PAGE_Y, 0x42), 0x52)
+        self.assertEqual(self.proc.calculate_effective_address(addressing.ABSOLUTE_X, 0x4200), 0x4205)
+        self.assertEqual(self.proc.calculate_effective_address(addressing.ABSOLUTE_Y, 0xFFF8), 0x0008)
+
+        print(f"Test case 6-3: Indexed indirect and indirect indexed")
+        self.mem.write(0x0025, 0x00)
+        self.mem.write(0x0026, 0x30)
+        self.assertEqual(self.proc.calculate_effective_address(addressing.INDIRECT_X, 0x20), 0x3000)
+        self.assertEqual(self.proc.calculate_effective_address(addressing.INDIRECT_Y, 0x25), 0x3010)
+
+        print(f"Test case 6-4: Indirect with page wrap bug")
+        self.mem.write(0x10FF, 0x34)
+        self.mem.write(0x1000, 0x12)
+        self.mem.write(0x1100, 0x56)
+        self.assertEqual(self.proc.calculate_effective_address(addressing.INDIRECT, 0x10FF), 0x1234)
+
+        print(f"Test case 6-5: Relative")
+        self.proc.program_counter = 0x0610
+        self.assertEqual(self.proc.calculate_effective_address(addressing.RELATIVE, 0x05), 0x0615)
+        self.assertEqual(self.proc.calculate_effective_address(addressing.RELATIVE, 0xFB), 0x060B)
+
+        print(f"Test case 6-6: Modes with no address")
+        for mode in (addressing.IMPLIED, addressing.ACCUMULATOR, addressing.IMMEDIATE, 99):
+            with self.assertRaises(ValueError):
+                self.proc.calculate_effective_address(mode, 0x00)
+
+    def test_cycles_for_mode(self):
+        """
+        Test cycle table lookups
+
+        @Return: None
+        """
+
+        print(f"\nTest case 7-1: Cycles per mode")
+        self.assertEqual(self.proc.get_cycles_for_mode(addressing.IMMEDIATE), 2)
+        self.assertEqual(self.proc.get_cycles_for_mode(addressing.ZERO_PAGE), 3)
+        self.assertEqual(self.proc.get_cycles_for_mode(addressing.ABSOLUTE_X), 4)
+        self.assertEqual(self.proc.get_cycles_for_mode(addressing.INDIRECT_X), 6)
+        self.assertEqual(self.proc.get_cycles_for_mode(99), 0)
+
+    def test_arithmetic(self):
+        """
+        Test ADC and SBC in binary and decimal mode
+
+        @Return: None
+        """
+
+        print(f"\nTest case 8-1: ADC binary with overflow")
+        #CLC / LDA #$50 / ADC #$50
+        self.load(0x0600, [0x18, 0xA9, 0x50, 0x69, 0x50])
+        self.proc.run(3)
+        self.assertEqual(self.proc.reg_a, 0xA0)
+        self.assertEqual(self.proc.flag_v, FLAG_ON)
+        self.assertEqual(self.proc.flag_c, FLAG_OFF)
+        self.assertEqual(self.proc.flag_n, FLAG_ON)
+
+        print(f"Test case 8-2: ADC decimal with carry out")
+        #SED / CLC / LDA #$58 / ADC #$46
+        self.load(0x0600, [0xF8, 0x18, 0xA9, 0x58, 0x69, 0x46])
+        self.proc.run(4)
+        self.assertEqual(self.proc.reg_a, 0x04)
+        self.assertEqual(self.proc.flag_c, FLAG_ON)
+
+        print(f"Test case 8-3: SBC decimal with borrow")
+        #SED / SEC / LDA #$12 / SBC #$21
+        self.load(0x0600, [0xF8, 0x38, 0xA9, 0x12, 0xE9, 0x21])
+        self.proc.run(4)
+        self.assertEqual(self.proc.reg_a, 0x91)
+        self.assertEqual(self.proc.flag_c, FLAG_OFF)
+
+        print(f"Test case 8-4: Table entries match the arithmetic")
+        for slot, operation, status in ((processor.ALU_ADC, processor.adc, 0), (processor.ALU_SBC, processor.sbc, 0),
+                                        (processor.ALU_ADC | 1, processor.adc, processor.FLAG_D),
+                                        (processor.ALU_SBC | 1, processor.sbc, processor.FLAG_D)):
+            for carry in (0, processor.FLAG_C):
+                for a, value in ((0x00, 0x00), (0x19, 0x28), (0x99, 0x01), (0x7F, 0x01), (0x80, 0xFF), (0x3C, 0xA7)):
+                    entry = processor.ALU_TABLES[slot][(carry << 16) | (a << 8) | value]
+                    result, flags = operation(a, value, status | carry)
+                    self.assertEqual(entry & 0xFF, result)
+                    self.assertEqual((entry >> 8) & 0xC3, flags & 0xC3)
+
+        print(f"Test case 8-5: Tables swap themselves in once built")
+        self.assertIsInstance(processor.ALU_TABLES[processor.ALU_ADC | 1], processor.array)
+
+    def test_branch_loop(self):
+        """
+        Test a countdown loop using a relative branch
+
+        @Return: None
+        """
+
+        print(f"\nTest case 9-1: LDX #$03 / loop: DEY / DEX / BNE loop")
+        self.load(0x0600, [0xA2, 0x03, 0x88, 0xCA, 0xD0, 0xFC, 0xEA])
+        self.proc.reg_y = 0x10
+        self.proc.run(1 + 3 * 3)
+        self.assertEqual(self.proc.reg_x, 0x00)
+        self.assertEqual(self.proc.reg_y, 0x0D)
+        self.assertEqual(self.proc.program_counter, 0x0606)
+        #Two taken branches cost an extra cycle each
+        self.assertEqual(self.proc.cycles, 2 + 3 * (2 + 2 + 2) + 2)
+
+    def test_subroutine(self):
+        """
+        Test JSR / RTS and stack push / pull
+
+        @Return: None
+        """
+
+        self.proc.reset()
+
+        print(f"\nTest case 10-1: JSR $0700 / PHA / PLA / RTS")
+        self.load(0x0700, [0xA9, 0x77, 0x48, 0xA9, 0x00, 0x68, 0x60])
+        self.load(0x0600, [0x20, 0x00, 0x07, 0xEA])
+        self.proc.step()
+        self.assertEqual(self.proc.program_counter, 0x0700)
+        self.proc.run(5)
+        self.assertEqual(self.proc.reg_a, 0x77)
+        self.assertEqual(self.proc.program_counter, 0x0603)
+        self.assertEqual(self.proc.stack_pointer, 0xFD)
+
+        print(f"Test case 10-2: The stack wraps inside page 1")
+        #LDX #$00 / TXS / JSR $0700, then RTS
+        self.load(0x0700, [0x60])
+        self.load(0x0600, [0xA2, 0x00, 0x9A, 0x20, 0x00, 0x07])
+        self.proc.run(3)
+        self.assertEqual(self.proc.stack_pointer, 0xFE)
+        self.assertEqual(self.mem.read_byte(0x0100), 0x06)
+        self.assertEqual(self.mem.read_byte(0x01FF), 0x05)
+        self.assertEqual(self.mem.read_byte(0x0000), 0x00)
+        self.proc.step()
+        self.assertEqual(self.proc.program_counter, 0x0606)
+        self.assertEqual(self.proc.stack_pointer, 0x00)
+
+        print(f"Test case 10-3: TSX only sees the 8-bit stack pointer")
+        #TSX
+        self.load(0x0606, [0xBA])
+        self.proc.step()
+        self.assertEqual(self.proc.reg_x, 0x00)
+        self.assertTrue(self.proc.flag_z)
+
+    def test_shift_accumulator(self):
+        """
+        Test accumulator addressing through ASL A / ROL A
+
+        @Return: None
+        """
+
+        print(f"\nTest case 11-1: LDA #$81 / ASL A / ROL A")
+        self.load(0x0600, [0xA9, 0x81, 0x0A, 0x2A])
+        self.proc.run(2)
+        self.assertEqual(self.proc.reg_a, 0x02)
+        self.assertEqual(self.proc.flag_c, FLAG_ON)
+        self.proc.step()
+        self.assertEqual(self.proc.reg_a, 0x05)
+        self.assertEqual(self.proc.flag_c, FLAG_OFF)
+
+    def test_status_register(self):
+        """
+        Test the packed status register and the flag properties on top of it
+
+        @Return: None
+        """
+
+        print(f"\nTest case 12-1: Flags start packed in P")
+        self.assertEqual(self.proc.P, processor.FLAG_U | processor.FLAG_B | processor.FLAG_I)
+        self.proc.flag_c = True
+        self.assertEqual(self.proc.P & processor.FLAG_C, processor.FLAG_C)
+        self.proc.flag_c = False
+        self.assertEqual(self.proc.P & processor.FLAG_C, 0)
+
+        print(f"Test case 12-2: Pack and unpack")
+        self.proc.unpack_status(0xFF)
+        self.assertEqual(self.proc.flag_n, FLAG_ON)
+        self.assertEqual(self.proc.flag_d, FLAG_ON)
+        self.assertEqual(self.proc.pack_status(), 0xFF)
+        self.proc.unpack_status(0x00)
+        self.assertEqual(self.proc.pack_status(), processor.FLAG_U | processor.FLAG_B)
+
+        print(f"Test case 12-3: LDA clears N and Z again")
+        #LDA #$00 / LDA #$80 / LDA #$01
+        self.load(0x0600, [0xA9, 0x00, 0xA9, 0x80, 0xA9, 0x01])
+        self.proc.step()
+        self.assertEqual(self.proc.flag_z, FLAG_ON)
+        self.proc.step()
+        self.assertEqual(self.proc.flag_z, FLAG_OFF)
+        self.assertEqual(self.proc.flag_n, FLAG_ON)
+        self.proc.step()
+        self.assertEqual(self.proc.flag_n, FLAG_OFF)
+
+        print(f"Test case 12-4: INX and DEX wrap to 8 bits")
+        #LDX #$FF / INX / DEX
+        self.load(0x0600, [0xA2, 0xFF, 0xE8, 0xCA])
+        self.proc.run(2)
+        self.assertEqual(self.proc.reg_x, 0x00)
+        self.assertEqual(self.proc.flag_z, FLAG_ON)
+        self.proc.step()
+        self.assertEqual(self.proc.reg_x, 0xFF)
+        self.assertEqual(self.proc.flag_n, FLAG_ON)
+        self.assertEqual(self.proc.flag_z, FLAG_OFF)
+
+        print(f"Test case 12-5: Lazy N and Z come out right when asked for")
+        #LDA #$80 / PHP / BIT $10 / PHP
+        self.load(0x0600, [0xA9, 0x80, 0x08, 0x24, 0x10, 0x08])
+        self.proc.memory.write(0x10, 0xC0)
+        self.proc.stack_pointer = 0xFF
+        self.proc.run(4)
+        self.assertEqual(self.proc.memory.read_byte(0x01FF) & 0x82, processor.FLAG_N)
+        self.assertEqual(self.proc.memory.read_byte(0x01FE) & 0xC2, 0xC0)
+
+        print(f"Test case 12-6: N and Z both set survive a round trip")
+        self.proc.unpack_status(processor.FLAG_N | processor.FLAG_Z)
+        self.assertEqual(self.proc.flag_n, FLAG_ON)
+        self.assertEqual(self.proc.flag_z, FLAG_ON)
+        self.assertEqual(self.proc.pack_status() & 0x82, 0x82)
+        self.proc.flag_z = False
+        self.assertEqual(self.proc.pack_status() & 0x82, 0x80)
+        self.proc.flag_n = False
+        self.proc.flag_z = True
+        self.assertEqual(self.proc.pack_status() & 0x82, 0x02)
+
+    def test_snapshot(self):
+        """
+        Test saving and rewinding the whole machine
+
+        @Return: None
+        """
+
+        print(f"\nTest case 13-1: Snapshot is memory plus 16 bytes")
+        self.proc.reset()
+        #LDX #$05 / loop: STX $10 / DEX / BNE loop
+        self.load(0x0600, [0xA2, 0x05, 0x86, 0x10, 0xCA, 0xD0, 0xFB])
+        self.proc.run(4)
+        blob = self.proc.snapshot()
+        self.assertEqual(len(blob), 0x10000 + 16)
+
+        print(f"Test case 13-2: Restore rewinds registers and memory")
+        state = (self.proc.reg_x, self.proc.P, self.proc.program_counter, self.proc.cycles)
+        self.proc.run(20)
+        self.assertEqual(self.mem.read_byte(0x0010), 0x01)
+        self.proc.restore(blob)
+        self.assertEqual((self.proc.reg_x, self.proc.P, self.proc.program_counter, self.proc.cycles), state)
+        self.assertEqual(self.proc.stack_pointer, 0xFD)
+        self.assertEqual(self.mem.read_byte(0x0010), 0x05)
+
+        print(f"Test case 13-3: Snapshot from a different size of memory")
+        with self.assertRaises(ValueError):
+            self.proc.restore(blob[:-1])
+
+        print(f"Test case 13-4: No per-instance dict")
+        self.assertFalse(hasattr(self.proc, "__dict__"))
+        self.assertFalse(hasattr(self.mem, "__dict__"))
+
+    def test_run_limits(self):
+        """
+        Test running to a cycle budget or a stop address
+
+        @Return: None
+        """
+
+        #loop: INX / JMP loop
+        self.load(0x0600, [0xE8, 0x4C, 0x00, 0x06])
+
+        print(f"\nTest case 14-1: Cycle budget stops at the first boundary past it")
+        self.assertEqual(self.proc.run(max_cycles=11), 12)
+        self.assertEqual(self.proc.reg_x, 3)
+        self.assertEqual(self.proc.program_counter, 0x0601)
+
+        print(f"Test case 14-2: Stop address")
+        self.proc.run(until_pc=0x0600)
+        self.assertEqual(self.proc.program_counter, 0x0600)
+        self.assertEqual(self.proc.cycles, 15)
+
+        print(f"Test case 14-3: Whichever limit comes first")
+        self.assertEqual(self.proc.run(instructions=100, max_cycles=4), 5)
+        self.assertEqual(self.proc.run(instructions=1, until_pc=0x0700), 2)
+        self.assertRaises(ValueError, self.proc.run)
+
+    def test_interrupts(self):
+        """
+        Test reset and the IRQ / NMI vectors through the event queue
+
+        @Return: None
+        """
+
+        #Vectors: NMI $0710, reset $0600, IRQ $0700
+        self.load(0xFFFA, [0x10, 0x07, 0x00, 0x06, 0x00, 0x07])
+        #CLI / loop: INX / JMP loop
+        self.load(0x0600, [0x58, 0xE8, 0x4C, 0x01, 0x06])
+        #IRQ: INY / RTI
+        self.load(0x0700, [0xC8, 0x40])
+        #NMI: RTI
+        self.load(0x0710, [0x40])
+
+        print(f"\nTest case 15-1: Reset reads the vector")
+        self.proc.reset()
+        self.assertEqual(self.proc.program_counter, 0x0600)
+
+        print(f"Test case 15-2: Scheduled IRQ lands on the next boundary")
+        self.proc.schedule_irq(20)
+        self.proc.run(until_pc=0x0700)
+        self.assertEqual(self.proc.cycles, 22 + 7)
+        self.assertEqual(self.proc.flag_i, FLAG_ON)
+        #Pushed status has the break bit clear, return address is the loop
+        self.assertEqual(self.mem.read_byte(0x01FB) & processor.FLAG_B, 0)
+        self.assertEqual(self.mem.read_word(0x01FC), 0x0601)
+        self.proc.run(2)
+        self.assertEqual(self.proc.reg_y, 1)
+        self.assertEqual(self.proc.program_counter, 0x0601)
+        self.assertEqual(self.proc.flag_i, FLAG_OFF)
+
+        print(f"Test case 15-3: Masked IRQ waits for CLI")
+        self.proc.reset()
+        self.proc.schedule_irq(0)
+        self.proc.step()
+        self.assertEqual(self.proc.program_counter, 0x0601)
+        #Taken before the step's instruction, which is then the first one in the handler
+        self.proc.step()
+        self.assertEqual(self.proc.program_counter, 0x0701)
+        self.assertEqual(self.proc.cycles, 2 + 7 + 2)
+        self.assertEqual(self.proc.reg_y, 2)
+
+        print(f"Test case 15-4: NMI ignores the interrupt disable flag")
+        self.proc.reset()
+        self.proc.schedule_nmi(0)
+        self.proc.run(max_cycles=7)
+        self.assertEqual(self.proc.program_counter, 0x0710)
+
+        print(f"Test case 15-5: Plain events fire in order")
+        fired = []
+        self.proc.schedule(self.proc.cycles + 4, lambda: fired.append(2))
+        self.proc.schedule(self.proc.cycles + 2, lambda: fired.append(1))
+        self.proc.schedule(self.proc.cycles + 2, lambda: fired.append(1.5))
+        self.proc.run(max_cycles=20)
+        self.assertEqual(fired, [1, 1.5, 2])
+
+        print(f"Test case 15-6: Hooks put on and taken off by events count from the next instruction")
+        counted = []
+
+        def hook(table):
+            def wrap(handler, mode, cycles):
+                def count():
+                    counted.append(self.proc.program_counter)
+                    if mode is None:
+                        handler()
+                    else:
+                        handler(mode())
+                return (count, None, cycles)
+            return [wrap(*entry) for entry in table]
+
+        self.proc.reset()
+        self.proc.cycles = 0
+        self.proc.schedule(2, lambda: self.proc.add_hook(hook))
+        self.proc.schedule(4, lambda: self.proc.remove_hook(hook))
+        self.proc.run(instructions=4)
+        self.assertEqual(counted, [0x0602])
+        self.proc.schedule(self.proc.cycles, lambda: self.proc.add_hook(hook))
+        self.proc.run(max_cycles=4)
+        self.assertEqual(len(counted), 3)
+        self.assertEqual(self.proc._hooks, [hook])
+
+    def test_page_crossing(self):
+        """
+        Test the page crossing and taken branch penalties
+
+        @Return: None
+        """
+
+        print(f"\nTest case 16-1: Indexed reads pay for crossing a page")
+        #LDX #$10 / LDA $12F0,X / LDA $1200,X / STA $12F0,X
+        self.load(0x0600, [0xA2, 0x10, 0xBD, 0xF0, 0x12, 0xBD, 0x00, 0x12, 0x9D, 0xF0, 0x12])
+        self.proc.step()
+        self.assertEqual(self.proc.step(), 4)
+        self.assertEqual(self.proc.cycles, 2 + 5)
+        self.proc.step()
+        self.assertEqual(self.proc.cycles, 2 + 5 + 4)
+        print(f"Test case 16-2: Stores always take the long way")
+        self.proc.step()
+        self.assertEqual(self.proc.cycles, 2 + 5 + 4 + 5)
+
+        print(f"Test case 16-3: (zp),Y crosses on the pointer")
+        #LDY #$01 / LDA ($10),Y
+        self.mem.write(0x10, 0xFF)
+        self.mem.write(0x11, 0x12)
+        self.load(0x0600, [0xA0, 0x01, 0xB1, 0x10])
+        self.proc.cycles = 0
+        self.proc.run(2)
+        self.assertEqual(self.proc.cycles, 2 + 6)
+
+        print(f"Test case 16-4: Taken branches, on and off the page")
+        #$06FC: BNE $0700 (not taken) / BEQ $0700 (taken, same page) / $0700: BEQ $06FE (taken, crosses back)
+        self.load(0x06FC, [0xD0, 0x02, 0xF0, 0x00, 0xF0, 0xFC])
+        self.proc.unpack_status(processor.FLAG_Z)
+        self.proc.cycles = 0
+        self.proc.run(2)
+        self.assertEqual(self.proc.cycles, 2 + 3)
+        self.proc.run(1)
+        self.assertEqual(self.proc.program_counter, 0x06FE)
+        self.assertEqual(self.proc.cycles, 2 + 3 + 4)
+
 
 if __name__ == "__main__":
     unittest.main(verbosity=2)
\ No newline at end of file
@@ -0,0 +1,104 @@
+import unittest
+from py6502 import memory
+from py6502 import processor
+from py6502 import profiler
+
+#LDX #$03 / loop: JSR sub / DEX / BNE loop / done: JMP done
+#sub: INY / RTS
+PROGRAM = bytes([0xA2, 0x03, 0x20, 0x00, 0x07, 0xCA, 0xD0, 0xFA, 0x4C, 0x08, 0x06])
+SUBROUTINE = bytes([0xC8, 0x60])
+
+class ProfilerTest(unittest.TestCase):
+    def setUp(self):
+        self.proc = processor.Processor(memory.Memory())
+        self.proc.reset()
+        self.proc.memory.load(0x0600, PROGRAM)
+        self.proc.memory.load(0x0700, SUBROUTINE)
+        self.proc.program_counter = 0x0600
+        self.profiler = profiler.Profiler(self.proc)
+
+    def test_flat_profile(self):
+        """
+        Test per opcode, address and mode counts
+
+        @Return: None
+        """
+
+        print(f"\nTest case 1-1: Profiling a run")
+        with self.profiler:
+            cycles = self.proc.run(until_pc=0x0608)
+        opcodes = {row["mnemonic"]: row for row in self.profiler.opcodes()}
+        self.assertEqual(opcodes["JSR"]["count"], 3)
+        self.assertEqual(opcodes["INY"]["count"], 3)
+        #Two taken branches and one not taken
+        self.assertEqual(opcodes["BNE"]["cycles"], 3 + 3 + 2)
+        self.assertEqual(sum(row["cycles"] for row in self.profiler.opcodes()), cycles)
+
+        print(f"Test case 1-2: By address and by mode")
+        addresses = {row["pc"]: row for row in self.profiler.addresses()}
+        self.assertEqual(addresses[0x0600]["count"], 1)
+        self.assertEqual(addresses[0x0700]["count"], 3)
+        modes = {row["mode"]: row for row in self.profiler.modes()}
+        self.assertEqual(modes["absolute"]["count"], 3)
+        self.assertEqual(modes["implied"]["count"], 9)
+        self.assertIn("JSR", self.profiler.report())
+
+        print(f"Test case 1-3: Disabled profiler records nothing and restores the table")
+        self.assertFalse(self.profiler.enabled)
+        self.proc.program_counter = 0x0600
+        self.proc.run(5)
+        self.assertEqual(self.profiler.opcode_counts[0x20], 3)
+        self.assertTrue(all(entry[0].__name__.startswith(("ins_", "_ins")) for entry in self.proc._dispatch))
+
+    def test_call_tree(self):
+        """
+        Test the JSR / RTS tree
+
+        @Return: None
+        """
+
+        print(f"\nTest case 2-1: One subroutine called three times")
+        with self.profiler:
+            self.proc.run(until_pc=0x0608)
+        tree = self.profiler.call_tree()
+        self.assertEqual(len(tree["children"]), 1)
+        sub = tree["children"][0]
+        self.assertEqual(sub["addr"], 0x0700)
+        self.assertEqual(sub["calls"], 3)
+        self.assertEqual(sub["self_cycles"], 3 * (2 + 6))
+        self.assertEqual(tree["cycles"], self.proc.cycles)
+
+    def test_hooks(self):
+        """
+        Test profilers come off in any order without taking each other with them
+
+        @Return: None
+        """
+
+        print(f"\nTest case 3-1: First one on comes off first")
+        second = profiler.Profiler(self.proc)
+        self.profiler.enable()
+        second.enable()
+        self.profiler.disable()
+        self.proc.run(until_pc=0x0608)
+        self.assertEqual(self.profiler.opcode_counts[0x20], 0)
+        self.assertEqual(second.opcode_counts[0x20], 3)
+
+        print(f"Test case 3-2: Clearing keeps the other hooks in")
+        self.profiler.enable()
+        second.clear()
+        self.proc.program_counter = 0x0600
+        self.proc.run(until_pc=0x0608)
+        self.assertEqual(self.profiler.opcode_counts[0x20], 3)
+        self.assertEqual(second.opcode_counts[0x20], 3)
+
+        print(f"Test case 3-3: Taking off a hook that isn't on")
+        second.disable()
+        self.profiler.disable()
+        self.assertEqual(self.proc._hooks, [])
+        with self.assertRaises(ValueError):
+            self.proc.remove_hook(second._instrument)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
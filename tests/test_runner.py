@@ -0,0 +1,54 @@
+import unittest
+from py6502 import runner
+
+#LDX #$00 / loop: INX / STX $10 / JMP loop
+COUNT_PROGRAM = bytes([0xA2, 0x00, 0xE8, 0x86, 0x10, 0x4C, 0x02, 0x06])
+
+class RunnerTest(unittest.TestCase):
+    def test_run_job(self):
+        """
+        Test a single job in this process
+
+        @Return: None
+        """
+
+        print(f"\nTest case 1-1: Run to a cycle budget")
+        result = runner.run_job(COUNT_PROGRAM, 0x0600, 2 + 10 * 8, load_addr=0x0600, ranges=[(0x0010, 0x0011)])
+        self.assertIsNone(result.error)
+        self.assertEqual(result.cycles, 2 + 10 * 8)
+        self.assertEqual(result.reg_x, 10)
+        self.assertEqual(result.memory[0x0010], bytes([10]))
+        self.assertEqual(result.program_counter, 0x0602)
+
+        print(f"Test case 1-2: Bad opcode comes back as an error")
+        result = runner.run_job(bytes([0xEA, 0x02]), 0x0600, 100, load_addr=0x0600)
+        self.assertIn("Unsupported opcode", result.error)
+        self.assertEqual(result.cycles, 2)
+
+    def test_run_jobs(self):
+        """
+        Test sharding jobs over worker processes
+
+        @Return: None
+        """
+
+        jobs = [(COUNT_PROGRAM, 0x0600, 2 + n * 8, 0x0600) for n in range(1, 9)]
+
+        print(f"\nTest case 2-1: Images through shared memory")
+        results = runner.run_jobs(jobs, ranges=[(0x0010, 0x0011)], workers=2, chunksize=2)
+        self.assertEqual([r.reg_x for r in results], list(range(1, 9)))
+        self.assertEqual(results[-1].memory[0x0010], bytes([8]))
+
+        print(f"Test case 2-2: Images inline with each job")
+        results = runner.run_jobs(jobs, workers=2, shared=False)
+        self.assertEqual([r.reg_x for r in results], list(range(1, 9)))
+
+        print(f"Test case 2-3: Full 64K image with no load address")
+        image = bytearray(0x10000)
+        image[0x0600:0x0600 + len(COUNT_PROGRAM)] = COUNT_PROGRAM
+        results = runner.run_jobs([(image, 0x0600, 10)], workers=1)
+        self.assertEqual(results[0].reg_x, 1)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
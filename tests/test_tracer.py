@@ -0,0 +1,106 @@
+import os
+import tempfile
+import unittest
+from py6502 import memory
+from py6502 import processor
+from py6502 import tracer
+from py6502 import profiler
+
+#LDX #$05 / loop: DEX / BNE loop / NOP
+PROGRAM = bytes([0xA2, 0x05, 0xCA, 0xD0, 0xFD, 0xEA])
+
+class TracerTest(unittest.TestCase):
+    def setUp(self):
+        self.proc = processor.Processor(memory.Memory())
+        self.proc.reset()
+        self.proc.memory.load(0x0600, PROGRAM)
+        self.proc.program_counter = 0x0600
+
+    def test_ring(self):
+        """
+        Test an in-memory trace keeps the last records
+
+        @Return: None
+        """
+
+        print(f"\nTest case 1-1: Records hold the state before each instruction")
+        with tracer.Tracer(self.proc, capacity=64) as trace:
+            self.proc.run(until_pc=0x0605)
+        records = trace.records()
+        self.assertEqual(len(records), 1 + 5 * 2)
+        self.assertEqual(records[0], tracer.TraceRecord(0x0600, 0xA2, 0, 0, 0, 0xFD, 0x34, 0))
+        self.assertEqual(records[1].x, 5)
+        self.assertEqual(records[-1].pc, 0x0603)
+        self.assertEqual(records[-1].x, 0)
+
+        print(f"Test case 1-2: Ring keeps only the newest")
+        self.proc.program_counter = 0x0600
+        with tracer.Tracer(self.proc, capacity=4) as trace:
+            self.proc.run(until_pc=0x0605)
+        self.assertEqual([record.pc for record in trace.records()], [0x0602, 0x0603, 0x0602, 0x0603])
+
+        print(f"Test case 1-3: Nothing recorded once stopped")
+        self.proc.program_counter = 0x0600
+        self.proc.run(3)
+        self.assertEqual(len(trace.records()), 4)
+
+        print(f"Test case 1-4: Stopped underneath a profiler, the profiler keeps going")
+        self.proc.program_counter = 0x0600
+        trace = tracer.Tracer(self.proc, capacity=64)
+        profile = profiler.Profiler(self.proc)
+        trace.start()
+        profile.enable()
+        self.proc.run(3)
+        trace.stop()
+        self.proc.run(2)
+        profile.disable()
+        self.assertEqual(len(trace.records()), 3)
+        self.assertEqual(sum(profile.opcode_counts), 5)
+        self.assertEqual(self.proc._hooks, [])
+
+        print(f"Test case 1-5: Opcodes aren't read through the Bus a second time")
+        proc = processor.Processor(memory.Bus())
+        proc.reset()
+        proc.memory.load(0x0600, PROGRAM)
+        proc.program_counter = 0x0600
+        reads = []
+        proc.memory.watch_reads(0x0600, 0x0700, lambda addr, value: reads.append(addr))
+        with tracer.Tracer(proc, capacity=4) as trace:
+            proc.step()
+        self.assertEqual(reads, [0x0600, 0x0601])
+        self.assertEqual(trace.records()[0].opcode, 0xA2)
+
+    def test_file(self):
+        """
+        Test writing a trace file in chunks and reading it back
+
+        @Return: None
+        """
+
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            print(f"\nTest case 2-1: Trace bigger than the buffer")
+            trace = tracer.Tracer(self.proc, capacity=4, path=path)
+            trace.start()
+            self.proc.run(until_pc=0x0605)
+            trace.close()
+            self.assertEqual(os.path.getsize(path), 8 + 11 * 16)
+
+            print(f"Test case 2-2: Streaming it back")
+            records = list(tracer.read_trace(path, chunk=3))
+            self.assertEqual(len(records), 11)
+            self.assertEqual(records[0].opcode, 0xA2)
+            self.assertEqual([record.cycles for record in records[:3]], [0, 2, 4])
+
+            print(f"Test case 2-3: Not a trace file")
+            with open(path, "wb") as f:
+                f.write(b"garbage!")
+            with self.assertRaises(ValueError):
+                list(tracer.read_trace(path))
+        finally:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,251 @@
+import unittest
+from py6502 import memory
+from py6502 import processor
+from py6502 import translator
+
+#LDA #$00 / LDX $10 / loop: CLC / STX $11 / ADC $11 / DEX / BNE loop / STA $12 / done: JMP done
+SUM_PROGRAM = bytes([
+    0xA9, 0x00, 0xA6, 0x10, 0x18, 0x86, 0x11, 0x65, 0x11, 0xCA, 0xD0, 0xF8, 0x85, 0x12, 0x4C, 0x0E, 0x06,
+])
+
+#LDA #$07 / STA $0606 / LDA #$00 / STA $10 / done: JMP done
+#The STA overwrites the operand of the second LDA, so it ends up loading 7
+SELF_MODIFYING_PROGRAM = bytes([0xA9, 0x07, 0x8D, 0x06, 0x06, 0xA9, 0x00, 0x85, 0x10, 0x4C, 0x09, 0x06])
+
+class TranslatorTest(unittest.TestCase):
+    def setUp(self):
+        self.bus = memory.Bus()
+        self.proc = processor.Processor(self.bus)
+        self.proc.reset()
+        self.translator = translator.Translator(self.proc)
+
+    def load(self, addr, program):
+        """
+        Write a program into memory and point the program counter at it
+
+        @Return: None
+        """
+
+        self.bus.load(addr, program)
+        self.proc.program_counter = addr
+
+    def test_run(self):
+        """
+        Test translated blocks run the program
+
+        @Return: None
+        """
+
+        self.load(0x0600, SUM_PROGRAM)
+        self.bus.write(0x0010, 10)
+
+        print(f"\nTest case 1-1: Sum 1..10")
+        self.translator.run(100)
+        self.assertEqual(self.proc.reg_a, 55)
+        self.assertEqual(self.bus.read_byte(0x0012), 55)
+        self.assertEqual(self.proc.reg_x, 0)
+        self.assertEqual(self.proc.flag_z, True)
+        self.assertEqual(self.proc.program_counter, 0x060E)
+
+        print(f"Test case 1-2: Blocks are cached by start address")
+        self.assertTrue(self.translator.is_cached(0x0600))
+        self.assertTrue(self.translator.is_cached(0x0604))
+        self.assertTrue(self.translator.is_cached(0x060C))
+
+        print(f"Test case 1-3: Cycles match the table, plus one per branch taken")
+        self.assertEqual(self.proc.cycles, 2 + 3 + 10 * (2 + 3 + 3 + 2 + 2) + 9 + 3 + 3 + (100 - 54) * 3)
+
+        print(f"Test case 1-4: Same state as the interpreter")
+        proc = processor.Processor(memory.Memory())
+        proc.reset()
+        proc.memory.load(0x0600, SUM_PROGRAM)
+        proc.memory.write(0x0010, 10)
+        proc.program_counter = 0x0600
+        proc.run(100)
+        self.assertEqual(proc.pack_status(), self.proc.pack_status())
+        self.assertEqual(proc.cycles, self.proc.cycles)
+        self.assertEqual(proc.memory.dump(), self.bus.dump())
+
+        print(f"Test case 1-5: Page crossing penalties match the interpreter")
+        #$06F8: LDX #$20 / loop: LDA $12F0,X / LDA ($10),Y / INY / DEX / BNE loop / done: JMP done
+        #The BNE is on the page after loop, and the loads cross part way through
+        crossing = bytes([0xA2, 0x20, 0xBD, 0xF0, 0x12, 0xB1, 0x10, 0xC8, 0xCA, 0xD0, 0xF7, 0x4C, 0x03, 0x07])
+        self.bus.write(0x0010, 0xF0)
+        self.bus.write(0x0011, 0x12)
+        self.load(0x06F8, crossing)
+        self.proc.reg_y = 0
+        self.proc.cycles = 0
+        self.translator.run(200)
+        proc.memory.load(0x06F8, crossing)
+        proc.memory.load(0x0010, bytes([0xF0, 0x12]))
+        proc.program_counter = 0x06F8
+        proc.reg_y = 0
+        proc.cycles = 0
+        proc.run(200)
+        self.assertEqual(proc.program_counter, 0x0703)
+        self.assertEqual(proc.cycles, self.proc.cycles)
+
+        print(f"Test case 1-6: Translating doesn't read the code through the Bus")
+        reads = []
+        self.bus.watch_reads(0x0600, 0x0700, lambda addr, value: reads.append(addr))
+        self.translator.invalidate()
+        self.load(0x0600, SUM_PROGRAM)
+        self.translator.run(100)
+        self.assertTrue(self.translator.is_cached(0x0600))
+        self.assertEqual(reads, [])
+
+    def test_invalidate(self):
+        """
+        Test writes to code throw the blocks on it away
+
+        @Return: None
+        """
+
+        self.load(0x0600, SUM_PROGRAM)
+        self.bus.write(0x0010, 3)
+        self.translator.run(20)
+
+        print(f"\nTest case 2-1: Writes next to code leave it alone")
+        self.bus.write(0x06F0, 0x01)
+        self.bus.write(0x0700, 0x01)
+        self.assertTrue(self.translator.is_cached(0x0604))
+
+        print(f"Test case 2-2: Writes into code drop the block")
+        self.bus.write(0x0605, 0x86)
+        self.assertFalse(self.translator.is_cached(0x0600))
+        self.assertFalse(self.translator.is_cached(0x0604))
+        self.assertTrue(self.translator.is_cached(0x060C))
+
+        print(f"Test case 2-3: Dropping everything")
+        self.translator.invalidate()
+        self.assertFalse(self.translator.is_cached(0x060C))
+        self.assertIsNone(self.bus._writers[0x06])
+
+    def test_self_modifying(self):
+        """
+        Test a block that writes over its own code
+
+        @Return: None
+        """
+
+        self.load(0x0600, SELF_MODIFYING_PROGRAM)
+
+        print(f"\nTest case 3-1: The rewritten operand is the one that runs")
+        self.translator.run(10)
+        self.assertEqual(self.bus.read_byte(0x0010), 0x07)
+        self.assertEqual(self.proc.reg_a, 0x07)
+
+    def test_errors(self):
+        """
+        Test the things the translator won't do
+
+        @Return: None
+        """
+
+        print(f"\nTest case 4-1: Plain Memory can't watch for writes")
+        with self.assertRaises(ValueError):
+            translator.Translator(processor.Processor(memory.Memory()))
+
+        print(f"Test case 4-2: Illegal opcodes still raise")
+        self.load(0x0600, bytes([0xEA, 0x02]))
+        with self.assertRaises(ValueError):
+            self.translator.run(10)
+        self.assertEqual(self.proc.cycles, 2)
+
+    def test_stack(self):
+        """
+        Test translated stack instructions wrap inside page 1
+
+        @Return: None
+        """
+
+        #LDX #$01 / TXS / LDA #$42 / PHA / JSR sub / PLA / TSX / done: JMP done / sub: RTS
+        program = bytes([0xA2, 0x01, 0x9A, 0xA9, 0x42, 0x48, 0x20, 0x0E, 0x06, 0x68, 0xBA, 0x4C, 0x0B, 0x06, 0x60])
+        self.load(0x0600, program)
+
+        print(f"\nTest case 5-1: Pushes run off the bottom of page 1 onto the top")
+        self.translator.run(8)
+        self.assertEqual(self.bus.read_byte(0x0101), 0x42)
+        self.assertEqual(self.bus.read_byte(0x0100), 0x06)
+        self.assertEqual(self.bus.read_byte(0x01FF), 0x08)
+        self.assertEqual(self.bus.read_byte(0x0000), 0x00)
+
+        print(f"Test case 5-2: And come back the same way")
+        self.assertEqual(self.proc.program_counter, 0x060B)
+        self.assertEqual(self.proc.reg_a, 0x42)
+        self.assertEqual(self.proc.reg_x, 0x01)
+        self.assertEqual(self.proc.stack_pointer, 0x01)
+
+    def interpreter(self, program):
+        """
+        Plain Processor on a Bus with the same program loaded, to check the translator against
+
+        @Return: Processor
+        """
+
+        bus = memory.Bus()
+        proc = processor.Processor(bus)
+        proc.reset()
+        bus.load(0x0600, program)
+        proc.program_counter = 0x0600
+        return proc
+
+    def test_timing(self):
+        """
+        Test events and interrupts land on the same instruction as under the interpreter
+
+        @Return: None
+        """
+
+        #SEI / LDA #$01 / CLI / LDX #$02 / LDY #$03 / done: JMP done
+        program = bytes([0x78, 0xA9, 0x01, 0x58, 0xA2, 0x02, 0xA0, 0x03, 0x4C, 0x08, 0x06])
+        #IRQ handler: hold: JMP hold
+        handler = bytes([0x4C, 0x00, 0x07])
+
+        print(f"\nTest case 6-1: Timed event fires on the same instruction")
+        fired = []
+        proc = self.interpreter(program)
+        proc.schedule(5, lambda: fired.append((proc.program_counter, proc.cycles)))
+        proc.run(6)
+        self.load(0x0600, program)
+        self.proc.schedule(5, lambda: fired.append((self.proc.program_counter, self.proc.cycles)))
+        self.translator.run(6)
+        self.assertEqual(fired[1], fired[0])
+
+        print(f"Test case 6-2: CLI in the middle of a block lets a held IRQ in straight after it")
+        for machine in (proc, self.proc):
+            machine.memory.load(0x0700, handler)
+            machine.memory.load(0xFFFE, bytes([0x00, 0x07]))
+            machine.program_counter = 0x0600
+            machine.cycles = 0
+            machine.irq()
+        proc.run(until_pc=0x0700)
+        while self.proc.program_counter != 0x0700:
+            self.translator.run(1)
+        self.assertEqual(self.proc.reg_x, proc.reg_x)
+        self.assertEqual(self.proc.cycles, proc.cycles)
+        self.assertEqual(self.bus.dump(0x0100, 0x0200), proc.memory.dump(0x0100, 0x0200))
+
+        print(f"Test case 6-3: A device scheduling from a read stops the block at the right cycle")
+        #LDA $D000 / LDX #$02 / LDY #$03 / done: JMP done
+        program = bytes([0xAD, 0x00, 0xD0, 0xA2, 0x02, 0xA0, 0x03, 0x4C, 0x07, 0x06])
+        fired = []
+        for machine in (self.interpreter(program), self.proc):
+
+            def read(addr, machine=machine):
+                machine.schedule(machine.cycles, lambda: fired.append((machine.program_counter, machine.cycles)))
+                return 0x00
+
+            machine.memory.map_device(0xD000, 0xD100, read=read)
+            machine.cycles = 0
+            if machine is self.proc:
+                self.load(0x0600, program)
+                self.translator.invalidate()
+                self.translator.run(4)
+            else:
+                machine.run(4)
+        self.assertEqual(fired, [(0x0603, 4), (0x0603, 4)])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)